@@ -0,0 +1,442 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+
+from constants import (
+    ALPHAFOLD_API_URL,
+    CACHE_DIR,
+    PREDICTION_CACHE_MAX_ENTRIES,
+    PREDICTION_CACHE_TTL_SECONDS,
+    STRUCTURE_MEMORY_CACHE_BYTES,
+)
+from sqlite_store import SQLiteStore, open_store
+from tracing import record_bytes, trace, traced
+
+if TYPE_CHECKING:
+    import requests
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> "requests.Session":
+    """Return the process-wide pooled HTTP session used for AlphaFold requests."""
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+
+def fetch_bytes(url: str, timeout: float = 60) -> bytes:
+    """
+    Download ``url`` with the pooled session.
+
+    ``file://`` URLs are read from disk so a directory of fixtures can stand in for the AlphaFold API.
+
+    Args:
+        url: The URL to fetch
+        timeout: Request timeout in seconds
+
+    Returns:
+        The response body
+    """
+    with trace("fetch", url=url):
+        parsed = urlparse(url)
+        if parsed.scheme == "file":
+            with open(url2pathname(parsed.path), "rb") as f:
+                content = f.read()
+        else:
+            response = get_session().get(url, timeout=timeout)
+            response.raise_for_status()
+            content = response.content
+        record_bytes(len(content))
+        return content
+
+
+class ByteLRUCache:
+    """A thread-safe LRU cache of strings bounded by their total size in bytes."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._items: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: str) -> None:
+        size = len(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._items:
+                self.current_bytes -= len(self._items.pop(key))
+            self._items[key] = value
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.current_bytes -= len(evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self.current_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class StructureCache:
+    """
+    Two-tier cache for AlphaFold structure files.
+
+    Structures live in memory in a byte-bounded LRU, backed by a content-addressed store on disk: blobs are
+    stored under their SHA-256 digest in ``objects/`` and ``refs/<entry>-v<version>.<format>`` points at
+    the digest.
+    If the cache directory cannot be written the cache silently falls back to memory only.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = CACHE_DIR, max_memory_bytes: int = STRUCTURE_MEMORY_CACHE_BYTES):
+        self.cache_dir = os.path.join(cache_dir, "structures") if cache_dir else None
+        self.memory = ByteLRUCache(max_memory_bytes)
+
+    @staticmethod
+    def key(entry_id: str, version, fmt: str = "pdb") -> str:
+        """Return the cache key for a model entry, version and file format."""
+        return f"{entry_id}-v{version}.{fmt}"
+
+    def _ref_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, "refs", key)
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.cache_dir, "objects", digest[:2], digest)
+
+    def _read_disk(self, key: str) -> Optional[bytes]:
+        if self.cache_dir is None:
+            return None
+        try:
+            with open(self._ref_path(key), "r") as f:
+                digest = f.read().strip()
+            with open(self._object_path(digest), "rb") as f:
+                content = f.read()
+        except OSError:
+            return None
+        if hashlib.sha256(content).hexdigest() != digest:
+            return None
+        return content
+
+    def _write_disk(self, key: str, content: bytes) -> None:
+        if self.cache_dir is None:
+            return
+        digest = hashlib.sha256(content).hexdigest()
+        try:
+            _atomic_write(self._object_path(digest), content)
+            _atomic_write(self._ref_path(key), digest.encode("utf-8"))
+        except OSError:
+            pass
+
+    def contains(self, key: str) -> bool:
+        """Return True if the structure is cached in memory or on disk."""
+        if self.memory.get(key) is not None:
+            return True
+        return self.cache_dir is not None and os.path.exists(self._ref_path(key))
+
+    def get(self, key: str, url: str) -> str:
+        """
+        Return the structure for ``key``, downloading it from ``url`` on a cache miss.
+
+        Args:
+            key: The cache key, see ``StructureCache.key``
+            url: Where to download the structure from
+
+        Returns:
+            The decoded structure file
+        """
+        content = self.memory.get(key)
+        if content is not None:
+            return content
+
+        raw = self._read_disk(key)
+        if raw is None:
+            raw = fetch_bytes(url)
+            self._write_disk(key, raw)
+
+        content = raw.decode("utf-8")
+        self.memory.put(key, content)
+        return content
+
+
+def _atomic_write(path: str, content: bytes) -> None:
+    """Write ``content`` to ``path`` via a temporary file so readers never see a partial file."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+_structure_cache = None
+_structure_cache_lock = threading.Lock()
+
+
+def get_structure_cache() -> StructureCache:
+    """Return the process-wide structure cache shared by all sessions."""
+    global _structure_cache
+    with _structure_cache_lock:
+        if _structure_cache is None:
+            _structure_cache = StructureCache()
+        return _structure_cache
+
+
+def model_version(prediction: dict, url: str) -> str:
+    """Return the model version of a prediction, falling back to the ``_v<N>`` suffix of its file URL."""
+    version = prediction.get("latestVersion")
+    if version is None:
+        match = re.search(r"_v(\d+)\.", url)
+        version = match.group(1) if match else "unknown"
+    return str(version)
+
+
+@traced("alphafold.structure")
+def get_structure_content(prediction: dict) -> Tuple[str, str]:
+    """
+    Return the structure file for an AlphaFold prediction, using the structure cache.
+
+    The PDB file is preferred, predictions without one fall back to the mmCIF file.
+
+    Args:
+        prediction: A prediction record from the AlphaFold API
+
+    Returns:
+        The structure file contents and its format (``pdb`` or ``cif``)
+    """
+    url, fmt = prediction.get("pdbUrl"), "pdb"
+    if not url:
+        url, fmt = prediction.get("cifUrl"), "cif"
+    if not url:
+        raise ValueError("Prediction has no PDB or mmCIF URL.")
+
+    entry_id = prediction.get("entryId") or prediction.get("uniprotAccession") or os.path.basename(url)
+    key = StructureCache.key(entry_id, model_version(prediction, url), fmt)
+    return get_structure_cache().get(key, url), fmt
+
+
+class PredictionStore(SQLiteStore):
+    """
+    SQLite cache for AlphaFold prediction metadata.
+
+    Entries older than ``ttl`` seconds are refreshed on access; if the refresh fails the stale entry is
+    returned instead. Once more than ``max_entries`` are stored the least recently used are evicted.
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl: float = PREDICTION_CACHE_TTL_SECONDS,
+                 max_entries: int = PREDICTION_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        super().__init__(path or os.path.join(CACHE_DIR, "predictions.sqlite"), [
+            "CREATE TABLE IF NOT EXISTS predictions ("
+            "accession TEXT PRIMARY KEY, payload TEXT NOT NULL, "
+            "fetched_at REAL NOT NULL, accessed_at REAL NOT NULL)",
+            "CREATE INDEX IF NOT EXISTS predictions_accessed ON predictions (accessed_at)",
+        ])
+
+    def lookup(self, accession: str) -> Optional[tuple]:
+        """Return the cached ``(predictions, fetched_at)`` for an accession, or None."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT payload, fetched_at FROM predictions WHERE accession = ?", (accession,)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE predictions SET accessed_at = ? WHERE accession = ?", (time.time(), accession))
+        return json.loads(row[0]), row[1]
+
+    def put(self, accession: str, predictions: List[dict]) -> None:
+        """Store the predictions for an accession and evict the oldest entries past the limit."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO predictions (accession, payload, fetched_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (accession, json.dumps(predictions), now, now),
+            )
+            conn.execute(
+                "DELETE FROM predictions WHERE accession IN ("
+                "SELECT accession FROM predictions ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def __len__(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+
+    def get(self, accession: str) -> List[dict]:
+        """
+        Return the AlphaFold predictions for an accession, fetching them if missing or expired.
+
+        Args:
+            accession: A UniProt accession, e.g. P00520
+
+        Returns:
+            The AlphaFold prediction records
+        """
+        cached = self.lookup(accession)
+        if cached is not None:
+            predictions, fetched_at = cached
+            if time.time() - fetched_at <= self.ttl:
+                return predictions
+
+        try:
+            predictions = fetch_predictions(accession)
+        except Exception:
+            if cached is not None:
+                return cached[0]
+            raise
+
+        self.put(accession, predictions)
+        return predictions
+
+
+def fetch_predictions(accession: str) -> List[dict]:
+    """Download the AlphaFold predictions for a UniProt accession, bypassing the cache."""
+    return json.loads(fetch_bytes(f"{ALPHAFOLD_API_URL}/prediction/{accession}").decode("utf-8"))
+
+
+_prediction_store = None
+_prediction_store_lock = threading.Lock()
+
+
+def get_prediction_store() -> PredictionStore:
+    """Return the process-wide prediction metadata store."""
+    global _prediction_store
+    with _prediction_store_lock:
+        if _prediction_store is None:
+            _prediction_store = open_store(PredictionStore, "pdbcov-predictions.sqlite")
+        return _prediction_store
+
+
+@traced("alphafold.predictions")
+def get_predictions(accession: str) -> List[dict]:
+    """Return the AlphaFold predictions for a UniProt accession from the persistent cache."""
+    return get_prediction_store().get(accession)
+
+
+def _is_retryable(error: Exception) -> bool:
+    """Return True for errors worth retrying: connection problems, timeouts, 429 and 5xx responses."""
+    import requests
+
+    if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return True
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return error.response.status_code == 429 or error.response.status_code >= 500
+    return False
+
+
+def with_retries(fn: Callable, retries: int = 3, backoff: float = 0.5):
+    """
+    Call ``fn``, retrying transient failures with exponential backoff.
+
+    Args:
+        fn: The function to call
+        retries: Number of retries after the first attempt
+        backoff: Delay before the first retry in seconds, doubled after each attempt
+
+    Returns:
+        The result of ``fn``
+    """
+    for attempt in range(retries + 1):
+        try:
+            return fn()
+        except Exception as e:
+            if attempt == retries or not _is_retryable(e):
+                raise
+            time.sleep(backoff * 2 ** attempt)
+
+
+def _prefetch_one(accession: str, structures: bool, retries: int, backoff: float) -> None:
+    predictions = with_retries(lambda: get_predictions(accession), retries, backoff)
+    if structures and predictions and (predictions[0].get("pdbUrl") or predictions[0].get("cifUrl")):
+        with_retries(lambda: get_structure_content(predictions[0]), retries, backoff)
+
+
+def prefetch(accessions: Iterable[str], structures: bool = True, max_workers: int = 8, retries: int = 3,
+             backoff: float = 0.5, on_progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, str]:
+    """
+    Fetch predictions, and optionally PDB files, for many accessions concurrently into the caches.
+
+    Args:
+        accessions: UniProt accessions, duplicates and blanks are ignored
+        structures: Also download the PDB file of each prediction
+        max_workers: Maximum number of concurrent downloads
+        retries: Retries per request for transient failures
+        backoff: Initial retry delay in seconds
+        on_progress: Called with ``(completed, total)`` after each accession finishes
+
+    Returns:
+        A mapping of each accession that failed to the error message
+    """
+    accessions = list(dict.fromkeys(str(a).strip() for a in accessions if a is not None and str(a).strip()))
+    failed = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(_prefetch_one, accession, structures, retries, backoff): accession
+                   for accession in accessions}
+        for completed, future in enumerate(as_completed(futures), start=1):
+            try:
+                future.result()
+            except Exception as e:
+                failed[futures[future]] = str(e)
+            if on_progress is not None:
+                on_progress(completed, len(accessions))
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-warm the AlphaFold prediction and structure caches.")
+    parser.add_argument("accessions", nargs="*", help="UniProt accessions")
+    parser.add_argument("-f", "--file", help="File with one accession per line")
+    parser.add_argument("--structures", action="store_true", help="Also download the PDB files")
+    parser.add_argument("-j", "--workers", type=int, default=8, help="Number of concurrent downloads")
+    args = parser.parse_args()
+
+    accessions = list(args.accessions)
+    if args.file:
+        with open(args.file) as f:
+            accessions.extend(f.read().splitlines())
+
+    failed = prefetch(accessions, structures=args.structures, max_workers=args.workers)
+    for accession, error in failed.items():
+        print(f"{accession}: {error}")
+    print(f"Cached {len(get_prediction_store())} accessions, {len(failed)} failed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,67 +1,83 @@
+import json
+
 import streamlit as st
 
 
 from app_input import get_input
+from constants import DEBUG_PANEL, TRACE_EXPORT_PATH
+from tracing import Tracer
 from util import (
     apply_expanded_sidebar,
-    coverage_string,
     display_header,
-    render_mol,
-    plot_coverage_array,
     show_footer,
+    show_mol_html,
 )
 
 st.set_page_config(layout="centered", page_title="PdbCov",
                    page_icon=":dna:", initial_sidebar_state="auto")
 
 
-with st.sidebar:
-    apply_expanded_sidebar()
-    display_header()
-    cov_input = get_input()
+# One trace per rerun, kept in the session for the debug panel
+tracer = st.session_state.setdefault("tracer", Tracer())
+tracer.start_run(memory=st.session_state.get("trace_memory", False))
 
-should_render = True
+# End the run even when Streamlit stops or reruns the script midway, which releases tracemalloc
 try:
-    cov_input.setup()
-except Exception as e:
-    st.error(f"Error setting up input: {e}")
-    import traceback
-    traceback.print_exc()
-
-    should_render = False
-    
-if should_render:
-    st.title(cov_input.title)
-    if cov_input.subtitle:
-        st.subheader(cov_input.subtitle)
-        
-    st.pyplot(
-        plot_coverage_array(
-            cov_input.color_coverage_array, 
-            cov_input.color_map,
-            vmin=cov_input.vmin,
-            vmax=cov_input.vmax,
-            )
-        )
+    with st.sidebar:
+        apply_expanded_sidebar()
+        display_header()
+        cov_input = get_input()
 
-    if cov_input.pdb_content is not None:
-        render_mol(
-            cov_input.pdb_content, 
-            cov_input.color_gradient_hex_array, 
-            cov_input.pdb_style, 
-            cov_input.bcolor, 
-            cov_input.highlight_residues,
-            cov_input.auto_spin,
-        )
+    should_render = True
+    try:
+        cov_input.setup()
+    except Exception as e:
+        st.error(f"Error setting up input: {e}")
+        import traceback
+        traceback.print_exc()
+
+        should_render = False
+
+    if should_render:
+        st.title(cov_input.title)
+        if cov_input.subtitle:
+            st.subheader(cov_input.subtitle)
+
+        # Each rendering is a pipeline stage, rebuilt only when its inputs change
+        st.image(cov_input.coverage_track, use_container_width=True)
 
-    st.markdown(
-            coverage_string(cov_input.coverage_array, 
-                            cov_input.protein_sequence, 
-                            cov_input.cmap, 
-                            color_coverage=cov_input.color_coverage_array,
-                            vmin=cov_input.vmin,
-                            vmax=cov_input.vmax),
-            unsafe_allow_html=True,
+        structure_html = cov_input.structure_html
+        if structure_html is not None:
+            show_mol_html(structure_html)
+
+        st.markdown(cov_input.sequence_html, unsafe_allow_html=True)
+finally:
+    tracer.end_run()
+
+if TRACE_EXPORT_PATH:
+    tracer.export(TRACE_EXPORT_PATH)
+
+if DEBUG_PANEL:
+    with st.expander("Debug", expanded=False):
+        st.caption("Stages of this rerun: recomputed when one of their inputs changed, otherwise reused.")
+        st.dataframe(
+            [{"Stage": event.stage, "Recomputed": event.recomputed, "Reason": event.reason, "Version": event.version}
+             for event in cov_input.stages.events],
+            hide_index=True,
+            use_container_width=True,
         )
-    
-show_footer()
\ No newline at end of file
+
+        st.caption("Spans of this rerun. Bytes are downloaded, uploaded or rendered for the page.")
+        st.dataframe(tracer.summary(), hide_index=True, use_container_width=True)
+        st.checkbox("Track peak allocations", key="trace_memory",
+                    help="Record the peak Python allocations of each span from the next rerun on. Slows reruns down.")
+
+        c1, c2 = st.columns(2)
+        with c1:
+            st.download_button("Download spans (JSON)", tracer.to_json(), file_name="pdbcov-trace.json",
+                               mime="application/json", use_container_width=True)
+        with c2:
+            st.download_button("Download OTLP trace", json.dumps(tracer.to_otlp()), file_name="pdbcov-otlp.json",
+                               mime="application/json", use_container_width=True)
+
+show_footer()
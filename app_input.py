@@ -1,23 +1,29 @@
 from dataclasses import dataclass
-from typing import Any, List, Optional
+from typing import Any, Dict, List, Optional
 
 import matplotlib as mpl
-from matplotlib.pyplot import colormaps
 import numpy as np
 import peptacular as pt
-from requests import HTTPError
-import requests
 import streamlit_permalink as stp
 import streamlit as st
 from constants import *
-import tempfile
 import matplotlib.colors as mcolors
-from Bio import PDB
 
+from alphafold import get_structure_content
+from color_utils import hex_colors
+from coverage_engine import coverage
+from peptide_utils import filter_peptides
+from pipeline import StageCache
+from structure_io import parse_structure
+from tracing import trace
 from util import (
     get_predictions,
     compressor,
+    coverage_string,
+    coverage_track_svg,
     decompressor,
+    mol_html,
+    parse_peptide_lines,
 )
 
 PROTEIN_ID_TYPE = "Protein ID"
@@ -50,6 +56,18 @@ class InputType:
         raise NotImplementedError(
             "This method should be implemented in subclasses to return the PDB content."
         )
+
+    @property
+    def pdb_format(self) -> str:
+        """Return the viewer format of the structure content, ``pdb`` or ``cif``."""
+        return "pdb"
+
+    @property
+    def cache_key(self) -> tuple:
+        """Return the inputs that determine the setup result, used to reuse it across reruns."""
+        raise NotImplementedError(
+            "This method should be implemented in subclasses to return the setup inputs."
+        )
     
     @property
     def title(self) -> Optional[str]:
@@ -73,11 +91,15 @@ class ProteinID(InputType):
         super().__init__()
         self.protein_id = protein_id
         self.predictions = None
+        self._pdb_content = None
+        self._pdb_format = "pdb"
 
     def setup(self):
         if not self.protein_id:
             raise ValueError("Protein ID cannot be empty.")
-        
+
+        from requests import HTTPError
+
         try:
             predictions = get_predictions(self.protein_id)
         except HTTPError as e:
@@ -95,6 +117,10 @@ class ProteinID(InputType):
         
         self.predictions = predictions
 
+    @property
+    def cache_key(self) -> tuple:
+        return (PROTEIN_ID_TYPE, self.protein_id)
+
     @property
     def protein_sequence(self) -> Optional[str]:
         """Return the protein sequence from the predictions."""        
@@ -104,19 +130,21 @@ class ProteinID(InputType):
     @property
     def pdb_content(self) -> Optional[Any]:
 
-        if "pdbUrl" not in self.predictions[0]:
-            raise ValueError(
-                f"No PDB URL found for Protein ID {self.protein_id}."
-            )
-
-        pdb_url = self.predictions[0].get("pdbUrl", None)
+        pdb_url = self.predictions[0].get("pdbUrl") or self.predictions[0].get("cifUrl")
 
         if not pdb_url:
             raise ValueError(
                 f"No PDB URL found for Protein ID {self.protein_id}."
             )
-        
-        return requests.get(pdb_url).content.decode("utf-8")
+
+        if self._pdb_content is None:
+            self._pdb_content, self._pdb_format = get_structure_content(self.predictions[0])
+        return self._pdb_content
+
+    @property
+    def pdb_format(self) -> str:
+        """Return the viewer format of the structure content."""
+        return self._pdb_format
     
     @property
     def title(self) -> Optional[str]:
@@ -142,44 +170,27 @@ class PDBFile(InputType):
         self._subtitle = None
         self._protein_sequence = None
         self._pdb_content = None
+        self._pdb_format = "pdb"
 
     def setup(self):
         if self.pdb_file is not None:
-            self._pdb_content = self.pdb_file.read()
-
-            # Create temporary PDB file using context manager
-            with tempfile.NamedTemporaryFile(suffix='.pdb', delete=True) as temp_pdb:
-                # Handle both string and bytes content
-                if isinstance(self._pdb_content, str):
-                    temp_pdb.write(self._pdb_content.encode('utf-8'))
-                else:
-                    temp_pdb.write(self._pdb_content)
-                temp_pdb.flush()  # Ensure all data is written to disk
-                # Extract the protein sequence
-                
-                parser = PDB.PDBParser(QUIET=True)
-                structure = parser.get_structure("uploaded_protein", temp_pdb.name)
-
-                _protein_sequence = ""
-                for model in structure:
-                    for chain in model:
-                        for residue in chain:
-                            # Skip water and hetero atoms
-                            if residue.id[0] == " ":
-                                resname = residue.resname.strip()
-                                # Convert three-letter code to one-letter code
-                                one_letter = pt.constants.THREE_LETTER_CODE_TO_AA.get(
-                                    resname.capitalize(), "X"
-                                )
-                                _protein_sequence += one_letter
-
-                self._protein_sequence = _protein_sequence
-                self._title = self.pdb_file.name
-                self._subtitle = None
-            self._pdb_content = self._pdb_content.decode("utf-8") if isinstance(self._pdb_content, bytes) else self._pdb_content
+            # Parsed results are cached by file content, so reruns with the same upload are free
+            structure = parse_structure(self.pdb_file.read(), self.pdb_file.name)
+
+            self._protein_sequence = structure.sequence
+            self._pdb_content = structure.content
+            self._pdb_format = structure.format
+            self._title = self.pdb_file.name
+            self._subtitle = None
         else:
             raise ValueError("PDB file cannot be None. Please upload a valid PDB file.")
 
+    @property
+    def cache_key(self) -> tuple:
+        if self.pdb_file is None:
+            return (PDB_FILE_TYPE, None)
+        return (PDB_FILE_TYPE, getattr(self.pdb_file, "file_id", None), self.pdb_file.name, self.pdb_file.size)
+
     @property
     def protein_sequence(self) -> Optional[str]:
         """Return the protein sequence if available."""
@@ -194,6 +205,11 @@ class PDBFile(InputType):
         if self._pdb_content is None:
             raise ValueError("PDB content is not available. Please check the PDB file.")
         return self._pdb_content
+
+    @property
+    def pdb_format(self) -> str:
+        """Return the viewer format of the uploaded structure."""
+        return self._pdb_format
     
     @property
     def title(self) -> Optional[str]:
@@ -215,7 +231,11 @@ class ProteinSequence(InputType):
     def setup(self):
         if not self.sequence:
             raise ValueError("Protein sequence cannot be empty.")
-        
+
+    @property
+    def cache_key(self) -> tuple:
+        return (PROTEIN_SEQUENCE_TYPE, self.sequence)
+
     @property
     def protein_sequence(self) -> Optional[str]:
         """Return the protein sequence."""
@@ -243,7 +263,7 @@ class CoverageAppConfig:
 
     def __init__(self,
                  input_type: InputType,
-                 peptides: list[str],
+                 peptides: Dict[str, int],
                  color_map: str,
                  reverse: bool,
                  pdb_style: str,
@@ -257,7 +277,8 @@ class CoverageAppConfig:
                 user_title: Optional[str],
                 user_subtitle: Optional[str],
                 colorbar_min: Optional[float],
-                colorbar_max: Optional[float]):
+                colorbar_max: Optional[float],
+                stages: Optional[StageCache] = None):
         
         self.input_type = input_type
         self.peptides = peptides
@@ -276,10 +297,43 @@ class CoverageAppConfig:
         self.colorbar_min = colorbar_min
         self.colorbar_max = colorbar_max
 
+        # Stage results keyed by the inputs they were derived from, shared across reruns when passed in
+        self.stages = stages if stages is not None else StageCache()
+
+    @property
+    def _peptides_inputs(self) -> dict:
+        """Inputs that determine the filtered peptides."""
+        return {"peptides": tuple(self.peptides.items()), "strip_mods": self.strip_mods,
+                "filter_unique": self.filter_unique, "consider_ambiguity": self.consider_ambiguity}
+
+    @property
+    def _coverage_inputs(self) -> dict:
+        """Inputs that determine the coverage array."""
+        self.weighted_peptides  # resolve the upstream stage so its version is current
+        return {"peptides": self.stages.version("peptides"), "protein_sequence": self.protein_sequence,
+                "binary_coverage": self.binary_coverage}
+
+    @property
+    def _clamped_inputs(self) -> dict:
+        """Inputs that determine the clamped coverage array."""
+        self.coverage_array  # resolve the upstream stage so its version is current
+        return {"coverage": self.stages.version("coverage"),
+                "colorbar_min": self.colorbar_min, "colorbar_max": self.colorbar_max}
+
+    @property
+    def _colors_inputs(self) -> dict:
+        """Inputs that determine the per-residue colors."""
+        self.color_coverage_array  # resolve the upstream stage so its version is current
+        return {"clamped": self.stages.version("clamped"), "color_map": self.color_map}
 
     def setup(self):
-        """Setup the input type and validate the configuration."""
-        self.input_type.setup()
+        """Setup the input type and validate the configuration. A set up input with the same key is reused."""
+        self.input_type = self.stages.get("input", {"input": self.input_type.cache_key}, self._setup_input)
+
+    def _setup_input(self) -> InputType:
+        with trace("input.setup", input_type=type(self.input_type).__name__):
+            self.input_type.setup()
+        return self.input_type
 
     @property
     def highlight_residues(self) -> List[str]:
@@ -291,29 +345,21 @@ class CoverageAppConfig:
         return highlight_residues
 
     @property
-    def filtered_peptides(self) -> List[str]:
-        """Return the filtered peptides based on the configuration."""
-
-        annots = list(map(lambda x: pt.parse(x), self.peptides))
-
-        for annot in annots:
-            annot.condense_static_mods(inplace=True)
-            annot.isotope_mods = None
-            annot.labile_mods = None
-
-        if self.strip_mods:
-            annots = [x.strip() for x in annots]
-
-        if not self.consider_ambiguity:
-            for annot in annots:
-                annot.intervals = None
-
-        sequences = [x.serialize() for x in annots]
-
-        if self.filter_unique:
-            sequences = set(sequences)            
+    def weighted_peptides(self) -> Dict[str, int]:
+        """Return the filtered peptides mapped to the number of times they were observed."""
+        return self.stages.get(
+            "peptides",
+            self._peptides_inputs,
+            lambda: filter_peptides(self.peptides,
+                                    strip_mods=self.strip_mods,
+                                    filter_unique=self.filter_unique,
+                                    consider_ambiguity=self.consider_ambiguity),
+        )
 
-        return list(sequences)
+    @property
+    def filtered_peptides(self) -> List[str]:
+        """Return the distinct filtered peptides based on the configuration."""
+        return list(self.weighted_peptides)
 
     @property
     def protein_sequence(self) -> Optional[str]:
@@ -326,6 +372,11 @@ class CoverageAppConfig:
     def pdb_content(self) -> Optional[Any]:
         """Return the PDB content from the input type."""
         return self.input_type.pdb_content
+
+    @property
+    def pdb_format(self) -> str:
+        """Return the viewer format of the PDB content."""
+        return self.input_type.pdb_format
     
     @property
     def title(self) -> Optional[str]:
@@ -344,59 +395,101 @@ class CoverageAppConfig:
     @property
     def coverage_array(self) -> np.ndarray:
         """Return the coverage array based on the peptides and protein sequence."""
-        print(self.filtered_peptides)
-        coverage_arr = np.array(pt.coverage(sequence=self.protein_sequence, subsequences=self.filtered_peptides, accumulate=not self.binary_coverage, ignore_mods=True, ignore_ambiguity=False))
+        return self.stages.get("coverage", self._coverage_inputs, self._compute_coverage_array)
+
+    def _compute_coverage_array(self) -> np.ndarray:
+        weighted_peptides = self.weighted_peptides
+        protein_sequence = self.protein_sequence
+        coverage_arr = coverage(protein_sequence, list(weighted_peptides),
+                                accumulate=not self.binary_coverage, weights=list(weighted_peptides.values()))
 
         if self.binary_coverage:
             coverage_arr = np.where(coverage_arr > 0, 1, 0)
-        if len(coverage_arr) != len(self.protein_sequence):
+        if len(coverage_arr) != len(protein_sequence):
             raise ValueError(
-                f"Length of coverage array ({len(coverage_arr)}) does not match length of protein sequence ({len(self.protein_sequence)})."
+                f"Length of coverage array ({len(coverage_arr)}) does not match length of protein sequence ({len(protein_sequence)})."
             )
         return coverage_arr
     
     @property
     def color_coverage_array(self):
-        
+        return self.stages.get("clamped", self._clamped_inputs, self._compute_color_coverage_array)
+
+    def _compute_color_coverage_array(self) -> np.ndarray:
+        coverage_array = self.coverage_array
+
         vmin = 0
         if self.colorbar_min is not None:
             vmin = self.colorbar_min
         
-        vmax = max(self.coverage_array.max(), 1)
+        vmax = max(coverage_array.max(), 1)
         if self.colorbar_max is not None:
             vmax = self.colorbar_max
 
         # Clamp values to the specified range
-        clamped_array = np.clip(self.coverage_array, vmin, vmax)
+        clamped_array = np.clip(coverage_array, vmin, vmax)
 
         return clamped_array
     
 
     @property
     def color_gradient_hex_array(self) -> list[str]:
+        return self.stages.get("colors", self._colors_inputs, self._compute_color_gradient_hex_array)
 
-        color_min = self.colorbar_min if self.colorbar_min is not None else self.color_coverage_array.min()
-        color_max = self.colorbar_max if self.colorbar_max is not None else self.color_coverage_array.max()
+    def _compute_color_gradient_hex_array(self) -> list[str]:
+        coverage_array = self.coverage_array
+        color_coverage_array = self.color_coverage_array
+        protein_sequence = self.protein_sequence
 
-        normalized_values = (self.color_coverage_array - color_min) / (color_max - color_min)
+        color_min = self.colorbar_min if self.colorbar_min is not None else color_coverage_array.min()
+        color_max = self.colorbar_max if self.colorbar_max is not None else color_coverage_array.max()
 
-        color_map_function = colormaps[self.color_map]
-        color_gradient_array = color_map_function(normalized_values)
-        color_gradient_hex_array = [
-            f"#{int(r * 255):02x}{int(g * 255):02x}{int(b * 255):02x}"
-            for r, g, b, _ in color_gradient_array
-        ]
+        color_gradient_hex_array = hex_colors(color_coverage_array, self.color_map, color_min, color_max).tolist()
 
-        if sum(self.coverage_array) == 0:
+        if sum(coverage_array) == 0:
             color_gradient_hex_array = ["#FFFFFF"] * len(color_gradient_hex_array)
 
-        if len(self.protein_sequence) != len(self.coverage_array):
+        if len(protein_sequence) != len(coverage_array):
             raise ValueError(
-                f"Length of coverage array ({len(self.coverage_array)}) does not match length of protein sequence ({len(self.protein_sequence)})."
+                f"Length of coverage array ({len(coverage_array)}) does not match length of protein sequence ({len(protein_sequence)})."
             )
         
         return color_gradient_hex_array
     
+    @property
+    def coverage_track(self) -> str:
+        """Return the coverage track SVG."""
+        inputs = self._colors_inputs
+        inputs.update(vmin=self.vmin, vmax=self.vmax)
+        return self.stages.get("track", inputs, lambda: coverage_track_svg(self.color_coverage_array, self.color_map,
+                                                                           vmin=self.vmin, vmax=self.vmax))
+
+    @property
+    def structure_html(self) -> Optional[str]:
+        """Return the 3D viewer HTML of the structure colored by coverage, or None without a structure."""
+        pdb_content = self.pdb_content
+        if pdb_content is None:
+            return None
+
+        self.color_gradient_hex_array  # resolve the upstream stage so its version is current
+        inputs = {"input": self.stages.version("input"), "colors": self.stages.version("colors"),
+                  "pdb_style": self.pdb_style, "bcolor": self.bcolor,
+                  "highlight_residues": tuple(self.highlight_residues), "auto_spin": self.auto_spin}
+        return self.stages.get("structure", inputs, lambda: mol_html(pdb_content, self.color_gradient_hex_array,
+                                                                     self.pdb_style, self.bcolor,
+                                                                     self.highlight_residues, self.auto_spin,
+                                                                     fmt=self.pdb_format))
+
+    @property
+    def sequence_html(self) -> str:
+        """Return the HTML of the protein sequence colored by coverage."""
+        inputs = self._colors_inputs
+        inputs.update(coverage=self.stages.version("coverage"), vmin=self.vmin, vmax=self.vmax)
+        return self.stages.get("sequence", inputs, lambda: coverage_string(self.coverage_array, self.protein_sequence,
+                                                                           self.cmap,
+                                                                           color_coverage=self.color_coverage_array,
+                                                                           vmin=self.vmin, vmax=self.vmax))
+
     @property
     def cmap(self) -> mcolors.Colormap:
         """Return the color map object based on the selected color map."""
@@ -422,6 +515,10 @@ class CoverageAppConfig:
 
 def get_input() -> CoverageAppConfig:
     """Get input from the user or URL parameters."""
+    # Stage results are kept for the session, so reruns only recompute stages whose inputs changed
+    stages = st.session_state.setdefault("pipeline_stages", StageCache())
+    stages.start_run()
+
     # Get URL parameters
     
     input_type = stp.radio(
@@ -445,8 +542,8 @@ def get_input() -> CoverageAppConfig:
     elif input_type == PDB_FILE_TYPE:
         pdb_file = st.file_uploader(
             "Upload PDB File",
-            type=["pdb"],
-            help="Upload a PDB file to visualize its coverage.",
+            type=["pdb", "ent", "cif", "mmcif", "bcif", "gz"],
+            help="Upload a PDB, mmCIF or BinaryCIF file (optionally gzipped) to visualize its coverage.",
             key="pdb_file",
         )
         cov_input = PDBFile(pdb_file=pdb_file)
@@ -482,11 +579,9 @@ def get_input() -> CoverageAppConfig:
         compress=True
     )
 
-    peptides = []
+    peptides = {}
     if peptides_input:
-        peptides = peptides_input.split("\n")
-
-    peptides = [p.strip() for p in peptides]
+        peptides = parse_peptide_lines(peptides_input)
 
 
 
@@ -628,4 +723,5 @@ def get_input() -> CoverageAppConfig:
         user_subtitle=user_subtitle,
         colorbar_min=colorbar_min,
         colorbar_max=colorbar_max,
+        stages=stages,
     )
\ No newline at end of file
@@ -10,13 +10,14 @@ from streamlit_js_eval import get_page_location
 import matplotlib as mpl
 import matplotlib.colors as mcolors
 
-from constants import DEFAULT_PROTEIN_ID, COLOR_MAPS, DEFAULT_PEPTIDES, DEFAULT_COLOR_MAP
+from constants import DEFAULT_PROTEIN_ID, COLOR_MAPS, DEFAULT_PEPTIDES, DEFAULT_COLOR_MAP, PEPTIDE_STORE_LINKS
 from util import (
     get_predictions,
     render_mol,
     plot_coverage_array,
     compressor,
     decompressor,
+    parse_peptide_lines,
     get_query_params_url,
     shorten_url,
 )
@@ -191,7 +192,7 @@ with st.sidebar:
 
     peptides = []
     if peptide_str:
-        peptides = peptide_str.split("\n")
+        peptides = [peptide for peptide, count in parse_peptide_lines(peptide_str).items() for _ in range(count)]
 
     with st.expander("Additional Options"):
         color_map = stp.selectbox(
@@ -240,7 +241,7 @@ with top_window:
 
         st.caption(
             f"""**This pages URL automatically updates with your input, and can be shared with others. 
-                   You can optionally use the Generate TinyURL button to create a shortened URL.**""",
+                   You can optionally use the Generate Short URL button to create a shortened URL.**""",
             unsafe_allow_html=True,
         )
 
@@ -378,13 +379,16 @@ with top_window:
 
             st.caption(
                 '''**This pages URL automatically updates with your input, and can be shared with others. 
-            You can also click on the 'Generate TinyURL' button to create a shortened URL.**''',
+            You can also click on the 'Generate Short URL' button to create a shortened URL.**''',
                 unsafe_allow_html=True,
             )
 
-            if button_c.button("Generate TinyURL", key="generate_tinyurl", type="primary"):
+            if button_c.button("Generate Short URL", key="generate_tinyurl", type="primary"):
                 short_url = shorten_url(stp.get_page_url())
                 st.caption(f"Shortened URL: {short_url}")
+                if PEPTIDE_STORE_LINKS:
+                    st.caption("The peptides of this link are kept on this server only: the link does not work on "
+                               "other deployments and may expire when the peptide store is full.")
 
         url_fragment()
 
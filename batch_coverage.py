@@ -0,0 +1,153 @@
+"""
+Headless batch coverage for whole search results.
+
+Reads a Sage parquet, DIA-NN report or DTASelect-filter file, computes the coverage of every protein across a
+process pool and writes one Parquet row per protein with the per-residue coverage and summary statistics.
+
+Usage:
+    python batch_coverage.py results.sage.parquet -o coverage.parquet --fasta proteome.fasta
+"""
+import argparse
+import os
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from coverage_engine import coverage_many
+from readers import ProteinPeptides, protein_accession, read_diann, read_dta_select, read_fasta, read_sage
+
+INPUT_FORMATS = ("sage", "diann", "dta")
+
+
+def detect_input_format(path: str) -> str:
+    """Guess the search engine of a results file from its name."""
+    name = os.path.basename(path).lower()
+    if name.endswith(".parquet") and "report" not in name:
+        return "sage"
+    if name.endswith((".tsv", ".csv", ".parquet")) or "report" in name:
+        return "diann"
+    if name.endswith(".txt"):
+        return "dta"
+    raise ValueError(f"Cannot detect the format of {path}, pass --format {'/'.join(INPUT_FORMATS)}.")
+
+
+def read_results(path: str, input_format: str, q_value_type: str = "peptide_q",
+                 q_value_threshold: float = 0.01) -> ProteinPeptides:
+    """Read weighted peptides per protein from a results file of the given format."""
+    if input_format == "sage":
+        return read_sage(path, q_value_type, q_value_threshold)
+    if input_format == "diann":
+        return read_diann(path)
+    if input_format == "dta":
+        return read_dta_select(path)
+    raise ValueError(f"Invalid input format: {input_format}. Expected one of {INPUT_FORMATS}.")
+
+
+def alphafold_sequences(accessions: Iterable[str], max_workers: int = 8) -> Dict[str, str]:
+    """Look up UniProt sequences through the (cached) AlphaFold prediction metadata."""
+    import alphafold
+
+    accessions = list(dict.fromkeys(accessions))
+    alphafold.prefetch(accessions, structures=False, max_workers=max_workers)
+
+    sequences = {}
+    for accession in accessions:
+        try:
+            predictions = alphafold.get_predictions(accession)
+        except Exception:
+            continue
+        if predictions and predictions[0].get("uniprotSequence"):
+            sequences[accession] = predictions[0]["uniprotSequence"]
+    return sequences
+
+
+def coverage_row(protein: str, peptides: Dict[str, int], coverage_arr: np.ndarray) -> dict:
+    """Build the output row of one protein: its coverage and summary statistics."""
+    covered = int(np.count_nonzero(coverage_arr))
+    return {
+        "protein": protein,
+        "accession": protein_accession(protein),
+        "length": len(coverage_arr),
+        "peptides": len(peptides),
+        "spectra": int(sum(peptides.values())),
+        "covered_residues": covered,
+        "coverage_fraction": covered / len(coverage_arr) if len(coverage_arr) else 0.0,
+        "max_coverage": int(coverage_arr.max()) if len(coverage_arr) else 0,
+        "mean_coverage": float(coverage_arr.mean()) if len(coverage_arr) else 0.0,
+        "coverage": coverage_arr.astype(np.int32),
+    }
+
+
+def batch_coverage(protein_peptides: ProteinPeptides, sequences: Dict[str, str], max_workers: Optional[int] = None,
+                   binary: bool = False, strip_mods: bool = False, filter_unique: bool = False,
+                   consider_ambiguity: bool = True) -> List[dict]:
+    """
+    Compute coverage rows for every protein that has a sequence, in parallel across a process pool.
+
+    Proteins are looked up in ``sequences`` by identifier first and accession second. Coverage uses the same
+    peptide filtering and engine as the viewer (see ``coverage_engine.coverage_many``); the peptide and
+    spectrum counts are those of the input.
+    """
+    protein_sequences = {}
+    for protein in protein_peptides:
+        sequence = sequences.get(protein) or sequences.get(protein_accession(protein))
+        if sequence:
+            protein_sequences[protein] = sequence
+
+    coverages = coverage_many(protein_sequences, protein_peptides, accumulate=not binary, strip_mods=strip_mods,
+                              filter_unique=filter_unique, consider_ambiguity=consider_ambiguity,
+                              max_workers=max_workers)
+
+    return [coverage_row(protein, protein_peptides[protein], coverage_arr)
+            for protein, coverage_arr in coverages.items()]
+
+
+def write_parquet(rows: Iterable[dict], path: str):
+    """Write coverage rows to Parquet, storing the per-residue coverage as a list<int32> column."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    rows: List[dict] = list(rows)
+    columns = {name: [row[name] for row in rows] for name in (rows[0] if rows else {})}
+    if rows:
+        coverage_arrays = columns.pop("coverage")
+        offsets = np.concatenate(([0], np.cumsum([len(arr) for arr in coverage_arrays]))).astype(np.int32)
+        columns["coverage"] = pa.ListArray.from_arrays(pa.array(offsets),
+                                                       pa.array(np.concatenate(coverage_arrays), type=pa.int32()))
+    pq.write_table(pa.table(columns), path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute per-protein coverage for a search result.")
+    parser.add_argument("input", help="Sage parquet, DIA-NN report (tsv/csv/parquet) or DTASelect-filter file")
+    parser.add_argument("-o", "--output", required=True, help="Output Parquet file")
+    parser.add_argument("--format", choices=INPUT_FORMATS, help="Input format, detected from the file name")
+    parser.add_argument("--fasta", help="Protein sequences, otherwise they are looked up on AlphaFold")
+    parser.add_argument("--q-value-type", default="peptide_q", help="Sage q-value column used for filtering")
+    parser.add_argument("--q-value", type=float, default=0.01, help="Maximum Sage q-value")
+    parser.add_argument("--binary", action="store_true", help="Binary instead of accumulated coverage")
+    parser.add_argument("--strip-mods", action="store_true", help="Strip modifications from peptides")
+    parser.add_argument("--filter-unique", action="store_true", help="Count every distinct peptide once")
+    parser.add_argument("--ignore-ambiguity", action="store_true", help="Count ambiguous residues as covered")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="Number of worker processes")
+    args = parser.parse_args()
+
+    input_format = args.format or detect_input_format(args.input)
+    protein_peptides = read_results(args.input, input_format, args.q_value_type, args.q_value)
+
+    if args.fasta:
+        sequences = read_fasta(args.fasta)
+    else:
+        sequences = alphafold_sequences(protein_accession(protein) for protein in protein_peptides)
+
+    rows = batch_coverage(protein_peptides, sequences, max_workers=args.workers, binary=args.binary,
+                          strip_mods=args.strip_mods, filter_unique=args.filter_unique,
+                          consider_ambiguity=not args.ignore_ambiguity)
+    write_parquet(rows, args.output)
+
+    missing = len(protein_peptides) - len(rows)
+    print(f"Wrote coverage for {len(rows)} proteins to {args.output}, {missing} without a sequence.")
+
+
+if __name__ == "__main__":
+    main()
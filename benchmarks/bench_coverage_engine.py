@@ -0,0 +1,52 @@
+"""
+Compare the NumPy coverage engine against ``peptacular.coverage``.
+
+Usage:
+    python benchmarks/bench_coverage_engine.py
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import peptacular as pt
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from coverage_engine import coverage  # noqa: E402
+from synthetic import make_peptides, make_protein  # noqa: E402
+
+CASES = [
+    (500, 100),
+    (5_000, 2_000),
+    (35_000, 20_000),
+]
+
+
+def best_of(fn, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main():
+    print(f"{'residues':>9} {'peptides':>9} {'mode':>10} {'peptacular':>12} {'engine':>10} {'speedup':>8}")
+    for protein_length, peptide_count in CASES:
+        protein = make_protein(protein_length)
+        peptides = make_peptides(protein, peptide_count)
+        for accumulate in (True, False):
+            t_pt, expected = best_of(lambda: pt.coverage(protein, peptides, accumulate=accumulate,
+                                                         ignore_mods=True, ignore_ambiguity=False), repeat=1)
+            t_engine, result = best_of(lambda: coverage(protein, peptides, accumulate=accumulate))
+            assert np.array_equal(result, np.array(expected)), "coverage engines disagree"
+            mode = "accumulate" if accumulate else "binary"
+            print(f"{protein_length:>9} {peptide_count:>9} {mode:>10} {t_pt:>11.3f}s {t_engine:>9.3f}s "
+                  f"{t_pt / t_engine:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
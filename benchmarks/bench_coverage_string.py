@@ -0,0 +1,81 @@
+"""
+Compare the per-residue inline-style coverage HTML against the vectorized CSS-class builder.
+
+Usage:
+    python benchmarks/bench_coverage_string.py
+"""
+import os
+import sys
+import time
+
+import matplotlib as mpl
+import matplotlib.colors as mcolors
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from coverage_engine import coverage  # noqa: E402
+from synthetic import make_peptides, make_protein  # noqa: E402
+from util import coverage_string  # noqa: E402
+
+CASES = [
+    (500, 100),
+    (5_000, 1_000),
+    (35_000, 7_000),
+]
+
+
+def legacy_coverage_string(protein_cov_arr, stripped_protein_sequence, cmap, color_coverage, vmin=None, vmax=None):
+    """The original builder: inline styles, one colormap call per residue and repeated concatenation."""
+    protein_cov = '<span style="font-family: Courier New, monospace; font-size: 16px;">'
+    colorbar_min = vmin if vmin is not None else color_coverage.min()
+    colorbar_max = vmax if vmax is not None else color_coverage.max()
+    normalized_values = (color_coverage - colorbar_min) / (colorbar_max - colorbar_min)
+    for i, aa in enumerate(stripped_protein_sequence):
+        coverage = protein_cov_arr[i]
+        hex_color = mcolors.to_hex(cmap(normalized_values[i]))
+        if coverage > 0:
+            protein_cov += (
+                f'<span title="Index: {i + 1}; Coverage: {coverage}" style="background-color'
+                f":#e0e0ff; color:{hex_color}; font-weight:900; padding:3px; margin:1px; "
+                f'border:1px solid #a0a0ff; border-radius:3px;">{aa}</span>'
+            )
+        else:
+            protein_cov += (
+                f'<span title="Index: {i + 1}" style="background-color:#f0f0f0; color:{hex_color}; '
+                f"font-weight:900; padding:3px; margin:1px; border:1px solid #cccccc; "
+                f'border-radius:3px;">{aa}</span>'
+            )
+    protein_cov += "</span>"
+    return protein_cov
+
+
+def best_of(fn, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main():
+    cmap = mpl.colormaps.get_cmap("viridis")
+    print(f"{'residues':>9} {'legacy s':>9} {'vector s':>9} {'speedup':>8} {'legacy KB':>10} {'vector KB':>10} "
+          f"{'ratio':>6}")
+    for protein_length, peptide_count in CASES:
+        protein = make_protein(protein_length)
+        coverage_array = coverage(protein, make_peptides(protein, peptide_count))
+
+        legacy_time, legacy_html = best_of(
+            lambda: legacy_coverage_string(coverage_array, protein, cmap, coverage_array))
+        vector_time, vector_html = best_of(
+            lambda: coverage_string(coverage_array, protein, cmap, coverage_array))
+
+        legacy_bytes, vector_bytes = len(legacy_html.encode()), len(vector_html.encode())
+        print(f"{protein_length:>9} {legacy_time:>9.3f} {vector_time:>9.3f} {legacy_time / vector_time:>7.1f}x "
+              f"{legacy_bytes / 1024:>10.1f} {vector_bytes / 1024:>10.1f} {legacy_bytes / vector_bytes:>5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
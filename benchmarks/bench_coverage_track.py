@@ -0,0 +1,97 @@
+"""
+Track per-rerun latency and RSS growth of the coverage track renderers over many reruns.
+
+Each renderer runs in a fresh worker process and renders the same coverage array RERUNS times, the way a
+Streamlit rerun would: the pyplot renderer is the original ``plot_coverage_array`` (figures are never
+closed) followed by the PNG export ``st.pyplot`` performs.
+
+Usage:
+    python benchmarks/bench_coverage_track.py
+"""
+import io
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+from matplotlib import pyplot as plt  # noqa: E402
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from coverage_engine import coverage  # noqa: E402
+from synthetic import make_peptides, make_protein  # noqa: E402
+from util import coverage_track_svg, plot_coverage_array  # noqa: E402
+
+RERUNS = 1000
+PROTEIN_LENGTH = 3_000
+PEPTIDE_COUNT = 500
+
+
+def legacy_plot_coverage_array(coverage_array, color_map, vmin=None, vmax=None):
+    """The original renderer: a new pyplot figure per call, never closed."""
+    fig, ax = plt.subplots(figsize=(10, 1))
+    cbar = ax.imshow([list(map(int, coverage_array))], aspect='auto', cmap=color_map, vmin=vmin, vmax=vmax)
+    fig.colorbar(cbar, orientation='horizontal')
+    ax.set_title('Protein Coverage')
+    ax.set_axis_off()
+    return fig
+
+
+def render_png(plot):
+    def render(coverage_array):
+        buffer = io.BytesIO()
+        plot(coverage_array, "viridis").savefig(buffer, format="png")
+        return buffer.getvalue()
+    return render
+
+
+def render_svg(coverage_array):
+    return coverage_track_svg(coverage_array, "viridis").encode()
+
+
+RENDERERS = {
+    "pyplot (legacy)": render_png(legacy_plot_coverage_array),
+    "Figure": render_png(plot_coverage_array),
+    "SVG": render_svg,
+}
+
+
+def rss_mb():
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+def run(name):
+    protein = make_protein(PROTEIN_LENGTH)
+    coverage_array = coverage(protein, make_peptides(protein, PEPTIDE_COUNT))
+    render = RENDERERS[name]
+
+    render(coverage_array)  # warm up imports and caches
+    start_rss = rss_mb()
+    start = time.perf_counter()
+    for _ in range(RERUNS):
+        size = len(render(coverage_array))
+    elapsed = time.perf_counter() - start
+
+    return elapsed / RERUNS, rss_mb() - start_rss, size
+
+
+def main():
+    print(f"{RERUNS} reruns, {PROTEIN_LENGTH} residues")
+    print(f"{'renderer':>16} {'ms/rerun':>9} {'RSS growth MB':>14} {'output KB':>10}")
+    for name in RENDERERS:
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            per_rerun, growth, size = executor.submit(run, name).result()
+        print(f"{name:>16} {per_rerun * 1000:>9.2f} {growth:>14.1f} {size / 1024:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
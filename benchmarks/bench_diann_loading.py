@@ -0,0 +1,112 @@
+"""
+Compare peak memory and time of the original DIA-NN link generator load against the streaming reader.
+
+A synthetic DIA-NN main report with its wide per-precursor columns is written as tsv and parquet to a
+temporary directory, and each loader runs in a fresh interpreter so its peak RSS above the imported libraries
+is measured in isolation. The weighted peptides per protein of every loader are checked for equality.
+
+Usage:
+    python benchmarks/bench_diann_loading.py
+"""
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+ROWS = 2_000_000
+ROW_GROUP_SIZE = 200_000
+SELECTED_SAMPLES = 6
+
+
+def load_full(path, samples):
+    """The original loader: the whole report, exploded, filtered and grouped in pandas."""
+    import pandas as pd
+
+    df = pd.read_csv(path, sep='\t')
+    df['Protein.Ids'] = df['Protein.Ids'].astype(str)
+    df['Protein.Ids'] = df['Protein.Ids'].str.split(';')
+    df = df.explode('Protein.Ids')
+    df['Protein.Ids'] = df['Protein.Ids'].str.strip()
+    df = df[df['Sample.Name'].isin(samples)]
+
+    grouped = {}
+    for protein_id, group in df.groupby('Protein.Ids'):
+        peptides = group['Stripped.Sequence'].dropna().astype(str).tolist()
+        if peptides:
+            grouped[protein_id] = dict(pd.Series(peptides).value_counts(sort=False))
+    return grouped
+
+
+def load_streaming(path, samples):
+    from readers import read_diann
+
+    return read_diann(path, samples)
+
+
+LOADERS = {"full": load_full, "streaming": load_streaming}
+
+
+def memory_mb(field):
+    """Read a memory field of this process, e.g. VmHWM (peak RSS) or VmRSS, in MB."""
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+def child(loader, path, result_path):
+    import pandas  # noqa: F401  imported up front so the baseline includes the libraries
+    import pyarrow.parquet  # noqa: F401
+
+    samples = [f"sample_{i:02d}" for i in range(SELECTED_SAMPLES)]
+    baseline = memory_mb("VmRSS")
+    start = time.perf_counter()
+    grouped = LOADERS[loader](path, samples)
+    elapsed = time.perf_counter() - start
+    peak = memory_mb("VmHWM") - baseline
+
+    with open(result_path, "wb") as f:
+        pickle.dump({protein: {peptide: int(count) for peptide, count in peptides.items()}
+                     for protein, peptides in grouped.items()}, f)
+    print(len(grouped), elapsed, peak)
+
+
+def main():
+    from synthetic import make_diann_report
+
+    with tempfile.TemporaryDirectory() as tmp:
+        report = make_diann_report(ROWS)
+        tsv_path = os.path.join(tmp, "report.tsv")
+        parquet_path = os.path.join(tmp, "report.parquet")
+        report.to_csv(tsv_path, sep="\t", index=False)
+        report.to_parquet(parquet_path, row_group_size=ROW_GROUP_SIZE)
+        del report
+        print(f"{ROWS:,} precursors, tsv {os.path.getsize(tsv_path) / 1024 ** 2:.0f} MB, "
+              f"parquet {os.path.getsize(parquet_path) / 1024 ** 2:.0f} MB")
+        print(f"{'loader':>10} {'input':>8} {'proteins':>9} {'time s':>7} {'peak MB':>8}")
+
+        results = []
+        for loader, path in [("full", tsv_path), ("streaming", tsv_path), ("streaming", parquet_path)]:
+            result_path = os.path.join(tmp, f"{loader}-{len(results)}.pickle")
+            output = subprocess.run([sys.executable, __file__, "--child", loader, path, result_path],
+                                    capture_output=True, text=True, check=True)
+            proteins, elapsed, peak = output.stdout.split()
+            print(f"{loader:>10} {os.path.splitext(path)[1][1:]:>8} {int(proteins):>9,} {float(elapsed):>7.2f} "
+                  f"{float(peak):>8.0f}")
+            with open(result_path, "rb") as f:
+                results.append(pickle.load(f))
+
+        assert all(result == results[0] for result in results[1:]), "weighted peptides differ"
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--child"]:
+        child(*sys.argv[2:])
+    else:
+        main()
@@ -0,0 +1,95 @@
+"""
+Compare the original per-group scan of the DTASelect link generator against ``readers.dta_group_peptides``.
+
+Synthetic DTASelect peptide and protein tables are built with IP2 sequences (flanking residues, mass-shift
+mods), redundancies including 0 and peptides shared across groups. The serialized peptides of every protein
+row are checked for equality before timing.
+
+Usage:
+    python benchmarks/bench_dta_grouping.py
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import peptacular as pt
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from readers import dta_group_peptides  # noqa: E402
+from synthetic import AMINO_ACIDS  # noqa: E402
+from util import serialize_peptides  # noqa: E402
+
+CASES = [
+    (500, 10_000),
+    (2_000, 50_000),
+]
+
+
+def make_dta_tables(groups, rows, seed=0):
+    """Return ``(peptide_df, protein_df)`` shaped like ``filterframes.from_dta_select_filter`` output."""
+    rng = np.random.default_rng(seed)
+    letters = np.array(list(AMINO_ACIDS))
+    distinct = rows // 4
+    lengths = rng.integers(7, 26, distinct)
+    sequences = ["".join(letters[rng.integers(0, 20, n)]) for n in lengths]
+    ip2 = [f"K.{s[:2]}M(15.9949){s[2:]}.R" if i % 10 == 0 else f"K.{s}.R" for i, s in enumerate(sequences)]
+
+    peptide_df = pd.DataFrame({
+        "ProteinGroup": np.sort(rng.integers(0, groups, rows)),
+        "Sequence": np.asarray(ip2, dtype=object)[rng.integers(0, distinct, rows)],
+        "Charge": rng.integers(2, 5, rows),
+        "Redundancy": rng.choice([0, 1, 1, 1, 2, 3, 8], rows),
+    })
+    # Two loci per group on average, like protein groups with isoforms
+    protein_df = pd.DataFrame({"ProteinGroup": np.repeat(np.arange(groups), 2)})
+    return peptide_df, protein_df
+
+
+def legacy_serialized(peptide_df, protein_df):
+    """The original dta_filter_app.py aggregation, scanning the peptide table once per group."""
+    peptide_df = peptide_df.copy()
+    peptide_df['ProformaSequence'] = peptide_df['Sequence'].apply(pt.convert_ip2_sequence)
+    peptide_df['ProformaSequenceCharge'] = peptide_df.apply(lambda x: pt.add_mods(x['ProformaSequence'],
+                                                                                  {'charge': x['Charge']}), axis=1)
+    peptide_df['StrippedProformaSequence'] = peptide_df['ProformaSequence'].apply(pt.strip_mods)
+
+    protein_group_to_peptides = {}
+    for protein_group in protein_df['ProteinGroup'].unique():
+        peptides = []
+        for i, row in peptide_df[peptide_df['ProteinGroup'] == protein_group].iterrows():
+            for _ in range(row['Redundancy']):
+                peptides.append(row['ProformaSequenceCharge'])
+
+        protein_group_to_peptides[protein_group] = peptides
+
+    return protein_df['ProteinGroup'].apply(lambda x: serialize_peptides(protein_group_to_peptides[x]))
+
+
+def grouped_serialized(peptide_df, protein_df):
+    protein_group_to_peptides = dta_group_peptides(peptide_df)
+    serialized_groups = {group: serialize_peptides(peptides) for group, peptides in protein_group_to_peptides.items()}
+    return protein_df['ProteinGroup'].map(serialized_groups).fillna('')
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    print(f"{'groups':>7} {'rows':>8} {'legacy s':>9} {'groupby s':>10} {'speedup':>8}")
+    for groups, rows in CASES:
+        peptide_df, protein_df = make_dta_tables(groups, rows)
+        legacy, legacy_time = timed(legacy_serialized, peptide_df, protein_df)
+        grouped, grouped_time = timed(grouped_serialized, peptide_df, protein_df)
+        assert legacy.tolist() == grouped.tolist(), "serialized peptides differ"
+        print(f"{groups:>7} {rows:>8,} {legacy_time:>9.2f} {grouped_time:>10.3f} {legacy_time / grouped_time:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Measure the cold-start import time of the modules ``app.py`` loads, using ``python -X importtime``.
+
+Reports the best total over a few fresh interpreters and the slowest direct imports of those modules, and
+fails if any module that should only load on demand (3D view, network, pyplot) is imported at startup.
+
+Usage:
+    python benchmarks/bench_import_time.py
+"""
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STARTUP_MODULES = ["app_input", "util"]
+DEFERRED = ["py3Dmol", "stmol", "requests", "matplotlib.pyplot", "matplotlib.figure", "IPython", "Bio"]
+RUNS = 5
+TOP = 10
+
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def import_times():
+    """Return ``{module: (cumulative_us, depth)}`` for one fresh interpreter."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {', '.join(STARTUP_MODULES)}"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    times = {}
+    for match in LINE.finditer(result.stderr):
+        _, cumulative, indent, module = match.groups()
+        times[module] = (int(cumulative), (len(indent) - 1) // 2)
+    return times
+
+
+def main():
+    runs = [import_times() for _ in range(RUNS)]
+    totals = [sum(run[module][0] for module in STARTUP_MODULES if module in run) for run in runs]
+    best = runs[totals.index(min(totals))]
+
+    print(f"import {', '.join(STARTUP_MODULES)}: best {min(totals) / 1e6:.3f}s over {RUNS} runs")
+    print(f"{'direct import':>24} {'cumulative s':>13}")
+    direct = sorted(((cumulative, module) for module, (cumulative, depth) in best.items() if depth == 1),
+                    reverse=True)
+    for cumulative, module in direct[:TOP]:
+        print(f"{module:>24} {cumulative / 1e6:>13.3f}")
+
+    eager = [module for module in DEFERRED if any(name == module or name.startswith(module + ".") for name in best)]
+    if eager:
+        print(f"Deferred modules imported at startup: {', '.join(eager)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Measure multi-protein coverage throughput as the number of worker processes grows.
+
+Peptide parse caches are cleared before every run so each configuration starts cold. The per-protein row is a
+naive ``executor.map`` over one task per protein, for comparison with the packed shards of ``coverage_many``.
+
+Usage:
+    python benchmarks/bench_parallel_coverage.py
+"""
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from coverage_engine import coverage, coverage_many, peptide_segments  # noqa: E402
+from peptide_utils import filter_peptides, normalize_peptide  # noqa: E402
+from synthetic import make_peptides, make_protein  # noqa: E402
+
+PROTEINS = 5_000
+
+
+def make_dataset(proteins=PROTEINS, seed=0):
+    rng = random.Random(seed)
+    sequences, peptides = {}, {}
+    for i in range(proteins):
+        protein = f"sp|P{i:05d}|PROT{i}_HUMAN"
+        sequences[protein] = make_protein(rng.randint(100, 1500), seed=i)
+        peptides[protein] = make_peptides(sequences[protein], rng.randint(5, 100), seed=i)
+    return sequences, peptides
+
+
+def clear_caches():
+    normalize_peptide.cache_clear()
+    peptide_segments.cache_clear()
+
+
+def protein_coverage(task):
+    sequence, peptides = task
+    weighted = filter_peptides(peptides, False, False, True)
+    return coverage(sequence, list(weighted), weights=list(weighted.values()))
+
+
+def per_protein(sequences, peptides, max_workers):
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(protein_coverage, [(sequences[p], peptides[p]) for p in peptides]))
+
+
+def timed(fn):
+    clear_caches()
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    sequences, peptides = make_dataset()
+    cpus = os.cpu_count() or 1
+    worker_counts = sorted({1, *[2 ** i for i in range(1, cpus.bit_length()) if 2 ** i <= cpus], cpus})
+
+    print(f"{PROTEINS} proteins, {sum(map(len, peptides.values())):,} peptides, {cpus} CPUs")
+    print(f"{'workers':>8} {'packed s':>9} {'proteins/s':>11} {'speedup':>8} {'per-protein s':>14}")
+    baseline = None
+    for workers in worker_counts:
+        packed = timed(lambda: coverage_many(sequences, peptides, max_workers=workers))
+        naive = timed(lambda: per_protein(sequences, peptides, workers))
+        baseline = baseline or packed
+        print(f"{workers:>8} {packed:>9.2f} {PROTEINS / packed:>11.0f} {baseline / packed:>7.2f}x {naive:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Compare Biopython structure parsing with the lightweight ``structure_io`` scanners, and the streaming
+readers for each supported structure format.
+
+Usage:
+    python benchmarks/bench_pdb_parse.py
+"""
+import gzip
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+import peptacular as pt
+from Bio import PDB
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from structure_io import clear_parse_cache, parse_structure, pdb_sequence  # noqa: E402
+from synthetic import make_bcif, make_pdb, make_protein  # noqa: E402
+
+CASES = [
+    # (residues per chain, atoms per residue, chains)
+    (300, 8, 1),
+    (2_500, 8, 2),
+    (3_000, 8, 2),
+]
+
+
+def biopython_sequence(content: bytes) -> str:
+    """The previous ``PDBFile.setup`` sequence extraction."""
+    structure = PDB.PDBParser(QUIET=True).get_structure("uploaded_protein", io.StringIO(content.decode("utf-8")))
+    sequence = []
+    for model in structure:
+        for chain in model:
+            for residue in chain:
+                if residue.id[0] == " ":
+                    sequence.append(pt.constants.THREE_LETTER_CODE_TO_AA.get(residue.resname.strip().capitalize(), "X"))
+    return "".join(sequence)
+
+
+def main():
+    print(f"{'atoms':>8} {'biopython':>10} {'scan':>9} {'rerun':>9}")
+    for residues, atoms_per_residue, chains in CASES:
+        content = make_pdb(make_protein(residues), atoms_per_residue=atoms_per_residue,
+                           chains="ABCD"[:chains], hetatms=50)
+
+        start = time.perf_counter()
+        expected = biopython_sequence(content)
+        t_bio = time.perf_counter() - start
+
+        clear_parse_cache()
+        start = time.perf_counter()
+        result = pdb_sequence(content)
+        t_scan = time.perf_counter() - start
+
+        start = time.perf_counter()
+        pdb_sequence(content)
+        t_rerun = time.perf_counter() - start
+
+        assert result == expected, "sequence extraction differs from Biopython"
+        print(f"{residues * atoms_per_residue * chains:>8} {t_bio * 1000:>8.1f}ms {t_scan * 1000:>7.1f}ms "
+              f"{t_rerun * 1000:>7.2f}ms")
+
+    compare_formats()
+
+
+def compare_formats(residues: int = 3_000, atoms_per_residue: int = 8):
+    """Parse the same structure from every supported format and check they agree."""
+    pdb = make_pdb(make_protein(residues), atoms_per_residue=atoms_per_residue, chains="AB")
+    structure = PDB.PDBParser(QUIET=True).get_structure("x", io.StringIO(pdb.decode("utf-8")))
+    writer = PDB.MMCIFIO()
+    writer.set_structure(structure)
+    buffer = io.StringIO()
+    writer.save(buffer)
+    cif = buffer.getvalue().encode("utf-8")
+    bcif = make_bcif(cif.decode("utf-8"))
+
+    files = {
+        "x.pdb": pdb,
+        "x.pdb.gz": gzip.compress(pdb),
+        "x.cif": cif,
+        "x.cif.gz": gzip.compress(cif),
+        "x.bcif": bcif,
+    }
+
+    print()
+    print(f"{'file':>9} {'bytes':>9} {'parse':>9} {'peak':>9} {'viewer':>9}")
+    expected = None
+    for name, content in files.items():
+        clear_parse_cache()
+        tracemalloc.start()
+        start = time.perf_counter()
+        parsed = parse_structure(content, name)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        expected = expected or (parsed.sequence, parsed.residue_numbers)
+        assert (parsed.sequence, parsed.residue_numbers) == expected, f"{name} parsed differently"
+        print(f"{name:>9} {len(content):>9} {elapsed * 1000:>7.1f}ms {peak / 1e6:>7.1f}MB "
+              f"{len(parsed.content) / 1e6:>7.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Measure the peptide set store behind short permalinks: link length, put throughput, lookup latency as the store
+grows, and size-based eviction.
+
+Real encoded peptide sets set the payload sizes; the bulk of the store is filled with random payloads of the
+same sizes so large stores build quickly. Everything runs against a store in a temporary directory.
+
+Usage:
+    python benchmarks/bench_peptide_store.py
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from urllib.parse import quote_plus
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from peptide_store import STORE_PREFIX, PeptideStore  # noqa: E402
+from synthetic import make_peptides, make_protein  # noqa: E402
+from util import compress_peptides, decompressor  # noqa: E402
+
+REAL_SETS = 300
+STORE_SIZES = [1_000, 10_000, 100_000]
+LOOKUPS = 2_000
+BATCH = 5_000
+
+
+def real_payloads(count=REAL_SETS, seed=0):
+    rng = random.Random(seed)
+    payloads = []
+    for i in range(count):
+        protein = make_protein(rng.randint(300, 2000), seed=i)
+        peptides = make_peptides(protein, rng.randint(20, 1500), unique=rng.randint(10, 400), seed=i)
+        payloads.append(compress_peptides({peptide: peptides.count(peptide) for peptide in dict.fromkeys(peptides)}))
+    return payloads
+
+
+def filler_payloads(count, lengths, seed=0):
+    rng = random.Random(seed)
+    alphabet = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_"
+    return ["~1" + "".join(rng.choices(alphabet, k=rng.choice(lengths))) for _ in range(count)]
+
+
+def main():
+    payloads = real_payloads()
+    lengths = [len(payload) for payload in payloads]
+    print(f"{REAL_SETS} encoded peptide sets: parameter median {np.median([len(quote_plus(p)) for p in payloads]):.0f}"
+          f" / max {max(len(quote_plus(p)) for p in payloads)} characters, "
+          f"store reference {len(STORE_PREFIX) + 12} characters")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = PeptideStore(os.path.join(tmp, "peptides.sqlite"), max_bytes=2 ** 40)
+        digests = store.put_many(payloads)
+        assert all(decompressor(store.get(digest)) == decompressor(payload)
+                   for digest, payload in zip(digests, payloads))
+
+        print(f"{'sets':>8} {'MB':>6} {'put us/set':>11} {'get us':>7}")
+        stored = len(payloads)
+        for size in STORE_SIZES:
+            added, put_s = 0, 0.0
+            while stored < size:
+                batch = filler_payloads(min(BATCH, size - stored), lengths, seed=stored)
+                start = time.perf_counter()
+                digests += store.put_many(batch)
+                put_s += time.perf_counter() - start
+                stored += len(batch)
+                added += len(batch)
+            put_us = put_s / max(added, 1) * 1e6
+
+            sample = random.Random(size).sample(digests, min(LOOKUPS, len(digests)))
+            start = time.perf_counter()
+            for digest in sample:
+                assert store.get(digest) is not None
+            get_us = (time.perf_counter() - start) / len(sample) * 1e6
+            print(f"{len(store):>8,} {store.total_bytes() / 1024 ** 2:>6.0f} {put_us:>11.0f} {get_us:>7.0f}")
+
+        # Evict down to half the stored bytes: the most recently used sets survive
+        store.max_bytes = store.total_bytes() // 2
+        recent = digests[-10:]
+        store.get(digests[0])
+        start = time.perf_counter()
+        store.put(payloads[1])
+        evict_s = time.perf_counter() - start
+        assert store.total_bytes() <= store.max_bytes
+        assert store.get(digests[0]) is not None and all(store.get(digest) is not None for digest in recent)
+        print(f"evicted to {len(store):,} sets / {store.total_bytes() / 1024 ** 2:.0f} MB "
+              f"(limit {store.max_bytes / 1024 ** 2:.0f} MB) in {evict_s:.2f}s")
+
+        start = time.perf_counter()
+        for payload in filler_payloads(100, lengths, seed=-1):
+            store.put(payload)
+        print(f"single put into the full store: {(time.perf_counter() - start) / 100 * 1e3:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Measure the AlphaFold prefetch pipeline against the local mock API.
+
+Usage:
+    python benchmarks/bench_prefetch.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from mock_alphafold import mock_alphafold  # noqa: E402
+
+PROTEINS = 200
+LATENCY = 0.02
+
+
+def main():
+    with mock_alphafold(latency=LATENCY) as base_url, tempfile.TemporaryDirectory() as cache_dir:
+        # Configuration is read at import time, so point it at the mock before importing the app modules
+        os.environ["ALPHAFOLD_API_URL"] = base_url
+        os.environ["PDBCOV_CACHE_DIR"] = cache_dir
+        import alphafold
+
+        accessions = [f"P{i:05d}" for i in range(PROTEINS)] + ["NOTFOUND1", "FLAKY1"]
+
+        for workers in (1, 8, 32):
+            # Fresh caches for every run
+            alphafold._prediction_store = alphafold.PredictionStore(
+                os.path.join(cache_dir, f"predictions-{workers}.sqlite"))
+            alphafold._structure_cache = alphafold.StructureCache(os.path.join(cache_dir, f"structures-{workers}"))
+
+            start = time.perf_counter()
+            failed = alphafold.prefetch(accessions, max_workers=workers, backoff=0.01)
+            elapsed = time.perf_counter() - start
+            assert set(failed) == {"NOTFOUND1"}, failed
+
+            start = time.perf_counter()
+            for accession in accessions[:PROTEINS]:
+                alphafold.get_structure_content(alphafold.get_predictions(accession)[0])
+            warm = time.perf_counter() - start
+
+            print(f"workers={workers:>3}  prefetch {elapsed:6.2f}s  "
+                  f"warm lookups {warm * 1000 / PROTEINS:6.3f} ms/protein")
+
+
+if __name__ == "__main__":
+    main()
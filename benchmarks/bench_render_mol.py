@@ -0,0 +1,81 @@
+"""
+Compare the py3Dmol HTML payload of per-residue styling against run-batched styling.
+
+The payload is what Streamlit ships to the browser and what the browser replays, so its size and the
+number of ``addStyle`` commands are used as a proxy for paint time.
+
+Usage:
+    python benchmarks/bench_render_mol.py
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import py3Dmol
+import stmol
+from matplotlib import colormaps
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from coverage_engine import coverage  # noqa: E402
+from synthetic import make_pdb, make_peptides, make_protein  # noqa: E402
+from util import build_view  # noqa: E402
+
+CASES = [
+    (300, 50),
+    (3_000, 500),
+    (10_000, 2_000),
+]
+
+
+def legacy_view(pdb, cov_arr, pdb_style, bcolor, highlight_residues, auto_spin, spin_speed=0.5, fmt='pdb'):
+    """The original renderer: one addStyle command per residue."""
+    view = py3Dmol.view()
+    view.addModel(pdb, fmt)
+    view.setStyle({}, {pdb_style: {}})
+    view.setBackgroundColor(bcolor)
+    for i, c in enumerate(cov_arr):
+        view.addStyle({"resi": i}, {pdb_style: {"color": c, "radius": 0.2}})
+    view.addResLabels({'resn': highlight_residues, })
+    stmol.add_hover(view)
+    view.spin(auto_spin, spin_speed)
+    view.zoomTo()
+    return view
+
+
+def hex_colors(coverage_array, color_map="viridis"):
+    normalized = (coverage_array - coverage_array.min()) / max(coverage_array.max() - coverage_array.min(), 1)
+    return [f"#{int(r * 255):02x}{int(g * 255):02x}{int(b * 255):02x}"
+            for r, g, b, _ in colormaps[color_map](normalized)]
+
+
+def measure(build, pdb, colors):
+    start = time.perf_counter()
+    view = build(pdb, colors, "cartoon", "#000000", [], False)
+    html = view._make_html()
+    elapsed = time.perf_counter() - start
+    # Subtract the model itself so only the styling overhead is compared
+    return len(html.encode()) - len(pdb), html.count("addStyle("), elapsed
+
+
+def main():
+    print(f"{'residues':>9} {'runs':>7} {'legacy KB':>10} {'batched KB':>11} {'legacy cmds':>12} "
+          f"{'batched cmds':>13} {'legacy s':>9} {'batched s':>10}")
+    for protein_length, peptide_count in CASES:
+        protein = make_protein(protein_length)
+        peptides = make_peptides(protein, peptide_count)
+        colors = hex_colors(coverage(protein, peptides))
+        pdb = make_pdb(protein).decode()
+        runs = 1 + int(np.count_nonzero(np.asarray(colors[1:]) != np.asarray(colors[:-1])))
+
+        legacy_bytes, legacy_cmds, legacy_time = measure(legacy_view, pdb, colors)
+        batched_bytes, batched_cmds, batched_time = measure(build_view, pdb, colors)
+
+        print(f"{protein_length:>9} {runs:>7} {legacy_bytes / 1024:>10.1f} {batched_bytes / 1024:>11.1f} "
+              f"{legacy_cmds:>12} {batched_cmds:>13} {legacy_time:>9.3f} {batched_time:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Compare the original row-wise Sage protein grouping against the vectorized pipeline in ``readers``.
+
+Outputs are checked for equality on the smaller case, and the exit status is 1 if they differ; the original
+implementation is skipped on the large one.
+
+Usage:
+    python benchmarks/bench_sage_grouping.py
+"""
+import os
+import sys
+import time
+from collections import defaultdict
+
+import pandas as pd
+import peptacular as pt
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from readers import charge_peptides, group_peptides, protein_table  # noqa: E402
+from synthetic import make_sage_psms  # noqa: E402
+from util import serialize_peptides  # noqa: E402
+
+CASES = [
+    (200_000, True),
+    (2_000_000, False),
+]
+
+
+def legacy_protein_table(filtered_psm_df):
+    """The original sage_app.py grouping, from the exploded PSMs to the protein table."""
+    filtered_psm_df['ProformaSequence'] = filtered_psm_df['peptide']
+    filtered_psm_df['ProformaSequenceCharge'] = filtered_psm_df.apply(
+        lambda x: pt.add_mods(x['ProformaSequence'], {'charge': x['charge']}), axis=1
+    )
+    protein_to_peptides = defaultdict(list)
+    for _, row in filtered_psm_df.iterrows():
+        protein_to_peptides[row['proteins']].append(row['ProformaSequenceCharge'])
+
+    protein_data = []
+    for protein, peptides in protein_to_peptides.items():
+        protein_parts = protein.split('|')
+        protein_id, db, gene = protein, None, None
+        if len(protein_parts) == 3:
+            db, protein_id, gene = protein_parts
+        protein_data.append({
+            'Protein': protein,
+            'ProteinID': protein_id,
+            'Database': db,
+            'Gene': gene,
+            'Unique Peptides': len(set([pt.strip_mods(p) for p in peptides])),
+            'Spectrum Count': len(peptides),
+            'SerializedPeptides': serialize_peptides(peptides),
+        })
+    return pd.DataFrame(protein_data)
+
+
+def vectorized_protein_table(filtered_psm_df):
+    protein_to_peptides = group_peptides(
+        filtered_psm_df['proteins'], charge_peptides(filtered_psm_df['peptide'], filtered_psm_df['charge']))
+    table = protein_table(protein_to_peptides)
+    # The serialized peptides of the original table, so the grouped peptides are compared too
+    table['SerializedPeptides'] = [serialize_peptides(protein_to_peptides[protein]) for protein in table['Protein']]
+    return table
+
+
+def explode_proteins(psm_df):
+    psm_df = psm_df.copy()
+    psm_df['proteins'] = psm_df['proteins'].str.split(';')
+    return psm_df.explode('proteins')
+
+
+def main():
+    print(f"{'PSMs':>10} {'legacy s':>9} {'vector s':>9} {'speedup':>8} {'identical':>10}")
+    mismatches = []
+    for rows, run_legacy in CASES:
+        psm_df = explode_proteins(make_sage_psms(rows))
+
+        start = time.perf_counter()
+        vectorized = vectorized_protein_table(psm_df.copy())
+        vector_time = time.perf_counter() - start
+
+        if not run_legacy:
+            print(f"{rows:>10,} {'-':>9} {vector_time:>9.2f} {'-':>8} {'-':>10}")
+            continue
+
+        start = time.perf_counter()
+        legacy = legacy_protein_table(psm_df.copy())
+        legacy_time = time.perf_counter() - start
+
+        try:
+            pd.testing.assert_frame_equal(legacy, vectorized)
+            identical = "yes"
+        except AssertionError as e:
+            identical = "NO"
+            mismatches.append(rows)
+            print(e)
+        print(f"{rows:>10,} {legacy_time:>9.2f} {vector_time:>9.2f} {legacy_time / vector_time:>7.1f}x "
+              f"{identical:>10}")
+
+    if mismatches:
+        print(f"Protein tables differ at {', '.join(f'{rows:,}' for rows in mismatches)} PSMs")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Compare peak memory and time of loading a Sage parquet in full against the pruned, pushed-down loader.
+
+A synthetic parquet with Sage's wide per-PSM columns (fragment intensities, scores, retention times) is written
+to a temporary directory, and each loader runs in a fresh interpreter so its peak RSS above the
+imported libraries is measured in isolation.
+
+Usage:
+    python benchmarks/bench_sage_loading.py
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+ROWS = 1_000_000
+ROW_GROUP_SIZE = 100_000
+Q_VALUE_TYPE = "peptide_q"
+THRESHOLDS = [0.01, 0.05]
+
+
+def load_full(path, threshold):
+    """The original loader: every column, filtered in pandas."""
+    import pandas as pd
+
+    psm_df = pd.read_parquet(path)
+    filtered_psm_df = psm_df[psm_df[Q_VALUE_TYPE] <= threshold].copy()
+    filtered_psm_df['proteins'] = filtered_psm_df['proteins'].str.split(';')
+    return filtered_psm_df.explode('proteins')
+
+
+def load_pruned(path, threshold):
+    from readers import explode_proteins, load_sage_psms
+
+    return explode_proteins(load_sage_psms(path, Q_VALUE_TYPE, threshold))
+
+
+LOADERS = {"full": load_full, "pruned": load_pruned}
+
+
+def memory_mb(field):
+    """Read a memory field of this process, e.g. VmHWM (peak RSS) or VmRSS, in MB."""
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+def child(loader, path, threshold):
+    import pandas  # noqa: F401  imported up front so the baseline includes the libraries
+    import pyarrow.parquet  # noqa: F401
+
+    baseline = memory_mb("VmRSS")
+    start = time.perf_counter()
+    rows = len(LOADERS[loader](path, float(threshold)))
+    elapsed = time.perf_counter() - start
+    print(rows, elapsed, memory_mb("VmHWM") - baseline)
+
+
+def main():
+    from synthetic import make_sage_psms
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "results.sage.parquet")
+        make_sage_psms(ROWS, extra_columns=True).to_parquet(path, row_group_size=ROW_GROUP_SIZE)
+        print(f"{ROWS:,} PSMs, parquet {os.path.getsize(path) / 1024 ** 2:.0f} MB")
+        print(f"{'threshold':>9} {'loader':>7} {'rows':>9} {'time s':>7} {'peak MB':>8}")
+
+        for threshold in THRESHOLDS:
+            for loader in LOADERS:
+                result = subprocess.run([sys.executable, __file__, "--child", loader, path, str(threshold)],
+                                        capture_output=True, text=True, check=True)
+                rows, elapsed, peak = result.stdout.split()
+                print(f"{threshold:>9} {loader:>7} {int(rows):>9,} {float(elapsed):>7.2f} {float(peak):>8.0f}")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--child"]:
+        child(*sys.argv[2:])
+    else:
+        main()
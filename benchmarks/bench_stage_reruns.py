@@ -0,0 +1,83 @@
+"""
+Measure app reruns through the pipeline stages of ``CoverageAppConfig`` without Streamlit.
+
+A config is rebuilt for every rerun, as ``get_input`` does, sharing one stage cache. The first run computes every
+stage; the following reruns change one setting at a time and report which stages were recomputed.
+
+Usage:
+    python benchmarks/bench_stage_reruns.py
+"""
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app_input import CoverageAppConfig, PDBFile  # noqa: E402
+from pipeline import StageCache  # noqa: E402
+from synthetic import make_pdb, make_peptides, make_protein  # noqa: E402
+
+RESIDUES = 5_000
+PEPTIDES = 50_000
+
+DEFAULTS = dict(color_map="coolwarm", reverse=False, pdb_style="cartoon", bcolor="#FFFFFF", selected_residue=[],
+                binary_coverage=False, strip_mods=False, filter_unique=False, consider_ambiguity=True,
+                auto_spin=False, user_title=None, user_subtitle=None, colorbar_min=None, colorbar_max=None)
+
+RERUNS = [
+    ("first run", {}),
+    ("no change", {}),
+    ("color_map", {"color_map": "viridis"}),
+    ("pdb_style", {"pdb_style": "stick"}),
+    ("auto_spin", {"auto_spin": True}),
+    ("colorbar_max", {"colorbar_max": 5}),
+    ("selected_residue", {"selected_residue": ["K"]}),
+    ("binary_coverage", {"binary_coverage": True}),
+]
+
+
+class Upload(io.BytesIO):
+    """Stands in for a Streamlit UploadedFile."""
+
+    def __init__(self, content: bytes, name: str):
+        super().__init__(content)
+        self.name = name
+        self.size = len(content)
+        self.file_id = "bench"
+
+
+def rerun(stages, upload, peptides, settings):
+    """One app rerun: build the config, set up the input and produce every rendering."""
+    upload.seek(0)
+    config = CoverageAppConfig(input_type=PDBFile(upload), peptides=peptides, stages=stages, **settings)
+    stages.start_run()
+    config.setup()
+    config.coverage_track
+    config.structure_html
+    config.sequence_html
+    return config
+
+
+def main():
+    sequence = make_protein(RESIDUES)
+    upload = Upload(make_pdb(sequence), "model.pdb")
+    peptide_list = make_peptides(sequence, PEPTIDES, unique=PEPTIDES // 10)
+    peptides = {peptide: peptide_list.count(peptide) for peptide in dict.fromkeys(peptide_list)}
+
+    print(f"{RESIDUES:,} residues, {PEPTIDES:,} peptides ({len(peptides):,} distinct)")
+    print(f"{'rerun':>17} {'ms':>8}  recomputed stages")
+    stages = StageCache()
+    settings = dict(DEFAULTS)
+    for label, change in RERUNS:
+        settings.update(change)
+        start = time.perf_counter()
+        config = rerun(stages, upload, peptides, settings)
+        elapsed = (time.perf_counter() - start) * 1e3
+        recomputed = [event.stage for event in config.stages.events if event.recomputed]
+        print(f"{label:>17} {elapsed:>8.1f}  {', '.join(recomputed) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
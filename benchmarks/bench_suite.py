@@ -0,0 +1,239 @@
+"""
+Benchmark suite for the coverage pipeline and the link generators, with regression thresholds.
+
+Every case runs on synthetic fixtures, without network access, at scales from a 100 residue protein with 10
+peptides to a 35k residue protein with 1M peptides:
+
+- peptide links: ``compressor``, ``decompressor`` and ``serialize_peptides``
+- pipeline stages of ``CoverageAppConfig``: ``filtered_peptides``, ``coverage_array`` and
+  ``color_gradient_hex_array``, each timed with its upstream stages already computed
+- renderers: ``coverage_string`` and ``mol_html``, the HTML generation of ``render_mol``
+- ``PDBFile.setup`` on an uploaded PDB file
+- end to end, the Sage and DTASelect link generator aggregation on generated parquet and DTASelect-filter files,
+  from reading the file to the encoded peptides of every protein
+
+The process-wide parse caches are cleared before every run, so the times are those of a first view. Each case
+reports the best of a few runs. Results are compared to the saved baseline and a case fails when it
+is ``--tolerance`` times slower than its baseline and at least ``NOISE_MS`` slower; the exit status is 1 if any
+case fails. Save a baseline on the machine that runs the checks.
+
+Usage:
+    python benchmarks/bench_suite.py [--quick] [--filter NAME] [--save] [--tolerance 2.0]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import filterframes  # noqa: E402
+
+import coverage_engine  # noqa: E402
+import peptide_utils  # noqa: E402
+import structure_io  # noqa: E402
+from app_input import CoverageAppConfig, PDBFile, ProteinSequence  # noqa: E402
+from bench_stage_reruns import DEFAULTS, Upload  # noqa: E402
+from pipeline import StageCache  # noqa: E402
+from readers import (  # noqa: E402
+    charge_peptides,
+    dta_group_peptides,
+    explode_proteins,
+    group_peptides,
+    load_sage_psms,
+    protein_table,
+)
+from synthetic import make_dta_select, make_pdb, make_peptides, make_protein, make_sage_psms  # noqa: E402
+from util import compressor, coverage_string, decompressor, mol_html, peptide_link_values, serialize_peptides  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "suite_baseline.json")
+
+# (residues, peptides): the peptides are spectra, about a tenth of them distinct past 1000
+SCALES = [(100, 10), (1_000, 1_000), (10_000, 100_000), (35_000, 1_000_000)]
+# Sage PSMs and DTASelect peptide lines of the end-to-end runs
+SAGE_ROWS = [10_000, 1_000_000]
+DTA_ROWS = [2_000, 100_000]
+QUICK_SCALES = 3
+QUICK_ROWS = 1
+
+ATOMS_PER_RESIDUE = 4
+MIN_TIME = 1.0
+MAX_RUNS = 10
+NOISE_MS = 2.0
+
+
+def measure(prepare):
+    """
+    Return the best wall time in ms of the callable returned by ``prepare``.
+
+    ``prepare`` is called before every run and is not timed, so each run starts from the same state. Runs are
+    repeated up to ``MAX_RUNS`` times or until ``MIN_TIME`` seconds have been spent.
+    """
+    times = []
+    while len(times) < MAX_RUNS and (not times or sum(times) < MIN_TIME):
+        run = prepare()
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1e3
+
+
+def clear_caches():
+    """Clear the process-wide peptide and structure parse caches, so every run is a first view."""
+    peptide_utils.normalize_peptide.cache_clear()
+    coverage_engine.peptide_segments.cache_clear()
+    structure_io.clear_parse_cache()
+
+
+def make_config(sequence, peptides):
+    """A config with an empty stage cache, after clearing the parse caches."""
+    clear_caches()
+    return CoverageAppConfig(input_type=ProteinSequence(sequence), peptides=peptides, stages=StageCache(),
+                             **DEFAULTS)
+
+
+def stage_cases(residues, count):
+    """Yield ``(case, prepare)`` for the peptide link, pipeline stage, renderer and setup cases at one scale."""
+    sequence = make_protein(residues)
+    peptide_list = make_peptides(sequence, count, unique=count if count <= 1_000 else count // 10)
+    peptides = dict(Counter(peptide_list))
+    peptide_text = "\n".join(peptide_list)
+    compressed = compressor(peptide_text)
+
+    yield "compressor", lambda: lambda: compressor(peptide_text)
+    yield "decompressor", lambda: lambda: decompressor(compressed)
+    yield "serialize_peptides", lambda: lambda: serialize_peptides(peptides)
+
+    def prepare_filtered():
+        config = make_config(sequence, peptides)
+        return lambda: config.filtered_peptides
+    yield "filtered_peptides", prepare_filtered
+
+    def prepare_coverage():
+        config = make_config(sequence, peptides)
+        config.weighted_peptides
+        coverage_engine.peptide_segments.cache_clear()
+        return lambda: config.coverage_array
+    yield "coverage_array", prepare_coverage
+
+    def prepare_colors():
+        config = make_config(sequence, peptides)
+        config.color_coverage_array
+        return lambda: config.color_gradient_hex_array
+    yield "color_gradient_hex_array", prepare_colors
+
+    config = make_config(sequence, peptides)
+    coverage_array, color_coverage, colors = config.coverage_array, config.color_coverage_array, \
+        config.color_gradient_hex_array
+    yield "coverage_string", lambda: lambda: coverage_string(coverage_array, sequence, config.cmap, color_coverage)
+
+    pdb = make_pdb(sequence, atoms_per_residue=ATOMS_PER_RESIDUE)
+    pdb_text = pdb.decode("utf-8")
+    yield "mol_html", lambda: lambda: mol_html(pdb_text, colors, "cartoon", "#FFFFFF", [], True)
+
+    upload = Upload(pdb, "model.pdb")
+
+    def prepare_setup():
+        upload.seek(0)
+        clear_caches()
+        return PDBFile(upload).setup
+    yield "PDBFile.setup", prepare_setup
+
+
+def sage_aggregation(path):
+    """The sage_app.py aggregation, from the parquet to the protein table and the encoded peptides of each row."""
+    psm_df = explode_proteins(load_sage_psms(path, "peptide_q", 0.01))
+    protein_to_peptides = group_peptides(psm_df["proteins"], charge_peptides(psm_df["peptide"], psm_df["charge"]))
+    protein_df = protein_table(protein_to_peptides)
+    protein_df["Peptides"] = peptide_link_values(
+        (protein_to_peptides[protein] for protein in protein_df["Protein"]), store=False)
+    return protein_df
+
+
+def dta_aggregation(path):
+    """The dta_filter_app.py aggregation, from the DTASelect-filter file to the encoded peptides of each locus."""
+    _, peptide_df, protein_df, _ = filterframes.from_dta_select_filter(path)
+    group_to_peptides = dta_group_peptides(peptide_df)
+    serialized_groups = dict(zip(group_to_peptides, peptide_link_values(group_to_peptides.values(), store=False)))
+    return protein_df["ProteinGroup"].map(serialized_groups).fillna("")
+
+
+def aggregation_cases(tmp, sage_rows, dta_rows):
+    """Yield ``(case, scale, prepare)`` for the end-to-end link generator runs."""
+    for rows in sage_rows:
+        path = os.path.join(tmp, f"sage-{rows}.parquet")
+        # q-values are spread up to 5%, so about a fifth of the PSMs pass the 1% threshold
+        make_sage_psms(rows).to_parquet(path, row_group_size=100_000)
+        yield "sage_aggregation", f"{rows:,} PSMs", lambda path=path: lambda: sage_aggregation(path)
+
+    for rows in dta_rows:
+        path = os.path.join(tmp, f"DTASelect-filter-{rows}.txt")
+        with open(path, "w") as f:
+            f.write(make_dta_select(max(rows // 30, 1), rows))
+        yield "dta_aggregation", f"{rows:,} peptides", lambda path=path: lambda: dta_aggregation(path)
+
+
+def all_cases(quick, tmp):
+    """Yield ``(case, scale, prepare)`` for the whole suite, one scale at a time to bound memory."""
+    for residues, count in SCALES[:QUICK_SCALES] if quick else SCALES:
+        for case, prepare in stage_cases(residues, count):
+            yield case, f"{residues:,} aa / {count:,} peptides", prepare
+    yield from aggregation_cases(tmp, SAGE_ROWS[:QUICK_ROWS] if quick else SAGE_ROWS,
+                                 DTA_ROWS[:QUICK_ROWS] if quick else DTA_ROWS)
+
+
+def load_baseline():
+    if not os.path.exists(BASELINE_PATH):
+        return {}
+    with open(BASELINE_PATH) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the coverage pipeline and the link generators.")
+    parser.add_argument("--quick", action="store_true", help="Skip the largest scales")
+    parser.add_argument("--filter", help="Only run cases whose name contains this")
+    parser.add_argument("--save", action="store_true", help="Save the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=2.0, help="Slowdown over the baseline that fails a case")
+    args = parser.parse_args()
+
+    baseline = load_baseline()
+    results = {}
+    regressions = []
+    print(f"{'case':>25} {'scale':>28} {'ms':>10} {'baseline':>10} {'ratio':>6}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for case, scale, prepare in all_cases(args.quick, tmp):
+            if args.filter and args.filter not in case:
+                continue
+            key = f"{case} [{scale}]"
+            elapsed = results[key] = measure(prepare)
+
+            reference = baseline.get(key)
+            if reference is None:
+                print(f"{case:>25} {scale:>28} {elapsed:>10.2f} {'-':>10} {'-':>6}")
+                continue
+            status = ""
+            if elapsed > reference * args.tolerance and elapsed - reference > NOISE_MS:
+                status = "REGRESSION"
+                regressions.append(key)
+            ratio = elapsed / reference if reference else float("inf")
+            print(f"{case:>25} {scale:>28} {elapsed:>10.2f} {reference:>10.2f} {ratio:>6.2f} {status}")
+
+    if args.save:
+        baseline.update({key: round(elapsed, 3) for key, elapsed in results.items()})
+        with open(BASELINE_PATH, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Saved {len(results)} results to {BASELINE_PATH}")
+
+    if regressions:
+        print(f"{len(regressions)} cases regressed past {args.tolerance}x the baseline: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
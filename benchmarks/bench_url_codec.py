@@ -0,0 +1,87 @@
+"""
+Compare permalink sizes and codec latency of the ``peptides`` URL parameter across encodings.
+
+Encodings are the plain ``peptide;count`` list the link generators used to emit, the zlib text format
+(``COMPRESSED`` prefix) and the binary codec of ``peptide_codec``. Links are built for every protein of
+synthetic Sage output (through the same readers as ``sage_app.py``) and for well-covered proteins whose
+peptides overlap along the sequence. Every encoding is decoded and checked against the plain list.
+
+Usage:
+    python benchmarks/bench_url_codec.py
+"""
+import os
+import random
+import sys
+import time
+from urllib.parse import quote_plus
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from peptide_codec import decode_peptides, encode_peptides  # noqa: E402
+from readers import charge_peptides, explode_proteins, group_peptides  # noqa: E402
+from synthetic import make_peptides, make_protein, make_sage_psms  # noqa: E402
+from util import COMPRESSIONPREFIX, compress_text, decompress_text, serialize_peptides  # noqa: E402
+
+SAGE_PSMS = 200_000
+DEEP_PROTEINS = 200
+URL_LIMITS = (2_048, 8_192)
+
+
+def sage_dataset():
+    psms = explode_proteins(make_sage_psms(SAGE_PSMS))
+    return list(group_peptides(psms["proteins"], charge_peptides(psms["peptide"], psms["charge"])).values())
+
+
+def deep_dataset():
+    rng = random.Random(0)
+    dataset = []
+    for i in range(DEEP_PROTEINS):
+        protein = make_protein(rng.randint(300, 3000), seed=i)
+        peptides = make_peptides(protein, rng.randint(200, 3000), unique=rng.randint(50, 800), seed=i)
+        dataset.append({peptide: peptides.count(peptide) for peptide in dict.fromkeys(peptides)})
+    return dataset
+
+
+def plain_decode(value):
+    return [(peptide, int(count)) for peptide, count in (pair.rsplit(";", 1) for pair in value.split(","))]
+
+
+ENCODINGS = {
+    "plain": (serialize_peptides, plain_decode),
+    "zlib": (lambda peptides: COMPRESSIONPREFIX + compress_text(serialize_peptides(peptides)),
+             lambda value: plain_decode(decompress_text(value[len(COMPRESSIONPREFIX):]))),
+    "binary": (encode_peptides, decode_peptides),
+}
+
+
+def main():
+    for name, dataset in [("sage", sage_dataset()), ("deep", deep_dataset())]:
+        peptide_counts = [len(peptides) for peptides in dataset]
+        print(f"{name}: {len(dataset):,} proteins, {np.median(peptide_counts):.0f} median / {max(peptide_counts):,} "
+              f"max distinct peptides")
+        print(f"{'encoding':>9} {'median':>7} {'p95':>7} {'max':>7} "
+              + " ".join(f"{f'>{limit}':>7}" for limit in URL_LIMITS) + f" {'enc us':>7} {'dec us':>7}")
+
+        for encoding, (encode, decode) in ENCODINGS.items():
+            start = time.perf_counter()
+            values = [encode(peptides) for peptides in dataset]
+            encode_us = (time.perf_counter() - start) / len(dataset) * 1e6
+
+            start = time.perf_counter()
+            decoded = [decode(value) for value in values]
+            decode_us = (time.perf_counter() - start) / len(dataset) * 1e6
+
+            assert all(pairs == list(peptides.items()) for pairs, peptides in zip(decoded, dataset)), encoding
+
+            lengths = np.array([len(quote_plus(value)) for value in values])
+            over = " ".join(f"{int((lengths > limit).sum()):>7}" for limit in URL_LIMITS)
+            print(f"{encoding:>9} {np.median(lengths):>7.0f} {np.percentile(lengths, 95):>7.0f} {lengths.max():>7} "
+                  f"{over} {encode_us:>7.0f} {decode_us:>7.0f}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+A local stand-in for the AlphaFold API.
+
+Serves ``/prediction/<accession>`` and the matching ``/files/AF-<accession>-F1-model_v4.pdb`` for any
+accession. Accessions starting with ``NOTFOUND`` return 404 and accessions starting with ``FLAKY`` fail with
+503 twice before succeeding, to exercise the retry logic.
+
+Usage:
+    with mock_alphafold() as base_url:
+        os.environ["ALPHAFOLD_API_URL"] = base_url
+"""
+import json
+import threading
+import zlib
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from synthetic import make_pdb, make_protein
+
+
+@contextmanager
+def mock_alphafold(sequence_length: int = 300, latency: float = 0.0):
+    """Run the mock API on a free local port and yield its base URL."""
+    hits = {}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, body=b""):
+            self.send_response(status)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            with lock:
+                hits[self.path] = hits.get(self.path, 0) + 1
+                count = hits[self.path]
+            if latency:
+                threading.Event().wait(latency)
+
+            accession = self.path.rstrip("/").split("/")[-1].split("-")[1 if "/files/" in self.path else 0]
+            if accession.startswith("NOTFOUND"):
+                return self._send(404)
+            if accession.startswith("FLAKY") and count < 3:
+                return self._send(503)
+
+            sequence = make_protein(sequence_length, seed=zlib.crc32(accession.encode()))
+            if self.path.startswith("/prediction/"):
+                base = f"http://127.0.0.1:{self.server.server_address[1]}"
+                body = json.dumps([{
+                    "entryId": f"AF-{accession}-F1",
+                    "uniprotAccession": accession,
+                    "uniprotId": f"{accession}_MOCK",
+                    "uniprotDescription": f"Mock protein {accession}",
+                    "uniprotSequence": sequence,
+                    "latestVersion": 4,
+                    "pdbUrl": f"{base}/files/AF-{accession}-F1-model_v4.pdb",
+                }]).encode("utf-8")
+                return self._send(200, body)
+            if self.path.startswith("/files/"):
+                return self._send(200, make_pdb(sequence))
+            return self._send(404)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.hits = hits
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
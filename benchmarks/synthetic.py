@@ -0,0 +1,292 @@
+"""Synthetic proteins and peptides for the benchmarks. Everything is seeded so runs are reproducible."""
+import random
+from typing import List, Sequence
+
+AMINO_ACIDS = "ACDEFGHIKLMNPQRSTVWY"
+MODIFIED_FORMATS = ["{}", "{}/2", "{}/3", "[Acetyl]-{}", "{}-[Amide]"]
+THREE_LETTER = {
+    "A": "ALA", "C": "CYS", "D": "ASP", "E": "GLU", "F": "PHE", "G": "GLY", "H": "HIS", "I": "ILE",
+    "K": "LYS", "L": "LEU", "M": "MET", "N": "ASN", "P": "PRO", "Q": "GLN", "R": "ARG", "S": "SER",
+    "T": "THR", "V": "VAL", "W": "TRP", "Y": "TYR",
+}
+ATOM_NAMES = ["N", "CA", "C", "O", "CB", "CG", "CD", "CE", "NZ", "OG", "SD", "CZ"]
+
+
+def make_protein(length: int, seed: int = 0) -> str:
+    """Return a random protein sequence of the given length."""
+    rng = random.Random(seed)
+    return "".join(rng.choice(AMINO_ACIDS) for _ in range(length))
+
+
+def make_peptides(protein: str, count: int, unique: int = None, seed: int = 0,
+                  min_length: int = 7, max_length: int = 25) -> List[str]:
+    """
+    Return ``count`` ProForma peptides drawn from ``protein``.
+
+    Args:
+        protein: The protein to cut peptides from
+        count: Total number of peptides (spectra)
+        unique: Number of distinct peptides to draw from, defaults to ``count``
+        seed: Random seed
+        min_length: Minimum peptide length
+        max_length: Maximum peptide length
+
+    Returns:
+        A list of ProForma peptide strings with charge states and terminal mods mixed in
+    """
+    rng = random.Random(seed)
+    unique = min(unique or count, count)
+    max_length = min(max_length, len(protein))
+    min_length = min(min_length, max_length)
+
+    distinct = []
+    for _ in range(unique):
+        length = rng.randint(min_length, max_length)
+        start = rng.randint(0, len(protein) - length)
+        distinct.append(rng.choice(MODIFIED_FORMATS).format(protein[start:start + length]))
+
+    return [distinct[i % unique] for i in range(count)]
+
+
+def make_pdb(sequence: str, atoms_per_residue: int = 1, chains: Sequence[str] = ("A",), hetatms: int = 0) -> bytes:
+    """
+    Return a PDB file for ``sequence``.
+
+    Args:
+        sequence: The residues of each chain
+        atoms_per_residue: ATOM records per residue, the first is always CA
+        chains: Chain identifiers, each chain repeats the sequence
+        hetatms: Number of HETATM water records appended to the last chain
+
+    Returns:
+        The PDB file contents
+    """
+    names = ["CA"] + [name for name in ATOM_NAMES if name != "CA"]
+    lines = []
+    serial = 1
+    for chain in chains:
+        for i, aa in enumerate(sequence, start=1):
+            for j in range(atoms_per_residue):
+                name = names[j % len(names)]
+                lines.append(
+                    f"ATOM  {serial % 100000:>5d}  {name:<3s} {THREE_LETTER[aa]} {chain}{i % 10000:>4d}    "
+                    f"{i * 3.8 % 1000:>8.3f}{j * 1.5:>8.3f}{0.0:>8.3f}  1.00 90.00           {name[0]}"
+                )
+                serial += 1
+        lines.append(f"TER   {serial % 100000:>5d}      {THREE_LETTER[sequence[-1]]} {chain}{len(sequence) % 10000:>4d}")
+        serial += 1
+    for k in range(hetatms):
+        lines.append(
+            f"HETATM{serial % 100000:>5d}  O   HOH {chains[-1]}{(len(sequence) + k + 1) % 10000:>4d}    "
+            f"{k * 2.0 % 1000:>8.3f}{0.0:>8.3f}{0.0:>8.3f}  1.00 90.00           O"
+        )
+        serial += 1
+    lines.append("END")
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def _pack_int8(values):
+    """BinaryCIF IntegerPacking into signed bytes: values past the limits are split over several elements."""
+    packed = []
+    for value in values:
+        while value >= 127:
+            packed.append(127)
+            value -= 127
+        while value <= -128:
+            packed.append(-128)
+            value += 128
+        packed.append(value)
+    return packed
+
+
+def make_bcif(cif_text: str) -> bytes:
+    """
+    Convert the ``_atom_site`` loop of an mmCIF file into a BinaryCIF document.
+
+    Integer columns are Delta + IntegerPacking encoded, coordinates FixedPoint, residue numbers RunLength and
+    text columns StringArray, so every decoder path is exercised.
+    """
+    import msgpack
+    import numpy as np
+
+    lines = cif_text.splitlines()
+    names = [line.strip()[len("_atom_site."):] for line in lines if line.startswith("_atom_site.")]
+    rows = [line.split() for line in lines
+            if line and not line.startswith(("_", "#", "loop_", "data_")) and len(line.split()) == len(names)]
+
+    def byte_array(values, code, dtype):
+        return np.asarray(values, dtype=dtype).tobytes(), [{"kind": "ByteArray", "type": code}]
+
+    columns = []
+    for i, name in enumerate(names):
+        raw = [row[i] for row in rows]
+        if name in ("id",):
+            ints = [int(v) for v in raw]
+            deltas = [ints[0] if ints else 0] + [b - a for a, b in zip(ints, ints[1:])]
+            data, enc = byte_array(_pack_int8(deltas[1:] and [0] + deltas[1:] or [0]), 1, "<i1")
+            encoding = [{"kind": "Delta", "origin": ints[0] if ints else 0, "srcType": 3},
+                        {"kind": "IntegerPacking", "byteCount": 1, "isUnsigned": False, "srcSize": len(ints)}] + enc
+        elif name in ("label_seq_id", "auth_seq_id") and all(v.lstrip("-").isdigit() for v in raw):
+            ints = [int(v) for v in raw]
+            runs = []
+            for value in ints:
+                if runs and runs[-2] == value:
+                    runs[-1] += 1
+                else:
+                    runs.extend([value, 1])
+            data, enc = byte_array(runs, 3, "<i4")
+            encoding = [{"kind": "RunLength", "srcType": 3, "srcSize": len(ints)}] + enc
+        elif name.startswith("Cartn_"):
+            data, enc = byte_array([round(float(v) * 1000) for v in raw], 3, "<i4")
+            encoding = [{"kind": "FixedPoint", "factor": 1000, "srcType": 33}] + enc
+        else:
+            distinct = list(dict.fromkeys(raw))
+            offsets = [0]
+            for value in distinct:
+                offsets.append(offsets[-1] + len(value))
+            lookup = {value: j for j, value in enumerate(distinct)}
+            data, data_enc = byte_array([lookup[v] for v in raw], 3, "<i4")
+            offset_data, offset_enc = byte_array(offsets, 3, "<i4")
+            encoding = [{"kind": "StringArray", "dataEncoding": data_enc, "stringData": "".join(distinct),
+                         "offsetEncoding": offset_enc, "offsets": offset_data}]
+        columns.append({"name": name, "data": {"data": data, "encoding": encoding}, "mask": None})
+
+    document = {
+        "version": "0.3.0",
+        "encoder": "pdbcov-benchmarks",
+        "dataBlocks": [{"header": "structure", "categories": [
+            {"name": "_atom_site", "rowCount": len(rows), "columns": columns},
+        ]}],
+    }
+    return msgpack.packb(document, use_bin_type=True)
+
+
+def make_sage_psms(rows: int, proteins: int = 5_000, peptides: int = 200_000, seed: int = 0,
+                   extra_columns: bool = False):
+    """
+    Return a DataFrame shaped like Sage's results parquet.
+
+    Peptides are drawn from a fixed pool so PSMs repeat, about 10% carry an N-terminal mod and about 5% are
+    shared between two proteins. With ``extra_columns`` the wide per-PSM columns Sage also writes (scores,
+    retention times, fragment intensities) are added.
+    """
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    protein_names = np.array([f"sp|P{i:05d}|PROT{i}_HUMAN" for i in range(proteins)], dtype=object)
+    pool_proteins = rng.integers(0, proteins, peptides)
+    shared = rng.random(peptides) < 0.05
+    pool_protein_strings = protein_names[pool_proteins].copy()
+    pool_protein_strings[shared] = (pool_protein_strings[shared] + ";"
+                                    + protein_names[rng.integers(0, proteins, int(shared.sum()))])
+
+    letters = np.array(list(AMINO_ACIDS))
+    lengths = rng.integers(7, 26, peptides)
+    stripped = np.array(["".join(letters[rng.integers(0, 20, n)]) for n in lengths], dtype=object)
+    modified = stripped.copy()
+    acetyl = rng.random(peptides) < 0.1
+    modified[acetyl] = "[+42.0106]-" + stripped[acetyl]
+
+    picks = rng.integers(0, peptides, rows)
+    psms = pd.DataFrame({
+        "peptide": modified[picks],
+        "stripped_peptide": stripped[picks],
+        "proteins": pool_protein_strings[picks],
+        "charge": rng.integers(2, 5, rows).astype(np.int32),
+        "spectrum_q": rng.random(rows).astype(np.float32) * 0.05,
+        "peptide_q": rng.random(rows).astype(np.float32) * 0.05,
+        "protein_q": rng.random(rows).astype(np.float32) * 0.05,
+    })
+    if extra_columns:
+        psms["filename"] = "run.mzML"
+        psms["scannr"] = [f"controllerType=0 controllerNumber=1 scan={i}" for i in range(rows)]
+        for column in ("hyperscore", "sage_discriminant_score", "rt", "predicted_rt", "ion_mobility", "calcmass"):
+            psms[column] = rng.random(rows).astype(np.float32)
+        psms["fragment_intensities"] = list(rng.random((rows, 24)).astype(np.float32))
+    return psms
+
+
+def make_diann_report(rows: int, proteins: int = 5_000, peptides: int = 100_000, samples: int = 12,
+                      seed: int = 0):
+    """
+    Return a DataFrame shaped like a DIA-NN main report.
+
+    Precursors are drawn from a fixed pool so peptides repeat across samples, about 10% map to a protein
+    group of two, and the per-precursor columns DIA-NN also writes (quantities, retention times, scores) are
+    included so the report is as wide as a real one.
+    """
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    protein_names = np.array([f"P{i:05d}" for i in range(proteins)], dtype=object)
+    pool_proteins = protein_names[rng.integers(0, proteins, peptides)].copy()
+    shared = rng.random(peptides) < 0.1
+    pool_proteins[shared] = pool_proteins[shared] + ";" + protein_names[rng.integers(0, proteins, int(shared.sum()))]
+
+    letters = np.array(list(AMINO_ACIDS))
+    lengths = rng.integers(7, 26, peptides)
+    stripped = np.array(["".join(letters[rng.integers(0, 20, n)]) for n in lengths], dtype=object)
+    sample_names = np.array([f"sample_{i:02d}" for i in range(samples)], dtype=object)
+
+    picks = rng.integers(0, peptides, rows)
+    charges = rng.integers(2, 5, rows)
+    report = pd.DataFrame({
+        "File.Name": "/data/" + sample_names[rng.integers(0, samples, rows)] + ".raw",
+        "Sample.Name": sample_names[rng.integers(0, samples, rows)],
+        "Protein.Group": pool_proteins[picks],
+        "Protein.Ids": pool_proteins[picks],
+        "Protein.Names": pool_proteins[picks] + "_HUMAN",
+        "Modified.Sequence": stripped[picks],
+        "Stripped.Sequence": stripped[picks],
+        "Precursor.Id": stripped[picks] + charges.astype(str),
+        "Precursor.Charge": charges,
+    })
+    for column in ("Q.Value", "PG.Q.Value", "Global.Q.Value"):
+        report[column] = rng.random(rows).astype(np.float32) * 0.05
+    for column in ("Precursor.Quantity", "Precursor.Normalised", "PG.MaxLFQ", "RT", "RT.Start", "RT.Stop",
+                   "iRT", "Predicted.RT", "CScore", "Ms1.Area", "Evidence", "Spectrum.Similarity"):
+        report[column] = rng.random(rows).astype(np.float32)
+    return report
+
+
+DTA_PROTEIN_HEADER = ("Locus", "Sequence Count", "Spectrum Count", "Sequence Coverage", "Length", "MolWt", "pI",
+                      "Validation Status", "NSAF", "EMPAI", "Descriptive Name")
+DTA_PEPTIDE_HEADER = ("Unique", "FileName", "XCorr", "DeltCN", "Conf%", "M+H+", "CalcM+H+", "PPM",
+                      "TotalIntensity", "SpR", "Prob Score", "pI", "IonProportion", "Redundancy", "Sequence")
+
+
+def make_dta_select(groups: int, rows: int, seed: int = 0) -> str:
+    """
+    Return a DTASelect-filter file as parsed by ``filterframes.from_dta_select_filter``.
+
+    Each protein group has one or two loci, about 5% of them reverse (decoy) loci, and its share of the ``rows``
+    peptide lines. Peptides are IP2 sequences with flanking residues and about 10% carry an oxidation; they are
+    drawn from a pool so some are shared between groups, with redundancies including 0.
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    letters = np.array(list(AMINO_ACIDS))
+    distinct = max(rows // 4, 1)
+    lengths = rng.integers(7, 26, distinct)
+    sequences = ["".join(letters[rng.integers(0, 20, n)]) for n in lengths]
+    pool = [f"K.{s[:2]}M(15.9949){s[2:]}.R" if i % 10 == 0 else f"K.{s}.R" for i, s in enumerate(sequences)]
+
+    lines = ["DTASelect v2.1.12", "/data/search", "", "\t".join(DTA_PROTEIN_HEADER), "\t".join(DTA_PEPTIDE_HEADER)]
+    group_rows = np.bincount(rng.integers(0, groups, rows), minlength=groups)
+    for group in range(groups):
+        for locus in range(1 + int(rng.random() < 0.5)):
+            db = "Reverse_sp" if rng.random() < 0.05 else "sp"
+            lines.append(f"{db}|P{group:05d}{'-' + str(locus + 1) if locus else ''}|PROT{group}_HUMAN\t"
+                         f"{group_rows[group]}\t{group_rows[group]}\t12.5%\t400\t45000\t6.5\tU\t1.0\t0.5\t"
+                         f"Protein {group}")
+        for _ in range(group_rows[group]):
+            scan = int(rng.integers(1, 100_000))
+            lines.append(f"\trun.{scan}.{scan}.{int(rng.integers(2, 5))}\t3.5\t0.4\t99.0\t1500.7\t1500.7\t1.2\t"
+                         f"10000.0\t1\t0.0\t6.5\t50.0\t{int(rng.choice([0, 1, 1, 1, 2, 3, 8]))}\t"
+                         f"{pool[int(rng.integers(0, distinct))]}")
+    lines.extend(["\tProteins\tPeptide IDs\tSpectra", f"Unfiltered\t{groups}\t{rows}\t{rows}",
+                  f"Filtered\t{groups}\t{rows}\t{rows}"])
+    return "\n".join(lines) + "\n"
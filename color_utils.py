@@ -0,0 +1,73 @@
+from functools import lru_cache
+from typing import Tuple, Union
+
+import matplotlib as mpl
+import matplotlib.colors as mcolors
+import numpy as np
+
+# Number of colormaps whose lookup tables are kept in the process-wide cache
+COLOR_LUT_CACHE_SIZE = 64
+
+
+def colormap_name(color_map: Union[str, mcolors.Colormap]) -> str:
+    """Return the registered name of a colormap given either its name or the colormap itself."""
+    return color_map if isinstance(color_map, str) else color_map.name
+
+
+@lru_cache(maxsize=COLOR_LUT_CACHE_SIZE)
+def colormap_lut(color_map: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Build the RGBA and hex lookup tables of a registered colormap.
+
+    Both tables have ``N + 3`` entries laid out like matplotlib's own table: the ``N`` colormap entries
+    followed by the under, over and bad colors. Hex strings are formatted like ``matplotlib.colors.to_hex``
+    (alpha dropped). Tables are cached by name and shared across sessions.
+
+    Args:
+        color_map: The name of a registered matplotlib colormap
+
+    Returns:
+        A ``(N + 3, 4)`` float RGBA array and a ``(N + 3,)`` array of hex strings
+    """
+    cmap = mpl.colormaps[color_map]
+    rgba = np.vstack([cmap(np.arange(cmap.N)), cmap.get_under(), cmap.get_over(), cmap.get_bad()])
+
+    rgb = np.round(rgba[:, :3] * 255).astype(np.int64)
+    packed = (rgb[:, 0] << 16) | (rgb[:, 1] << 8) | rgb[:, 2]
+    hex_colors = np.array([f"#{color:06x}" for color in packed.tolist()])
+
+    return rgba, hex_colors
+
+
+def color_indices(values, color_map: Union[str, mcolors.Colormap], vmin: float, vmax: float) -> np.ndarray:
+    """
+    Map values to indices into the colormap's lookup table.
+
+    Values are normalized with ``(value - vmin) / (vmax - vmin)`` and quantized the same way
+    ``Colormap.__call__`` does, so indexing :func:`colormap_lut` tables gives exactly the colors
+    ``cmap(normalized)`` would. A zero-width range yields the colormap's bad color.
+    """
+    n = mpl.colormaps[colormap_name(color_map)].N
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scaled = (np.asarray(values, dtype=np.float64) - vmin) / (vmax - vmin) * n
+    scaled[scaled == n] = n - 1
+
+    under, over, bad = scaled < 0, scaled >= n, np.isnan(scaled)
+    with np.errstate(invalid="ignore"):
+        indices = scaled.astype(np.int64)
+    indices[under] = n
+    indices[over] = n + 1
+    indices[bad] = n + 2
+
+    return indices
+
+
+def hex_colors(values, color_map: Union[str, mcolors.Colormap], vmin: float, vmax: float) -> np.ndarray:
+    """Map values to hex color strings through the cached lookup table of ``color_map``."""
+    return colormap_lut(colormap_name(color_map))[1][color_indices(values, color_map, vmin, vmax)]
+
+
+def rgba_colors(values, color_map: Union[str, mcolors.Colormap], vmin: float, vmax: float) -> np.ndarray:
+    """Map values to float RGBA colors through the cached lookup table of ``color_map``."""
+    return colormap_lut(colormap_name(color_map))[0][color_indices(values, color_map, vmin, vmax)]
@@ -32,4 +32,30 @@ def get_env_str(var_name, default):
 PDB_APP_URL = get_env_str('PDB_APP_URL', 'https://pdb-cov.streamlit.app/')
 
 
-DEFAULT_PROTEIN_SEQUENCE = 'MAPSRKFFVGGNWKMNGRKQSLGELIGTLNAAKVPADTEVVCAPPTAYIDFARQKLDPKIAVAAQNCYKVTNGAFTGEISPGMIKDCGATWVVLGHSERRHVFGESDELIGQKVAHALAEGLGVIACIGEKLDEREAGITEKVVFEQTKVIADNVKDWSKVVLAYEPVWAIGTGKTATPQQAQEVHEKLRGWLKSNVSDAVAQSTRIIYGGSVTGATCKELASQPDVDGFLVGGASLKPEFVDIINAKQ'
\ No newline at end of file
+DEFAULT_PROTEIN_SEQUENCE = 'MAPSRKFFVGGNWKMNGRKQSLGELIGTLNAAKVPADTEVVCAPPTAYIDFARQKLDPKIAVAAQNCYKVTNGAFTGEISPGMIKDCGATWVVLGHSERRHVFGESDELIGQKVAHALAEGLGVIACIGEKLDEREAGITEKVVFEQTKVIADNVKDWSKVVLAYEPVWAIGTGKTATPQQAQEVHEKLRGWLKSNVSDAVAQSTRIIYGGSVTGATCKELASQPDVDGFLVGGASLKPEFVDIINAKQ'
+
+# AlphaFold API base URL. Point this at a local stub server (or a file:// fixture directory) for offline use.
+ALPHAFOLD_API_URL = get_env_str('ALPHAFOLD_API_URL', 'https://alphafold.com/api')
+
+# On-disk cache for downloaded structures and prediction metadata
+CACHE_DIR = get_env_str('PDBCOV_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'pdbcov'))
+
+# Upper bound on the in-process structure cache
+STRUCTURE_MEMORY_CACHE_BYTES = int(get_env_str('PDBCOV_STRUCTURE_MEMORY_BYTES', 256 * 1024 * 1024))
+
+# AlphaFold prediction metadata cache: entries older than the TTL are refreshed, the oldest are evicted past the limit
+PREDICTION_CACHE_TTL_SECONDS = float(get_env_str('PDBCOV_PREDICTION_TTL_SECONDS', 7 * 24 * 60 * 60))
+PREDICTION_CACHE_MAX_ENTRIES = int(get_env_str('PDBCOV_PREDICTION_MAX_ENTRIES', 100_000))
+
+# Content-addressed peptide set store behind short permalinks: least recently used sets are evicted past the size limit
+PEPTIDE_STORE_PATH = get_env_str('PDBCOV_PEPTIDE_STORE_PATH', os.path.join(CACHE_DIR, 'peptides.sqlite'))
+PEPTIDE_STORE_MAX_BYTES = int(get_env_str('PDBCOV_PEPTIDE_STORE_MAX_BYTES', 512 * 1024 * 1024))
+
+# Link generators put peptide sets in the store and link by hash. Only enable where the viewer reads the same store
+PEPTIDE_STORE_LINKS = get_env_str('PDBCOV_PEPTIDE_STORE_LINKS', '0') == '1'
+
+# Debug panel with the pipeline stages and per-span timings of each rerun
+DEBUG_PANEL = get_env_str('PDBCOV_DEBUG_PANEL', '0') == '1'
+
+# Append the trace of every rerun to this file as OTLP/JSON lines, for dashboards. Empty disables the export
+TRACE_EXPORT_PATH = get_env_str('PDBCOV_TRACE_EXPORT_PATH', '')
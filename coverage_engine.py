@@ -0,0 +1,244 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
+from typing import Dict, Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import peptacular as pt
+
+from peptide_utils import PEPTIDE_CACHE_SIZE, filter_peptides, to_weighted
+
+
+@lru_cache(maxsize=PEPTIDE_CACHE_SIZE)
+def peptide_segments(peptide: str) -> Tuple[str, Tuple[Tuple[int, int, int], ...]]:
+    """
+    Split a ProForma peptide into its stripped sequence and coverage segments.
+
+    Ambiguous intervals do not count towards coverage, so a peptide such as ``P(?EP)T`` yields the
+    segments ``[(0, 1, 1), (1, 3, 0), (3, 4, 1)]``: offsets are relative to the peptide start and the
+    third value is the coverage written over that span. Results are cached by the peptide string.
+
+    Args:
+        peptide: The ProForma peptide string
+
+    Returns:
+        The stripped peptide sequence and its (start, end, value) segments
+    """
+    annot = pt.parse(peptide)
+    if isinstance(annot, pt.MultiProFormaAnnotation):
+        raise ValueError(f"Invalid sequence: {peptide}")
+
+    sequence = annot.sequence or ""
+    if not sequence:
+        return sequence, ()
+
+    ambiguous = [interval for interval in annot.intervals or [] if interval.ambiguous]
+    if not ambiguous:
+        return sequence, ((0, len(sequence), 1),)
+
+    covered = np.ones(len(sequence), dtype=np.int8)
+    for interval in ambiguous:
+        covered[interval.start:interval.end] = 0
+
+    # Collapse the per-residue mask into runs of equal value
+    breaks = np.flatnonzero(np.diff(covered)) + 1
+    starts = np.concatenate(([0], breaks))
+    ends = np.concatenate((breaks, [len(sequence)]))
+    segments = tuple((int(s), int(e), int(covered[s])) for s, e in zip(starts, ends))
+
+    return sequence, segments
+
+
+def find_occurrences(protein_sequence: str, subsequences: Sequence[str]) -> Dict[str, np.ndarray]:
+    """
+    Find the start index of every occurrence of each distinct subsequence.
+
+    Each distinct subsequence is searched once. Matches are non-overlapping and scanned left to right,
+    the same semantics as ``re.finditer`` used by ``peptacular.coverage``.
+
+    Args:
+        protein_sequence: The stripped protein sequence
+        subsequences: Stripped peptide sequences, duplicates allowed
+
+    Returns:
+        A mapping of each distinct non-empty subsequence to its start indices
+    """
+    occurrences = {}
+    for subsequence in set(subsequences):
+        if not subsequence:
+            continue
+        starts = []
+        index = protein_sequence.find(subsequence)
+        while index != -1:
+            starts.append(index)
+            index = protein_sequence.find(subsequence, index + len(subsequence))
+        occurrences[subsequence] = np.array(starts, dtype=np.int64)
+    return occurrences
+
+
+def _last_write(length: int, starts: np.ndarray, ends: np.ndarray, ranks: np.ndarray) -> np.ndarray:
+    """Return, per residue, the highest rank of any segment covering it (-1 if none)."""
+    last = np.full(length, -1, dtype=np.int64)
+    spans = ends - starts
+    if spans.sum() == 0:
+        return last
+    offsets = np.repeat(starts - np.concatenate(([0], np.cumsum(spans)[:-1])), spans)
+    positions = offsets + np.arange(spans.sum())
+    np.maximum.at(last, positions, np.repeat(ranks, spans))
+    return last
+
+
+def coverage(protein_sequence: str, peptides: Sequence[str], accumulate: bool = True,
+             weights: Optional[Sequence[int]] = None) -> np.ndarray:
+    """
+    Compute the sequence coverage of a protein from a list of ProForma peptides.
+
+    Matches ``peptacular.coverage(..., ignore_mods=True, ignore_ambiguity=False)`` exactly, but locates
+    each distinct peptide once and builds the coverage with a difference array instead of writing every
+    residue of every match.
+
+    Repeated peptides can be passed once with a weight instead. For binary coverage a weighted peptide is
+    treated as if all its copies sit at its position in ``peptides``.
+
+    Args:
+        protein_sequence: The (unmodified) protein sequence
+        peptides: ProForma peptide strings
+        accumulate: Sum overlapping coverage if True, otherwise coverage is binary
+        weights: Multiplicity of each peptide, defaults to 1
+
+    Returns:
+        The per-residue coverage array
+    """
+    length = len(protein_sequence)
+
+    if weights is None:
+        weights = [1] * len(peptides)
+    if len(weights) != len(peptides):
+        raise ValueError(f"Got {len(weights)} weights for {len(peptides)} peptides.")
+
+    parsed = [peptide_segments(peptide) for peptide in peptides]
+    occurrences = find_occurrences(protein_sequence, [sequence for sequence, _ in parsed])
+
+    # Expand every (peptide occurrence, segment) pair into an absolute interval
+    starts, ends, values, ranks = [], [], [], []
+    rank = 0
+    for (sequence, segments), weight in zip(parsed, weights):
+        peptide_starts = occurrences.get(sequence)
+        if peptide_starts is None or len(peptide_starts) == 0 or weight <= 0:
+            continue
+        for seg_start, seg_end, value in segments:
+            starts.append(peptide_starts + seg_start)
+            ends.append(peptide_starts + seg_end)
+            values.append(np.full(len(peptide_starts), value * weight, dtype=np.int64))
+            ranks.append(np.arange(rank, rank + len(peptide_starts), dtype=np.int64))
+        rank += len(peptide_starts)
+
+    if not starts:
+        return np.zeros(length, dtype=np.int64)
+
+    starts = np.concatenate(starts)
+    ends = np.concatenate(ends)
+    values = np.concatenate(values)
+    ranks = np.concatenate(ranks)
+
+    if accumulate or not (values == 0).any():
+        diff = np.bincount(starts, weights=values, minlength=length + 1)
+        diff -= np.bincount(ends, weights=values, minlength=length + 1)
+        coverage_arr = np.cumsum(diff[:length]).round().astype(np.int64)
+        if not accumulate:
+            coverage_arr = (coverage_arr > 0).astype(np.int64)
+        return coverage_arr
+
+    # Binary coverage with ambiguous spans: the last write to a residue wins
+    covered = values > 0
+    last_covered = _last_write(length, starts[covered], ends[covered], ranks[covered])
+    last_uncovered = _last_write(length, starts[~covered], ends[~covered], ranks[~covered])
+    return (last_covered > last_uncovered).astype(np.int64)
+
+
+def _pack_shard(sequences: Sequence[str], peptides: Sequence[Mapping[str, int]]) -> tuple:
+    """Pack a shard of proteins into a few flat buffers so it pickles as a handful of objects."""
+    return (
+        "\n".join(sequences).encode(),
+        "\n".join(peptide for weighted in peptides for peptide in weighted).encode(),
+        np.fromiter((len(weighted) for weighted in peptides), dtype=np.int64, count=len(peptides)),
+        np.fromiter((count for weighted in peptides for count in weighted.values()), dtype=np.int64),
+    )
+
+
+def _coverage_shard(shard: tuple, accumulate: bool, strip_mods: bool, filter_unique: bool,
+                    consider_ambiguity: bool) -> np.ndarray:
+    """Compute the coverage of every protein in a packed shard, concatenated into one array."""
+    sequences, peptides, peptide_counts, weights = shard
+    sequences = sequences.decode().split("\n")
+    peptides = peptides.decode().split("\n") if len(weights) else []
+    bounds = np.concatenate(([0], np.cumsum(peptide_counts))).tolist()
+    weights = weights.tolist()
+
+    arrays = []
+    for i, sequence in enumerate(sequences):
+        weighted = filter_peptides(dict(zip(peptides[bounds[i]:bounds[i + 1]], weights[bounds[i]:bounds[i + 1]])),
+                                   strip_mods, filter_unique, consider_ambiguity)
+        arrays.append(coverage(sequence, list(weighted), accumulate=accumulate, weights=list(weighted.values())))
+    return np.concatenate(arrays) if arrays else np.zeros(0, dtype=np.int64)
+
+
+def coverage_many(sequences: Mapping[str, str], peptides: Mapping[str, Union[Sequence[str], Mapping[str, int]]],
+                  accumulate: bool = True, strip_mods: bool = False, filter_unique: bool = False,
+                  consider_ambiguity: bool = True, max_workers: Optional[int] = None,
+                  shards_per_worker: int = 4) -> Dict[str, np.ndarray]:
+    """
+    Compute the coverage of many proteins in parallel across a process pool.
+
+    Peptides are filtered like the viewer does (see ``peptide_utils.filter_peptides``) before coverage is
+    computed. Proteins are split into shards of roughly equal work, and each shard is sent to a worker as a
+    few packed buffers and comes back as a single concatenated array, so pickling cost does not grow with
+    the number of proteins or peptides.
+
+    Args:
+        sequences: Protein sequence of each protein
+        peptides: ProForma peptides (duplicates allowed) or weighted peptides of each protein
+        accumulate: Sum overlapping coverage if True, otherwise coverage is binary
+        strip_mods: Remove all modifications
+        filter_unique: Count every distinct peptide once
+        consider_ambiguity: Keep ambiguity intervals
+        max_workers: Number of worker processes, defaults to the CPU count; 1 runs in-process
+        shards_per_worker: Shards per worker, more shards balance uneven proteins better
+
+    Returns:
+        A mapping of each protein in ``peptides`` that has a sequence to its coverage array
+    """
+    proteins = [protein for protein in peptides if sequences.get(protein)]
+    if not proteins:
+        return {}
+
+    protein_sequences = [sequences[protein] for protein in proteins]
+    protein_peptides = [to_weighted(peptides[protein]) for protein in proteins]
+    worker = partial(_coverage_shard, accumulate=accumulate, strip_mods=strip_mods, filter_unique=filter_unique,
+                     consider_ambiguity=consider_ambiguity)
+
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers == 1:
+        results = [worker(_pack_shard(protein_sequences, protein_peptides))]
+        shard_bounds = [0, len(proteins)]
+    else:
+        # Contiguous shards of roughly equal work, estimated as residues plus peptide characters
+        work = np.cumsum([len(sequence) + sum(map(len, weighted))
+                          for sequence, weighted in zip(protein_sequences, protein_peptides)])
+        shard_count = min(len(proteins), max_workers * shards_per_worker)
+        cuts = np.searchsorted(work, np.linspace(0, work[-1], shard_count + 1)[1:-1], side="right")
+        shard_bounds = sorted(set([0, *cuts.tolist(), len(proteins)]))
+
+        shards = [_pack_shard(protein_sequences[start:end], protein_peptides[start:end])
+                  for start, end in zip(shard_bounds, shard_bounds[1:])]
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(worker, shards))
+
+    # Split each shard's concatenated coverage back into per-protein views
+    coverages = {}
+    for start, end, result in zip(shard_bounds, shard_bounds[1:], results):
+        offset = 0
+        for protein, sequence in zip(proteins[start:end], protein_sequences[start:end]):
+            coverages[protein] = result[offset:offset + len(sequence)]
+            offset += len(sequence)
+    return coverages
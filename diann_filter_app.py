@@ -1,83 +1,62 @@
-from collections import Counter
-
 import streamlit as st
+import streamlit_permalink as stp
 import pandas as pd
-import urllib.parse
 
-from util import serialize_peptides
+from constants import PDB_APP_URL
+from readers import DIANN_Q_VALUE_COLUMNS, diann_columns, diann_sample_column, diann_samples, read_diann
+from util import peptide_link_values
 
 def main():
     st.title("Coverage App URL Generator")
 
     # Upload the data file
-    uploaded_file = st.file_uploader("Upload your data file", type=['csv', 'tsv', 'txt'])
+    uploaded_file = st.file_uploader("Upload your data file", type=['csv', 'tsv', 'txt', 'parquet'])
 
     if uploaded_file is not None:
-        # Determine the separator based on file extension
-        if uploaded_file.name.endswith('.csv'):
-            df = pd.read_csv(uploaded_file)
-        elif uploaded_file.name.endswith('.tsv') or uploaded_file.name.endswith('.txt'):
-            df = pd.read_csv(uploaded_file, sep='\t')
-        else:
-            st.error("Unsupported file type.")
-            return
+        # Read only the header (or parquet schema), the rows are streamed in chunks below
+        columns = diann_columns(uploaded_file)
 
         # Ensure required columns exist
         required_columns = ['Protein.Ids', 'Stripped.Sequence']
-        if not all(column in df.columns for column in required_columns):
+        if not all(column in columns for column in required_columns):
             st.error(f"The uploaded file must contain the following columns: {', '.join(required_columns)}")
             return
 
-        # Handle cases where 'Protein.Ids' contains multiple IDs separated by ';'
-        df['Protein.Ids'] = df['Protein.Ids'].astype(str)  # Ensure the column is string type
-        df['Protein.Ids'] = df['Protein.Ids'].str.split(';')  # Split the IDs into lists
-        df = df.explode('Protein.Ids')  # Expand the lists into rows
-
-        # Remove any leading/trailing whitespace in 'Protein.Ids'
-        df['Protein.Ids'] = df['Protein.Ids'].str.strip()
-
-        sample_names = df['Sample.Name'].unique()
-
-        #sort the sample names
-        sample_names = sorted(sample_names)
+        selected_samples = None
+        sample_column = diann_sample_column(columns)
+        if sample_column is not None:
+            sample_names = diann_samples(uploaded_file, sample_column)
+            selected_samples = st.multiselect("Select samples", sample_names, default=sample_names)
 
-        selected_samples = st.multiselect("Select samples", sample_names, default=sample_names)
+        q_value_column = None
+        q_value_columns = [column for column in DIANN_Q_VALUE_COLUMNS if column in columns]
+        q_value_threshold = 0.01
+        if q_value_columns:
+            q_value_column = st.selectbox("Q-value filter", [None] + q_value_columns,
+                                          format_func=lambda column: column or "None")
+            q_value_threshold = st.number_input("Maximum q-value", min_value=0.0, max_value=1.0, value=0.01,
+                                                step=0.001, format="%.3f", disabled=q_value_column is None)
 
-        df = df[df['Sample.Name'].isin(selected_samples)]
+        # Stream the report, accumulating peptide counts per protein ('Protein.Ids' split on ';')
+        protein_peptides = read_diann(uploaded_file, selected_samples, q_value_column, q_value_threshold)
 
-        # Replace with the actual URL of your coverage app
-        coverage_app_base_url = 'https://pdb-coverage.streamlit.app/'  # Update this URL
-
-        # Group the data by Protein ID
-        grouped = df.groupby('Protein.Ids')
+        # Encode the peptides of each protein (or put them in the peptide store), as the Sage and DTASelect apps do
+        protein_ids = sorted(protein_peptides)
+        peptide_values = peptide_link_values(protein_peptides[protein_id] for protein_id in protein_ids)
 
         url_list = []
-        for protein_id, group in grouped:
-            peptides = group['Stripped.Sequence'].dropna().astype(str).tolist()
-            if not peptides:
-                continue  # Skip if no peptides are available
-
-            # Use the redundant peptide serializer
-            serialized_peptides = serialize_peptides(peptides)
-
-            # Construct query parameters
+        for protein_id, peptide_value in zip(protein_ids, peptide_values):
             params = {
+                'input_type': 'Protein ID',
                 'protein_id': protein_id,
-                'input_type': 'redundant_peptides',
-                'input': serialized_peptides
+                'peptides': peptide_value,
             }
 
-            # Encode the parameters
-            query_string = urllib.parse.urlencode(params, safe=';/')
-
-            # Construct the full URL
-            url = f"{coverage_app_base_url}?{query_string}"
-
             url_list.append({
                 'Protein ID': protein_id,
-                'Peptides': serialized_peptides,
-                'URL': url,
-                'Peptide Count': len(peptides)
+                'Peptides': peptide_value,
+                'URL': stp.create_url(PDB_APP_URL, params),
+                'Peptide Count': sum(protein_peptides[protein_id].values())
             })
 
         # Create a dataframe with URLs
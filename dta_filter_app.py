@@ -1,11 +1,11 @@
 import streamlit as st
 import streamlit_permalink as stp
 import filterframes
-import peptacular as pt
 
 from constants import PDB_APP_URL
 
-from util import serialize_peptides
+from readers import dta_group_peptides
+from util import peptide_link_values, prefetch_button
 
 st.set_page_config(layout="wide", page_title="Dta-PdbCov", page_icon=":microscope:")
 
@@ -25,10 +25,6 @@ st.caption("Click on the link icons to open the PDB Viewer for each protein.")
 
 if dta_select_file is not None:
     _, peptide_df, protein_df, _ = filterframes.from_dta_select_filter(dta_select_file)
-    peptide_df['ProformaSequence'] = peptide_df['Sequence'].apply(pt.convert_ip2_sequence)
-    peptide_df['ProformaSequenceCharge'] = peptide_df.apply(lambda x: pt.add_mods(x['ProformaSequence'],
-                                                                                  {'charge': x['Charge']}), axis=1)
-    peptide_df['StrippedProformaSequence'] = peptide_df['ProformaSequence'].apply(pt.strip_mods)
     protein_df['Locus Comps'] = protein_df['Locus'].str.split('|')
     
     # drop cols where there are not 3 values
@@ -44,17 +40,10 @@ else:
     st.warning("No file uploaded")
     st.stop()
 
-protein_group_to_peptides = {}
-for protein_group in protein_df['ProteinGroup'].unique():
-    peptides = []
-    for i, row in peptide_df[peptide_df['ProteinGroup'] == protein_group].iterrows():
-        for _ in range(row['Redundancy']):
-            peptides.append(row['ProformaSequenceCharge'])
-
-    protein_group_to_peptides[protein_group] = peptides
-
-protein_df['SerializedPeptides'] = protein_df['ProteinGroup'].apply(
-    lambda x: serialize_peptides(protein_group_to_peptides[x]))
+# Weighted peptides per protein group in one groupby, redundant spectra summed instead of expanded
+protein_group_to_peptides = dta_group_peptides(peptide_df)
+serialized_groups = dict(zip(protein_group_to_peptides, peptide_link_values(protein_group_to_peptides.values())))
+protein_df['SerializedPeptides'] = protein_df['ProteinGroup'].map(serialized_groups).fillna('')
 
 
 def make_link(protein_id, serialized_peptides, reverse):
@@ -93,3 +82,6 @@ st.download_button(
     use_container_width=True,
     type="primary",
 )
+
+# Warm the AlphaFold caches so the generated links open without waiting on downloads
+prefetch_button(protein_df.loc[~protein_df['Reverse'].fillna(False).astype(bool), 'Protein'])
@@ -0,0 +1,190 @@
+"""
+Compact binary encoding of weighted peptides for the ``peptides`` URL parameter.
+
+Encoded values start with ``CODEC_PREFIX`` followed by a one character format version and the base64url
+(unpadded) payload. Version 1 payloads are raw deflate streams, primed with ``PRESET_DICTIONARY``, of:
+
+- the modification table: a varint count, then each bracketed modification (``[Oxidation]``) as a varint
+  length and its UTF-8 bytes, in order of first appearance
+- the number of peptides as a varint
+- one record per peptide: its ASCII text with tabled modifications replaced by the byte ``0x80 + index`` and
+  a terminator byte (``0x00`` for no charge, ``0x01``-``0x1f`` for a ``/charge`` suffix)
+- one varint count per peptide, after all records so the (mostly single byte) counts compress together
+
+Peptides keep their order and text exactly. Peptides that cannot be represented (non-ASCII or control
+characters) raise ``ValueError`` so callers can fall back to the text format. The preset dictionary is part of
+the format: changing it, or the layout above, needs a new version.
+"""
+import base64
+import re
+import zlib
+from typing import Iterable, List, Mapping, Tuple, Union
+
+CODEC_PREFIX = "~"
+CODEC_VERSION = "1"
+
+MAX_MODS = 0x80
+MAX_CHARGE = 0x1f
+
+MOD_PATTERN = re.compile(r"\[[^\[\]\x00-\x1f]*\]")
+TERMINATOR_PATTERN = re.compile(r"([\x00-\x1f])")
+MOD_BYTE_PATTERN = re.compile(r"[\x80-\xff]")
+
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte, value = value & 0x7f, value >> 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def _mod_entry(mod: str) -> bytes:
+    return _varint(len(mod.encode("utf-8"))) + mod.encode("utf-8")
+
+
+# Common modification tokens, laid out as modification table entries. Deflate looks back into this before the
+# first byte of every payload, so short links reuse it instead of spelling the tokens out.
+PRESET_DICTIONARY = b"".join(_mod_entry(mod) for mod in (
+    "[UNIMOD:21]", "[UNIMOD:1]", "[UNIMOD:4]", "[UNIMOD:35]",
+    "[Dimethyl]", "[Methyl]", "[TMT6plex]", "[Deamidated]", "[Amidated]", "[Phospho]",
+    "[Carbamidomethyl]", "[Acetyl]", "[Oxidation]",
+    "[+229.1629]", "[229.1629]", "[+0.984]", "[0.984]", "[+79.9663]", "[79.9663]",
+    "[+57.021464]", "[57.021464]", "[+57.0215]", "[57.0215]", "[+42.0106]", "[42.0106]",
+    "[+15.9949]", "[15.9949]",
+))
+
+
+def _deflate(data: bytes) -> bytes:
+    compressor = zlib.compressobj(9, zlib.DEFLATED, -15, 9, zdict=PRESET_DICTIONARY)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _inflate(data: bytes) -> bytes:
+    decompressor = zlib.decompressobj(-15, zdict=PRESET_DICTIONARY)
+    return decompressor.decompress(data) + decompressor.flush()
+
+
+def is_encoded(value: str) -> bool:
+    """True if ``value`` was produced by ``encode_peptides`` (of any version)."""
+    return value.startswith(CODEC_PREFIX)
+
+
+def encode_peptides(peptides: Union[Mapping[str, int], Iterable[Tuple[str, int]]]) -> str:
+    """
+    Encode weighted peptides into a compact URL-safe string.
+
+    Args:
+        peptides: A mapping of peptide to count, or ``(peptide, count)`` pairs (repeats are kept)
+
+    Returns:
+        ``CODEC_PREFIX`` + version + base64url payload
+
+    Raises:
+        ValueError: If a peptide has non-ASCII or control characters, or a count is negative
+    """
+    items = list(peptides.items() if isinstance(peptides, Mapping) else peptides)
+    counts = [count for _, count in items]
+    if min(counts, default=0) < 0:
+        raise ValueError("Negative peptide count")
+
+    text = "".join(peptide for peptide, _ in items)
+    if not (text.isascii() and text.isprintable()):
+        raise ValueError("Peptides cannot be encoded: non-ASCII or control characters")
+
+    records = []
+    for peptide, _ in items:
+        body, sep, charge = peptide.rpartition("/")
+        if sep and charge.isdigit() and charge[0] != "0" and int(charge) <= MAX_CHARGE:
+            records.append(body)
+            records.append(chr(int(charge)))
+        else:
+            records.append(peptide)
+            records.append("\x00")
+    records = "".join(records)
+
+    mods = {}
+
+    def mod_byte(match):
+        index = mods.setdefault(match.group(), len(mods))
+        return chr(0x80 + index) if index < MAX_MODS else match.group()
+
+    if "[" in records:
+        records = MOD_PATTERN.sub(mod_byte, records)
+
+    table = [mod for mod, index in mods.items() if index < MAX_MODS]
+    payload = b"".join([
+        _varint(len(table)),
+        *(_mod_entry(mod) for mod in table),
+        _varint(len(items)),
+        records.encode("latin-1"),
+        bytes(counts) if max(counts, default=0) < 0x80 else b"".join(map(_varint, counts)),
+    ])
+    return CODEC_PREFIX + CODEC_VERSION + base64.urlsafe_b64encode(_deflate(payload)).decode("ascii").rstrip("=")
+
+
+def decode_peptides(value: str) -> List[Tuple[str, int]]:
+    """
+    Decode a string produced by ``encode_peptides``.
+
+    Returns:
+        The ``(peptide, count)`` pairs in their encoded order
+
+    Raises:
+        ValueError: If the value is not an encoded peptide string or uses an unknown version
+    """
+    if not is_encoded(value):
+        raise ValueError(f"Not an encoded peptide string: {value[:20]}")
+    version, encoded = value[len(CODEC_PREFIX):len(CODEC_PREFIX) + 1], value[len(CODEC_PREFIX) + 1:]
+    if version != CODEC_VERSION:
+        raise ValueError(f"Unsupported peptide codec version: {version!r}")
+
+    try:
+        data = _inflate(base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4)))
+
+        mod_count, pos = _read_varint(data, 0)
+        mods = []
+        for _ in range(mod_count):
+            length, pos = _read_varint(data, pos)
+            mods.append(data[pos:pos + length].decode("utf-8"))
+            pos += length
+
+        peptide_count, pos = _read_varint(data, pos)
+        parts = TERMINATOR_PATTERN.split(data[pos:].decode("latin-1"), maxsplit=peptide_count)
+        if len(parts) != 2 * peptide_count + 1:
+            raise ValueError("Truncated records")
+
+        peptides = []
+        for body, charge in zip(parts[0:-1:2], parts[1::2]):
+            if not body.isascii():
+                body = MOD_BYTE_PATTERN.sub(lambda m: mods[ord(m.group()) - 0x80], body)
+            peptides.append(f"{body}/{ord(charge)}" if charge != "\x00" else body)
+
+        counts = parts[-1].encode("latin-1")
+        if len(counts) == peptide_count and max(counts, default=0) < 0x80:
+            return list(zip(peptides, counts))
+
+        weighted, pos = [], 0
+        for peptide in peptides:
+            count, pos = _read_varint(counts, pos)
+            weighted.append((peptide, count))
+        if pos != len(counts):
+            raise ValueError("Trailing data")
+        return weighted
+
+    except (IndexError, UnicodeDecodeError, zlib.error, ValueError) as e:
+        raise ValueError(f"Invalid encoded peptide string: {value[:20]}") from e
@@ -0,0 +1,115 @@
+"""
+Content-addressed store for peptide sets, so permalinks can carry a short hash instead of the peptides.
+
+Link generators put the encoded ``peptides`` parameter (see ``util.compress_peptides``) in the store and link
+with ``STORE_PREFIX`` + its digest. The viewer's decompressor resolves the reference with a single primary key
+lookup.
+"""
+import base64
+import hashlib
+import sqlite3
+import threading
+import time
+from typing import Iterable, List, Optional
+
+from constants import PEPTIDE_STORE_MAX_BYTES, PEPTIDE_STORE_PATH
+from sqlite_store import SQLiteStore, open_store
+
+STORE_PREFIX = "_"
+
+# 12 base64url characters, 72 bits of SHA-256
+DIGEST_LENGTH = 12
+
+# Eviction frees space down to this fraction of the limit, so a full store does not evict on every put
+EVICTION_TARGET = 0.9
+
+
+def peptide_digest(payload: str) -> str:
+    """Return the short content hash of a stored payload."""
+    digest = hashlib.sha256(payload.encode("utf-8")).digest()
+    return base64.urlsafe_b64encode(digest).decode("ascii")[:DIGEST_LENGTH]
+
+
+def is_reference(value: str) -> bool:
+    """True if ``value`` is a store reference rather than an inline peptide list."""
+    return value.startswith(STORE_PREFIX)
+
+
+class PeptideStore(SQLiteStore):
+    """
+    SQLite store of peptide set payloads keyed by their digest.
+
+    Storing a payload that is already present only refreshes its access time. Once the payloads exceed
+    ``max_bytes`` in total the least recently used are evicted, down to ``EVICTION_TARGET`` of the limit.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_bytes: int = PEPTIDE_STORE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        super().__init__(path or PEPTIDE_STORE_PATH, [
+            "CREATE TABLE IF NOT EXISTS peptide_sets ("
+            "digest TEXT PRIMARY KEY, payload TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)",
+            # Covers the size total and the eviction order without reading the payload pages
+            "CREATE INDEX IF NOT EXISTS peptide_sets_accessed ON peptide_sets (accessed_at, size)",
+        ])
+
+    def put_many(self, payloads: Iterable[str]) -> List[str]:
+        """Store payloads in one transaction and return their digests, in order."""
+        payloads = list(payloads)
+        digests = [peptide_digest(payload) for payload in payloads]
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO peptide_sets (digest, payload, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (digest) DO UPDATE SET accessed_at = excluded.accessed_at",
+                [(digest, payload, len(payload), now, now) for digest, payload in zip(digests, payloads)],
+            )
+            self._evict(conn)
+        return digests
+
+    def put(self, payload: str) -> str:
+        """Store a payload and return its digest."""
+        return self.put_many([payload])[0]
+
+    def get(self, digest: str) -> Optional[str]:
+        """Return the payload stored under a digest, or None if it is unknown or was evicted."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT payload FROM peptide_sets WHERE digest = ?", (digest,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE peptide_sets SET accessed_at = ? WHERE digest = ?", (time.time(), digest))
+        return row[0]
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """Delete the least recently used payloads once the store is over ``max_bytes``."""
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM peptide_sets").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        conn.execute(
+            "DELETE FROM peptide_sets WHERE digest IN ("
+            "SELECT digest FROM (SELECT digest, SUM(size) OVER (ORDER BY accessed_at DESC, digest) AS running "
+            "FROM peptide_sets) WHERE running > ?)",
+            (int(self.max_bytes * EVICTION_TARGET),),
+        )
+
+    def total_bytes(self) -> int:
+        """Return the total size of the stored payloads."""
+        with self._connect() as conn:
+            return conn.execute("SELECT COALESCE(SUM(size), 0) FROM peptide_sets").fetchone()[0]
+
+    def __len__(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM peptide_sets").fetchone()[0]
+
+
+_peptide_store = None
+_peptide_store_lock = threading.Lock()
+
+
+def get_peptide_store() -> PeptideStore:
+    """Return the process-wide peptide set store."""
+    global _peptide_store
+    with _peptide_store_lock:
+        if _peptide_store is None:
+            _peptide_store = open_store(PeptideStore, "pdbcov-peptides.sqlite")
+        return _peptide_store
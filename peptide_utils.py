@@ -0,0 +1,78 @@
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, Iterable, Mapping, Union
+
+import peptacular as pt
+
+# Number of distinct (peptide, option) combinations kept in the process-wide parse cache
+PEPTIDE_CACHE_SIZE = 2 ** 17
+
+
+@lru_cache(maxsize=PEPTIDE_CACHE_SIZE)
+def normalize_peptide(peptide: str, strip_mods: bool, consider_ambiguity: bool) -> str:
+    """
+    Parse a ProForma peptide and serialize it in the form used for coverage.
+
+    Static mods are condensed, isotope and labile mods are dropped, and optionally all mods and ambiguity
+    intervals are removed. Results are cached by the raw peptide string and shared across sessions.
+
+    Args:
+        peptide: The ProForma peptide string
+        strip_mods: Remove all modifications
+        consider_ambiguity: Keep ambiguity intervals
+
+    Returns:
+        The normalized ProForma string
+    """
+    annot = pt.parse(peptide)
+    annot.condense_static_mods(inplace=True)
+    annot.isotope_mods = None
+    annot.labile_mods = None
+
+    if strip_mods:
+        annot = annot.strip()
+
+    if not consider_ambiguity:
+        annot.intervals = None
+
+    return annot.serialize()
+
+
+def to_weighted(peptides: Union[Iterable[str], Mapping[str, int]]) -> Dict[str, int]:
+    """
+    Collapse a list of peptides into a mapping of peptide to count, ordered by last appearance.
+
+    Mappings are assumed to already be weighted and are returned as a dict unchanged.
+    """
+    if isinstance(peptides, Mapping):
+        return dict(peptides)
+
+    peptides = list(peptides)
+    counts = Counter(peptides)
+    return {peptide: counts[peptide] for peptide in reversed(list(dict.fromkeys(reversed(peptides))))}
+
+
+def filter_peptides(peptides: Union[Iterable[str], Mapping[str, int]], strip_mods: bool, filter_unique: bool,
+                    consider_ambiguity: bool) -> Dict[str, int]:
+    """
+    Normalize peptides and collapse duplicates into counts.
+
+    Each distinct raw peptide is parsed once. The result is ordered by the last appearance of each peptide
+    in the input, which is the order that matters for binary (last-write-wins) coverage.
+
+    Args:
+        peptides: ProForma peptide strings (duplicates allowed) or a mapping of peptide to count
+        strip_mods: Remove all modifications
+        filter_unique: Count every distinct peptide once
+        consider_ambiguity: Keep ambiguity intervals
+
+    Returns:
+        A mapping of normalized peptide to its multiplicity
+    """
+    weighted = {}
+    for peptide, count in to_weighted(peptides).items():
+        normalized = normalize_peptide(peptide, strip_mods, consider_ambiguity)
+        count = weighted.pop(normalized, 0) + count
+        weighted[normalized] = 1 if filter_unique else count
+
+    return weighted
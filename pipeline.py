@@ -0,0 +1,92 @@
+"""
+Stage results of the coverage app, kept across reruns of a session.
+
+The app runs as explicit stages: input -> peptides -> coverage -> clamped/colors -> renderings. Each stage result is
+stored with the named inputs it was computed from and is only recomputed when one of them changes. Upstream
+stages enter a stage's inputs as their version, which is bumped on every recompute, so changing a display
+setting recomputes the color and render stages but reuses the peptides and coverage.
+
+Every stage lookup of the current rerun is recorded, with the reason for a recompute, for the instrumentation
+panel.
+"""
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from tracing import trace
+
+# Pipeline order, used to sort the recorded events
+STAGES = ("input", "peptides", "coverage", "clamped", "colors", "track", "structure", "sequence")
+
+
+@dataclass
+class StageEvent:
+    """How a stage was resolved in the current rerun."""
+    stage: str
+    recomputed: bool
+    reason: str
+    version: int
+
+
+class StageCache:
+    """Stage results keyed on their inputs, and the log of the current rerun."""
+
+    def __init__(self):
+        # stage -> (inputs, version, value)
+        self._results: Dict[str, tuple] = {}
+        self._events: Dict[str, StageEvent] = {}
+
+    def start_run(self) -> None:
+        """Clear the event log at the start of a rerun. Results are kept."""
+        self._events = {}
+
+    def version(self, stage: str) -> int:
+        """Return the version of a stage's current result, 0 if it was never computed."""
+        cached = self._results.get(stage)
+        return cached[1] if cached is not None else 0
+
+    def get(self, stage: str, inputs: Dict[str, Any], compute: Callable[[], Any]) -> Any:
+        """
+        Return the result of ``stage`` for ``inputs``, recomputing it only if an input changed.
+
+        Args:
+            stage: The stage name
+            inputs: The named inputs the result depends on, including upstream stage versions
+            compute: Computes the result from scratch
+
+        Returns:
+            The stage result
+        """
+        with trace(f"stage.{stage}") as span:
+            cached = self._results.get(stage)
+            if cached is not None and cached[0] == inputs:
+                self._events.setdefault(stage, StageEvent(stage, False, "inputs unchanged", cached[1]))
+                if span is not None:
+                    span.attributes["recomputed"] = False
+                return cached[2]
+
+            value = compute()
+            version = cached[1] + 1 if cached is not None else 1
+            self._results[stage] = (inputs, version, value)
+            self._events[stage] = StageEvent(stage, True, self._reason(cached, inputs), version)
+            if span is not None:
+                span.attributes["recomputed"] = True
+            return value
+
+    @staticmethod
+    def _reason(cached: Optional[tuple], inputs: Dict[str, Any]) -> str:
+        if cached is None:
+            return "first run"
+        previous = cached[0]
+        changed = [name for name in inputs if name not in previous or previous[name] != inputs[name]]
+        return "changed: " + ", ".join(changed) if changed else "inputs changed"
+
+    @property
+    def events(self) -> List[StageEvent]:
+        """The stage events of the current rerun, in pipeline order."""
+        order = {stage: i for i, stage in enumerate(STAGES)}
+        return sorted(self._events.values(), key=lambda event: order.get(event.stage, len(order)))
+
+    def clear(self) -> None:
+        """Drop all results, so every stage recomputes on the next rerun."""
+        self._results = {}
+        self._events = {}
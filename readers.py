@@ -0,0 +1,374 @@
+"""
+Headless readers for search engine results.
+
+Each reader returns a mapping of protein to weighted peptides (``{peptide: count}``), proteins and peptides in
+order of first appearance, which is what the coverage engine and the link generators consume.
+"""
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+ProteinPeptides = Dict[str, Dict[str, int]]
+
+SAGE_Q_VALUE_TYPES = ("spectrum_q", "peptide_q", "protein_q")
+
+DIANN_CHUNK_SIZE = 500_000
+DIANN_SAMPLE_COLUMNS = ("Sample.Name", "Run")
+DIANN_Q_VALUE_COLUMNS = ("Q.Value", "Global.Q.Value", "PG.Q.Value", "Global.PG.Q.Value", "Lib.Q.Value",
+                         "Lib.PG.Q.Value")
+
+
+def protein_accession(protein: str) -> str:
+    """Return the accession of a ``db|accession|gene`` protein identifier, or the identifier itself."""
+    parts = protein.split("|")
+    return parts[1] if len(parts) == 3 else protein
+
+
+def _is_plain(peptide: str) -> bool:
+    """True for an unmodified sequence, which peptacular serializes and strips to itself."""
+    return peptide.isascii() and peptide.isalpha() and peptide.isupper()
+
+
+def group_peptides(proteins: pd.Series, peptides: pd.Series, counts: Optional[pd.Series] = None) -> ProteinPeptides:
+    """
+    Collapse aligned protein and peptide columns into weighted peptides per protein.
+
+    Args:
+        proteins: The protein of each row
+        peptides: The peptide of each row
+        counts: The number of spectra each row stands for, defaults to 1
+
+    Returns:
+        A mapping of protein to ``{peptide: count}``
+    """
+    frame = pd.DataFrame({
+        "protein": proteins.to_numpy(),
+        "peptide": peptides.to_numpy(),
+        "count": 1 if counts is None else counts.to_numpy(),
+    })
+    totals = frame.groupby(["protein", "peptide"], sort=False)["count"].sum()
+
+    grouped = {}
+    for (protein, peptide), count in zip(totals.index, totals.tolist()):
+        grouped.setdefault(protein, {})[peptide] = int(count)
+    return grouped
+
+
+def charge_peptides(peptides: pd.Series, charges: pd.Series) -> pd.Series:
+    """
+    Append the charge to each ProForma peptide, identical to ``pt.add_mods(peptide, {'charge': charge})``.
+
+    Each distinct peptide is re-serialized by peptacular once (``[+42.0106]-`` becomes ``[42.0106]-``) and the
+    charge suffix is concatenated per distinct (peptide, charge) pair. Peptides that already carry a charge
+    go through ``pt.add_mods`` directly.
+    """
+    import peptacular as pt
+
+    serialized = {}
+    codes, unique_pairs = pd.factorize(pd.MultiIndex.from_arrays([peptides.to_numpy(), charges.to_numpy()]))
+
+    charged = []
+    for peptide, charge in unique_pairs:
+        if "/" in peptide:
+            charged.append(pt.add_mods(peptide, {"charge": charge}))
+            continue
+        if peptide not in serialized:
+            serialized[peptide] = peptide if _is_plain(peptide) else pt.add_mods(peptide, {})
+        charged.append(f"{serialized[peptide]}/{charge}")
+
+    return pd.Series(np.asarray(charged, dtype=object)[codes], index=peptides.index)
+
+
+def strip_mods_unique(peptides: pd.Series) -> pd.Series:
+    """Apply ``pt.strip_mods`` to each distinct peptide once and broadcast the result."""
+    import peptacular as pt
+
+    def strip(peptide):
+        sequence, _, charge = peptide.rpartition("/")
+        if sequence and _is_plain(sequence) and charge.lstrip("-").isdigit():
+            return sequence
+        return peptide if _is_plain(peptide) else pt.strip_mods(peptide)
+
+    codes, uniques = pd.factorize(peptides)
+    stripped = np.asarray([strip(peptide) for peptide in uniques], dtype=object)
+    return pd.Series(stripped[codes], index=peptides.index)
+
+
+def protein_table(protein_peptides: ProteinPeptides) -> pd.DataFrame:
+    """
+    Summarize weighted peptides per protein for the link generators.
+
+    Returns one row per protein with the ``db|accession|gene`` parts split out (``None`` for other
+    identifiers), the number of unique stripped peptides and the spectrum count. The peptides themselves stay
+    in ``protein_peptides``, for ``util.peptide_link_values``.
+    """
+    pairs = pd.DataFrame(
+        [(protein, peptide, count) for protein, peptides in protein_peptides.items()
+         for peptide, count in peptides.items()],
+        columns=["Protein", "Peptide", "Count"],
+    )
+    if pairs.empty:
+        return pd.DataFrame(columns=["Protein", "ProteinID", "Database", "Gene", "Unique Peptides",
+                                     "Spectrum Count"])
+
+    by_protein = pairs.groupby("Protein", sort=False)
+    table = pd.DataFrame({
+        "Unique Peptides": strip_mods_unique(pairs["Peptide"]).groupby(pairs["Protein"], sort=False).nunique(),
+        "Spectrum Count": by_protein["Count"].sum(),
+    }).rename_axis("Protein").reset_index()
+
+    parts = table["Protein"].str.split("|")
+    has_parts = parts.str.len() == 3
+    table.insert(1, "ProteinID", table["Protein"].where(~has_parts, parts.str[1]))
+    table.insert(2, "Database", parts.str[0].where(has_parts, None))
+    table.insert(3, "Gene", parts.str[2].where(has_parts, None))
+    return table
+
+
+def load_sage_psms(source, q_value_type: str = "peptide_q", q_value_threshold: float = 0.01) -> pd.DataFrame:
+    """
+    Load the PSMs of a Sage results parquet that pass the q-value threshold.
+
+    Only the columns the link generators use are read, the threshold is pushed down to pyarrow so row groups
+    whose statistics rule them out are skipped, and the repetitive string columns come back as categoricals
+    (dictionary-encoded) instead of one Python string per row.
+
+    Args:
+        source: Path or file-like object of the parquet
+        q_value_type: The q-value column to filter on
+        q_value_threshold: Maximum q-value
+
+    Returns:
+        The ``proteins``, ``peptide``, ``charge`` and q-value columns of the passing PSMs
+    """
+    import pyarrow.parquet as pq
+
+    if q_value_type not in SAGE_Q_VALUE_TYPES:
+        raise ValueError(f"Invalid q-value type: {q_value_type}. Expected one of {SAGE_Q_VALUE_TYPES}.")
+
+    table = pq.read_table(
+        source,
+        columns=["proteins", "peptide", "charge", q_value_type],
+        filters=[(q_value_type, "<=", q_value_threshold)],
+        read_dictionary=["proteins", "peptide"],
+    )
+    return table.to_pandas()
+
+
+def parquet_row_count(source) -> int:
+    """Return the number of rows of a parquet file from its footer, without reading any data."""
+    import pyarrow.parquet as pq
+
+    if hasattr(source, "seek"):
+        source.seek(0)
+    return pq.ParquetFile(source).metadata.num_rows
+
+
+def explode_proteins(psm_df: pd.DataFrame, column: str = "proteins") -> pd.DataFrame:
+    """
+    Split the ``;``-separated protein column so shared PSMs count towards every listed protein.
+
+    Equivalent to ``str.split(';')`` followed by ``explode``, but each distinct protein string is split once
+    and the result stays categorical.
+    """
+    proteins = psm_df[column].astype("category")
+    groups = [str(group).split(";") for group in proteins.cat.categories]
+
+    single_codes, single = pd.factorize(np.asarray([p for group in groups for p in group], dtype=object))
+    lengths = np.fromiter(map(len, groups), dtype=np.int64, count=len(groups))
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+
+    codes = proteins.cat.codes.to_numpy()
+    counts = lengths[codes]
+    rows = np.repeat(np.arange(len(psm_df)), counts)
+    # Position of each output row within its PSM's protein list
+    offsets = np.arange(len(rows)) - np.repeat(np.cumsum(counts) - counts, counts)
+
+    exploded = psm_df.iloc[rows].copy()
+    exploded[column] = pd.Categorical.from_codes(single_codes[starts[codes[rows]] + offsets],
+                                                 categories=pd.Index(single, dtype=object))
+    return exploded
+
+
+def read_sage(path, q_value_type: str = "peptide_q", q_value_threshold: float = 0.01) -> ProteinPeptides:
+    """
+    Read a Sage results parquet into charged ProForma peptides per protein.
+
+    PSMs above the q-value threshold are dropped and shared peptides count towards every listed protein.
+    """
+    psm_df = explode_proteins(load_sage_psms(path, q_value_type, q_value_threshold))
+    return group_peptides(psm_df["proteins"], charge_peptides(psm_df["peptide"], psm_df["charge"]))
+
+
+def _source_name(source) -> str:
+    return str(getattr(source, "name", source)).lower()
+
+
+def _rewind(source):
+    if hasattr(source, "seek"):
+        source.seek(0)
+
+
+def diann_columns(source) -> List[str]:
+    """Return the column names of a DIA-NN report (csv, tsv or parquet) without reading its rows."""
+    _rewind(source)
+    name = _source_name(source)
+    if name.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        return pq.ParquetFile(source).schema_arrow.names
+    return pd.read_csv(source, sep="," if name.endswith(".csv") else "\t", nrows=0).columns.tolist()
+
+
+def diann_sample_column(columns: Iterable[str]) -> Optional[str]:
+    """Return the column that names the sample of each row, ``Sample.Name`` or else ``Run``."""
+    columns = set(columns)
+    return next((column for column in DIANN_SAMPLE_COLUMNS if column in columns), None)
+
+
+def iter_diann_chunks(source, columns: List[str], chunksize: int = DIANN_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """
+    Yield a DIA-NN report in chunks of at most ``chunksize`` rows, reading only the given columns.
+
+    Parquet reports are read a record batch at a time, csv and tsv reports through ``pd.read_csv`` with a
+    chunk size, so memory does not grow with the size of the report.
+    """
+    _rewind(source)
+    name = _source_name(source)
+    if name.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+        return
+
+    text_columns = {"Protein.Ids": str, "Stripped.Sequence": str, **{column: str for column in DIANN_SAMPLE_COLUMNS}}
+    yield from pd.read_csv(source, sep="," if name.endswith(".csv") else "\t", usecols=columns,
+                           dtype={column: dtype for column, dtype in text_columns.items() if column in columns},
+                           chunksize=chunksize)
+
+
+def diann_samples(source, sample_column: str, chunksize: int = DIANN_CHUNK_SIZE) -> List[str]:
+    """Return the sorted distinct samples of a DIA-NN report, streaming only the sample column."""
+    samples = set()
+    for chunk in iter_diann_chunks(source, [sample_column], chunksize):
+        samples.update(chunk[sample_column].dropna().unique().tolist())
+    return sorted(samples)
+
+
+def read_diann(source, samples: Optional[Iterable[str]] = None, q_value_column: Optional[str] = None,
+               q_value_threshold: float = 0.01, chunksize: int = DIANN_CHUNK_SIZE) -> ProteinPeptides:
+    """
+    Read a DIA-NN report (csv, tsv or parquet) into stripped peptides per protein.
+
+    The report is streamed in chunks of the needed columns and the weighted peptides are accumulated across
+    chunks, so memory is bounded by the number of distinct protein and peptide pairs rather than the number
+    of rows. Rows without a peptide or protein are skipped.
+
+    Args:
+        source: Path or file-like object of the report
+        samples: Only keep rows of these samples (``Sample.Name``, or ``Run`` if absent), defaults to all samples
+        q_value_column: Only keep rows whose value in this column passes ``q_value_threshold``, defaults to no filter
+        q_value_threshold: Maximum q-value
+        chunksize: Number of rows read at a time
+    """
+    columns = ["Protein.Ids", "Stripped.Sequence"]
+
+    sample_column = None
+    if samples is not None:
+        samples = list(samples)
+        sample_column = diann_sample_column(diann_columns(source))
+        if sample_column is None:
+            raise ValueError(f"Cannot filter by sample, the report has none of the columns {DIANN_SAMPLE_COLUMNS}.")
+        columns.append(sample_column)
+
+    if q_value_column is not None:
+        columns.append(q_value_column)
+
+    grouped = {}
+    for chunk in iter_diann_chunks(source, columns, chunksize):
+        keep = chunk["Stripped.Sequence"].notna() & chunk["Protein.Ids"].notna()
+        if sample_column is not None:
+            keep &= chunk[sample_column].isin(samples)
+        if q_value_column is not None:
+            keep &= chunk[q_value_column] <= q_value_threshold
+
+        chunk = explode_proteins(chunk[keep], "Protein.Ids")
+        chunk_groups = group_peptides(chunk["Protein.Ids"].str.strip(), chunk["Stripped.Sequence"].astype(str))
+
+        for protein, peptides in chunk_groups.items():
+            protein_peptides = grouped.setdefault(protein, {})
+            for peptide, count in peptides.items():
+                protein_peptides[peptide] = protein_peptides.get(peptide, 0) + count
+
+    return grouped
+
+
+def dta_group_peptides(peptide_df: pd.DataFrame) -> Dict[int, Dict[str, int]]:
+    """
+    Collapse DTASelect peptide rows into charged ProForma peptides per protein group, weighted by redundancy.
+
+    Sequences are converted from IP2 notation once per distinct sequence, and redundant spectra are summed
+    rather than expanded. Peptides with a redundancy of 0 are left out, as they stand for no spectra.
+    """
+    import peptacular as pt
+
+    codes, sequences = pd.factorize(peptide_df["Sequence"])
+    proforma = pd.Series(np.asarray([pt.convert_ip2_sequence(sequence) for sequence in sequences],
+                                    dtype=object)[codes], index=peptide_df.index)
+
+    redundancy = peptide_df["Redundancy"].astype(int)
+    keep = redundancy > 0
+    return group_peptides(peptide_df["ProteinGroup"][keep],
+                          charge_peptides(proforma[keep], peptide_df["Charge"][keep]), redundancy[keep])
+
+
+def read_dta_select(path, include_reverse: bool = False) -> ProteinPeptides:
+    """
+    Read a DTASelect-filter file into charged ProForma peptides per locus.
+
+    Every locus of a protein group gets the group's peptides, weighted by their redundancy. Reverse
+    (decoy) loci are skipped unless ``include_reverse`` is set.
+    """
+    import filterframes
+
+    _, peptide_df, protein_df, _ = filterframes.from_dta_select_filter(path)
+    group_to_peptides = dta_group_peptides(peptide_df)
+
+    if not include_reverse:
+        database = protein_df["Locus"].str.split("|").str[0]
+        protein_df = protein_df[~database.str.contains("reverse", case=False, na=False)]
+
+    return {locus: group_to_peptides.get(group, {})
+            for locus, group in zip(protein_df["Locus"], protein_df["ProteinGroup"])}
+
+
+def read_fasta(path) -> Dict[str, str]:
+    """
+    Read protein sequences from a FASTA file.
+
+    Each sequence is keyed by the first word of its header and, for ``db|accession|gene`` headers, also by
+    the accession.
+    """
+    sequences = {}
+    header, chunks = None, []
+
+    def flush():
+        if header is not None:
+            sequence = "".join(chunks)
+            sequences[header] = sequence
+            sequences.setdefault(protein_accession(header), sequence)
+
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith(">"):
+                flush()
+                words = line[1:].split(maxsplit=1)
+                header, chunks = (words[0] if words else ""), []
+            elif line:
+                chunks.append(line)
+    flush()
+
+    return sequences
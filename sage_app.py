@@ -1,12 +1,16 @@
 import streamlit as st
 import streamlit_permalink as stp
-import peptacular as pt
-import pandas as pd
-import numpy as np
-from collections import defaultdict
 
 from constants import PDB_APP_URL
-from util import serialize_peptides
+from readers import (
+    charge_peptides,
+    explode_proteins,
+    group_peptides,
+    load_sage_psms,
+    parquet_row_count,
+    protein_table,
+)
+from util import peptide_link_values, prefetch_button
 
 st.set_page_config(layout="wide", page_title="Sage-PdbCov", page_icon=":microscope:")
 
@@ -39,70 +43,28 @@ st.title("Protein Results")
 st.caption("Click on the link icons to open the PDB Viewer for each protein.")
 
 if sage_file is not None:
-    # Load the parquet file
-    psm_df = pd.read_parquet(sage_file)
-    
-    # Filter by q-value
-    filtered_psm_df = psm_df[psm_df[q_value_type] <= q_value_threshold].copy()
+    # Load only the needed columns of the PSMs passing the q-value filter
+    psm_count = parquet_row_count(sage_file)
+    filtered_psm_df = load_sage_psms(sage_file, q_value_type, q_value_threshold)
     
     if filtered_psm_df.empty:
         st.error(f"No PSMs passed the {q_value_type} <= {q_value_threshold} filter. Try increasing the threshold.")
         st.stop()
 
-    # split proteins by ;
-    filtered_psm_df['proteins'] = filtered_psm_df['proteins'].str.split(';')
-
-    # explode the proteins column
-    filtered_psm_df = filtered_psm_df.explode('proteins')
+    # split proteins by ; and explode the proteins column
+    filtered_psm_df = explode_proteins(filtered_psm_df)
     
     # Show filtering stats
-    st.info(f"Filtered from {len(psm_df):,} to {len(filtered_psm_df):,} PSMs using {q_value_type} ≤ {q_value_threshold}")
+    st.info(f"Filtered from {psm_count:,} to {len(filtered_psm_df):,} PSMs using {q_value_type} ≤ {q_value_threshold}")
     
-    # Create required fields for PDB viewer
-    filtered_psm_df['ProformaSequence'] = filtered_psm_df['peptide']
-    filtered_psm_df['StrippedProformaSequence'] = filtered_psm_df['stripped_peptide']
-    filtered_psm_df['ProformaSequenceCharge'] = filtered_psm_df.apply(
-        lambda x: pt.add_mods(x['ProformaSequence'], {'charge': x['charge']}), axis=1
+    # Charge-suffixed ProForma peptides, collapsed into peptide counts per protein
+    protein_to_peptides = group_peptides(
+        filtered_psm_df['proteins'],
+        charge_peptides(filtered_psm_df['peptide'], filtered_psm_df['charge']),
     )
 
-    # Group by protein and collect peptides
-    protein_to_peptides = defaultdict(list)
-    for _, row in filtered_psm_df.iterrows():
-        protein_to_peptides[row['proteins']].append(row['ProformaSequenceCharge'])
-    
-    # Create dataframe for proteins
-    protein_data = []
-    for protein, peptides in protein_to_peptides.items():
-        # Parse protein ID - assuming format similar to db|id|gene
-        protein_parts = protein.split('|')
-        
-        protein_id = protein
-        db = None
-        gene = None
-        
-        if len(protein_parts) == 3:
-            db, protein_id, gene = protein_parts
-        
-        # Count unique peptides and spectra
-        unique_peptides = len(set([pt.strip_mods(p) for p in peptides]))
-        spectrum_count = len(peptides)
-        
-        # Serialize peptides for URL
-        serialized_peptides = serialize_peptides(peptides)
-
-        
-        protein_data.append({
-            'Protein': protein,
-            'ProteinID': protein_id,
-            'Database': db,
-            'Gene': gene,
-            'Unique Peptides': unique_peptides,
-            'Spectrum Count': spectrum_count,
-            'SerializedPeptides': serialized_peptides,
-        })
-    
-    # Create protein dataframe
-    protein_df = pd.DataFrame(protein_data)
+    # Create protein dataframe: ID parts, unique peptides and spectrum count
+    protein_df = protein_table(protein_to_peptides)
     
     # Function to create PDB links
     def make_link(protein_id, serialized_peptides):
@@ -113,11 +75,12 @@ if sage_file is not None:
         }
         return stp.create_url(PDB_APP_URL, params)
     
-    # Create links for each protein
-    protein_df['Link'] = protein_df.apply(
-        lambda x: make_link(x['ProteinID'], x['SerializedPeptides']), 
-        axis=1
-    )
+    # Create links for each protein, with the peptides encoded (or put in the peptide store)
+    peptide_values = peptide_link_values(protein_to_peptides[protein] for protein in protein_df['Protein'])
+    protein_df['Link'] = [
+        make_link(protein_id, peptide_value)
+        for protein_id, peptide_value in zip(protein_df['ProteinID'], peptide_values)
+    ]
     
     # Display protein results
     cols_to_show = ['Protein', 'Gene', 'Unique Peptides', 'Spectrum Count', 'Link']
@@ -145,6 +108,9 @@ if sage_file is not None:
         use_container_width=True,
         type="primary",
     )
+
+    # Warm the AlphaFold caches so the generated links open without waiting on downloads
+    prefetch_button(protein_df['ProteinID'])
 else:
     st.warning("No file uploaded")
     st.stop()
\ No newline at end of file
@@ -0,0 +1,57 @@
+"""
+Shared setup of the SQLite caches: the prediction metadata store and the peptide set store.
+"""
+import os
+import sqlite3
+import tempfile
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional, Sequence, TypeVar
+
+Store = TypeVar("Store", bound="SQLiteStore")
+
+
+class SQLiteStore:
+    """
+    Base class of the SQLite caches, creating the database file, its directory and its schema.
+
+    Every operation opens a connection with ``_connect``, runs in one transaction and closes the connection,
+    so the stores can be shared across threads. The store also holds one idle connection until ``close``:
+    closing the last connection to a WAL database checkpoints it, which would otherwise happen after every
+    operation.
+    """
+
+    def __init__(self, path: str, schema: Sequence[str]):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            for statement in schema:
+                conn.execute(statement)
+        self._idle = sqlite3.connect(self.path, check_same_thread=False)
+        # The database is only opened by the first statement
+        self._idle.execute("SELECT COUNT(*) FROM sqlite_master").fetchall()
+
+    def close(self) -> None:
+        """Close the idle connection, checkpointing the database if no other connection is open."""
+        self._idle.close()
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Yield a connection for one transaction, committed unless an exception is raised, then closed."""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+
+def open_store(factory: Callable[[Optional[str]], Store], fallback_name: str) -> Store:
+    """
+    Create a store at its configured path, or under ``fallback_name`` in the temp directory when the cache
+    directory is not writable.
+    """
+    try:
+        return factory(None)
+    except (OSError, sqlite3.Error):
+        return factory(os.path.join(tempfile.gettempdir(), fallback_name))
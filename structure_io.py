@@ -0,0 +1,469 @@
+import gzip
+import hashlib
+import io
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import peptacular as pt
+
+from tracing import record_bytes, trace
+
+# Number of parsed structures kept in memory, keyed by the SHA-256 digest of the file content
+STRUCTURE_PARSE_CACHE_SIZE = 16
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+# Lines kept when handing a PDB file to the viewer: coordinates, and the author's secondary structure and disulfides
+PDB_VIEWER_RECORDS = ("ATOM  ", "HETATM", "MODEL ", "ENDMDL", "TER", "CONECT", "END", "HELIX ", "SHEET ", "SSBOND")
+
+# mmCIF categories kept alongside atom_site for the viewer, which reads the secondary structure from them
+CIF_VIEWER_CATEGORIES = ("_struct_conf", "_struct_sheet_range")
+
+# mmCIF tokens: quoted strings end at a quote followed by whitespace, so names like O5' stay intact
+CIF_TOKEN_RE = re.compile(r"""'(.*?)'(?=\s|$)|"(.*?)"(?=\s|$)|(\S+)""")
+
+
+@dataclass(frozen=True)
+class ParsedStructure:
+    """The parts of a structure file the app needs: its sequence, residue numbering and viewer input."""
+
+    sequence: str
+    chains: Tuple[str, ...]
+    residue_numbers: Tuple[int, ...]
+    content: str
+    format: str
+
+
+def residue_to_one_letter(resname: str) -> str:
+    """Convert a three-letter residue name to its one-letter code, ``X`` if unknown."""
+    return pt.constants.THREE_LETTER_CODE_TO_AA.get(resname.strip().capitalize(), "X")
+
+
+class _ResidueCollector:
+    """
+    Accumulates residues the way Biopython iterates them: per model, grouped by chain in order of first
+    appearance, each residue (chain, number, insertion code) counted once.
+
+    At point mutations, alternate locations with different residue names, the residue name of the highest
+    occupancy location is kept, the first location label on ties.
+    """
+
+    def __init__(self):
+        self.sequence: List[str] = []
+        self.chains: List[str] = []
+        self.numbers: List[int] = []
+        # chain -> [number, resname, altloc, occupancy] per residue
+        self._model_chains: Dict[str, List[list]] = {}
+        self._residues: Dict[tuple, list] = {}
+        self._last_key = None
+        self._last_residue = None
+        self._model = None
+
+    def add(self, model, chain: str, number: str, icode: str, resname: str, altloc: str = "",
+            occupancy: str = "") -> None:
+        if model != self._model:
+            self.flush()
+            self._model = model
+        key = (chain, number, icode)
+        if key == self._last_key:
+            # Further atoms of the residue only matter as another alternate location
+            if not altloc:
+                return
+            residue = self._last_residue
+        else:
+            residue = self._residues.get(key)
+            if residue is None:
+                residue = self._residues[key] = [number, resname, altloc, occupancy]
+                self._model_chains.setdefault(chain, []).append(residue)
+            self._last_key, self._last_residue = key, residue
+        if altloc and resname != residue[1] and \
+                (-_to_float(occupancy), altloc) < (-_to_float(residue[3]), residue[2]):
+            residue[1:] = resname, altloc, occupancy
+
+    def flush(self) -> None:
+        for chain, residues in self._model_chains.items():
+            for number, resname, _, _ in residues:
+                self.sequence.append(residue_to_one_letter(resname))
+                self.chains.append(chain)
+                self.numbers.append(_to_int(number))
+        self._model_chains.clear()
+        self._residues.clear()
+        self._last_key = self._last_residue = None
+
+    def result(self, content: str, fmt: str) -> ParsedStructure:
+        self.flush()
+        return ParsedStructure("".join(self.sequence), tuple(self.chains), tuple(self.numbers), content, fmt)
+
+
+def _to_int(value: str) -> int:
+    try:
+        return int(value)
+    except ValueError:
+        return 0
+
+
+def _to_float(value: str) -> float:
+    try:
+        return float(value)
+    except ValueError:
+        return 0.0
+
+
+def iter_lines(content: bytes) -> Iterator[str]:
+    """
+    Iterate over the text lines of a structure file.
+
+    gzip input is decompressed and decoded as it is read. Plain text is already in memory and is decoded at once,
+    which is faster than decoding line by line.
+    """
+    if content[:2] != GZIP_MAGIC:
+        yield from content.decode("utf-8", errors="replace").splitlines()
+        return
+    with io.TextIOWrapper(gzip.GzipFile(fileobj=io.BytesIO(content)), encoding="utf-8", errors="replace") as text:
+        for line in text:
+            yield line.rstrip("\r\n")
+
+
+def detect_format(content: bytes, name: Optional[str] = None) -> str:
+    """
+    Return the structure format of a file: ``pdb``, ``cif`` or ``bcif``.
+
+    The file name is used when it has a known extension, otherwise the (decompressed) content is sniffed.
+    """
+    if name:
+        lower = name.lower()
+        if lower.endswith(".gz"):
+            lower = lower[:-3]
+        if lower.endswith(".bcif"):
+            return "bcif"
+        if lower.endswith((".cif", ".mmcif")):
+            return "cif"
+        if lower.endswith((".pdb", ".ent")):
+            return "pdb"
+
+    head = content[:4096]
+    if head[:2] == GZIP_MAGIC:
+        with gzip.GzipFile(fileobj=io.BytesIO(content)) as f:
+            head = f.read(4096)
+    if head[:1] and 0x80 <= head[0] <= 0x8f or head[:1] in (b"\xde", b"\xdf"):
+        return "bcif"
+    if head.lstrip().startswith(b"data_"):
+        return "cif"
+    return "pdb"
+
+
+def parse_structure(content: Union[str, bytes], name: Optional[str] = None) -> ParsedStructure:
+    """
+    Parse a PDB, mmCIF or BinaryCIF file, optionally gzip compressed.
+
+    Text formats are decoded and scanned line by line, so only the residue table and the records handed to
+    the viewer are kept: coordinates and secondary structure, other records are dropped. Results are cached
+    by a hash of the file content, so the upload itself is not retained.
+
+    Args:
+        content: The file contents
+        name: The file name, used to detect the format
+
+    Returns:
+        The parsed structure
+    """
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    with trace("parse.structure", file_name=name or ""):
+        record_bytes(len(content))
+        return _parse_structure(content, detect_format(content, name))
+
+
+# LRU of parsed structures by (content digest, format): only the results are kept, not the uploads
+_parse_cache: "OrderedDict[Tuple[bytes, str], ParsedStructure]" = OrderedDict()
+_parse_cache_lock = threading.Lock()
+
+
+def _parse_structure(content: bytes, fmt: str) -> ParsedStructure:
+    key = (hashlib.sha256(content).digest(), fmt)
+    with _parse_cache_lock:
+        parsed = _parse_cache.get(key)
+        if parsed is not None:
+            _parse_cache.move_to_end(key)
+            return parsed
+    parsed = _parse_uncached(content, fmt)
+    with _parse_cache_lock:
+        _parse_cache[key] = parsed
+        while len(_parse_cache) > STRUCTURE_PARSE_CACHE_SIZE:
+            _parse_cache.popitem(last=False)
+    return parsed
+
+
+def clear_parse_cache() -> None:
+    """Drop the parsed structures cached by ``parse_structure``."""
+    with _parse_cache_lock:
+        _parse_cache.clear()
+
+
+def _parse_uncached(content: bytes, fmt: str) -> ParsedStructure:
+    if fmt == "bcif":
+        return _parse_bcif(content)
+    if fmt == "cif":
+        return _parse_cif(iter_lines(content))
+    return _parse_pdb(iter_lines(content))
+
+
+def pdb_sequence(content: Union[str, bytes]) -> str:
+    """
+    Extract the protein sequence from PDB file contents without building a full structure.
+
+    Only ``ATOM`` records are scanned, matching Biopython's ``PDBParser`` which files ``HETATM`` residues and
+    waters under a hetero flag. Residues are identified per model by chain, sequence number and insertion
+    code, and are ordered by chain, then by first appearance, as Biopython iterates them. At point mutations
+    the highest occupancy alternate location is used, the first one on ties.
+
+    Args:
+        content: The PDB file contents
+
+    Returns:
+        The one-letter protein sequence of every residue in every model
+    """
+    return parse_structure(content, "structure.pdb").sequence
+
+
+def _parse_pdb(lines: Iterator[str]) -> ParsedStructure:
+    residues = _ResidueCollector()
+    kept = []
+    model = 0
+    last_residue = None
+    for line in lines:
+        if not line.startswith(PDB_VIEWER_RECORDS):
+            continue
+        kept.append(line)
+        if line.startswith("ATOM  "):
+            # Residue name, chain, number and insertion code: further atoms of a residue are skipped unless
+            # they are an alternate location
+            residue = line[17:27]
+            if residue == last_residue and line[16:17] == " ":
+                continue
+            last_residue = residue
+            residues.add(model, line[21:22], line[22:26].strip(), line[26:27].strip(), line[17:20],
+                         line[16:17].strip(), line[54:60])
+        elif line.startswith("MODEL "):
+            model += 1
+            last_residue = None
+    return residues.result("\n".join(kept) + "\n", "pdb")
+
+
+def _cif_tokens(line: str) -> List[str]:
+    if "'" not in line and '"' not in line:
+        return line.split()
+    return [next(group for group in match.groups() if group is not None) for match in CIF_TOKEN_RE.finditer(line)]
+
+
+def _cif_null(value: str) -> str:
+    return "" if value in ("?", ".") else value
+
+
+class _AtomSiteColumns:
+    """Column indices of the ``_atom_site`` fields used to identify residues."""
+
+    def __init__(self, names: List[str]):
+        index = {name: i for i, name in enumerate(names)}
+
+        def pick(*candidates):
+            return next((index[c] for c in candidates if c in index), None)
+
+        self.group = pick("group_PDB")
+        self.model = pick("pdbx_PDB_model_num")
+        self.chain = pick("auth_asym_id", "label_asym_id")
+        self.number = pick("auth_seq_id", "label_seq_id")
+        self.icode = pick("pdbx_PDB_ins_code")
+        self.resname = pick("label_comp_id", "auth_comp_id")
+        self.altloc = pick("label_alt_id")
+        self.occupancy = pick("occupancy")
+        if self.chain is None or self.number is None or self.resname is None:
+            raise ValueError("mmCIF atom_site loop is missing chain, residue number or residue name columns.")
+
+    def add(self, residues: _ResidueCollector, row: Sequence[str]) -> None:
+        if self.group is not None and row[self.group] != "ATOM":
+            return
+        residues.add(
+            row[self.model] if self.model is not None else "1",
+            _cif_null(row[self.chain]),
+            _cif_null(row[self.number]),
+            _cif_null(row[self.icode]) if self.icode is not None else "",
+            row[self.resname],
+            _cif_null(row[self.altloc]) if self.altloc is not None else "",
+            row[self.occupancy] if self.occupancy is not None else "",
+        )
+
+
+def _parse_cif(lines: Iterator[str]) -> ParsedStructure:
+    residues = _ResidueCollector()
+    atom_site = ["loop_"]
+    secondary: List[str] = []
+    names: List[str] = []
+    columns = None
+    pending: List[str] = []
+    category = None
+    in_header = False
+    in_text = False
+
+    for line in lines:
+        keep_secondary = category in CIF_VIEWER_CATEGORIES
+        # Multi-line text fields run between lines starting with a semicolon
+        if in_text or line.startswith(";"):
+            in_text = not in_text if line.startswith(";") else in_text
+            if keep_secondary:
+                secondary.append(line)
+            continue
+
+        stripped = line.strip()
+        if not stripped or stripped.startswith("#"):
+            continue
+        if stripped == "loop_":
+            category, in_header = None, True
+            continue
+        if stripped.startswith("data_"):
+            if columns is not None:
+                break
+            continue
+
+        if stripped.startswith("_"):
+            item = stripped.split()[0]
+            if category is None or not in_header:
+                category = item.split(".")[0]
+                if in_header and category in CIF_VIEWER_CATEGORIES:
+                    secondary.append("loop_")
+            if category == "_atom_site" and in_header:
+                names.append(item[len("_atom_site."):])
+                atom_site.append(item)
+            elif category in CIF_VIEWER_CATEGORIES:
+                secondary.append(line)
+            continue
+
+        # A loop row, or the value of the item on the line before
+        in_header = False
+        if category == "_atom_site" and names:
+            if columns is None:
+                columns = _AtomSiteColumns(names)
+            atom_site.append(line)
+            pending.extend(_cif_tokens(line))
+            while len(pending) >= len(names):
+                columns.add(residues, pending[:len(names)])
+                pending = pending[len(names):]
+        elif keep_secondary:
+            secondary.append(line)
+
+    if columns is None:
+        raise ValueError("No atom_site records found in the mmCIF file.")
+
+    return residues.result("\n".join(["data_structure"] + secondary + atom_site) + "\n", "cif")
+
+
+# BinaryCIF ByteArray type codes
+BCIF_TYPES = {1: "<i1", 2: "<i2", 3: "<i4", 4: "<u1", 5: "<u2", 6: "<u4", 32: "<f4", 33: "<f8"}
+
+
+def _bcif_decode(data, encodings: List[dict]):
+    """Undo a BinaryCIF encoding chain, last encoding first."""
+    for encoding in reversed(encodings):
+        kind = encoding["kind"]
+        if kind == "ByteArray":
+            data = np.frombuffer(data, dtype=BCIF_TYPES[encoding["type"]])
+        elif kind == "FixedPoint":
+            data = np.asarray(data, dtype=np.float64) / encoding["factor"]
+        elif kind == "IntervalQuantization":
+            step = (encoding["max"] - encoding["min"]) / (encoding["numSteps"] - 1)
+            data = encoding["min"] + step * np.asarray(data, dtype=np.float64)
+        elif kind == "RunLength":
+            data = np.asarray(data, dtype=np.int64)
+            data = np.repeat(data[0::2], data[1::2])
+        elif kind == "Delta":
+            data = np.asarray(data, dtype=np.int64).copy()
+            if len(data):
+                data[0] += encoding["origin"]
+            data = np.cumsum(data)
+        elif kind == "IntegerPacking":
+            data = np.asarray(data, dtype=np.int64)
+            byte_count = encoding["byteCount"]
+            if encoding["isUnsigned"]:
+                is_limit = data == (1 << (8 * byte_count)) - 1
+            else:
+                upper = (1 << (8 * byte_count - 1)) - 1
+                is_limit = (data == upper) | (data == -upper - 1)
+            # A value at the limit continues into the next element
+            group = np.concatenate(([0], np.cumsum(~is_limit)[:-1]))
+            data = np.bincount(group, weights=data).astype(np.int64) if len(data) else data
+        elif kind == "StringArray":
+            offsets = _bcif_decode(encoding["offsets"], encoding["offsetEncoding"])
+            indices = _bcif_decode(data, encoding["dataEncoding"])
+            strings = encoding["stringData"]
+            offsets = np.asarray(offsets).tolist()
+            table = np.array([strings[start:end] for start, end in zip(offsets, offsets[1:])] + [""], dtype=object)
+            indices = np.asarray(indices, dtype=np.int64)
+            # Negative indices are nulls and map to the trailing empty string
+            data = table[np.where(indices >= 0, indices, len(table) - 1)]
+        else:
+            raise ValueError(f"Unsupported BinaryCIF encoding: {kind}")
+    return data
+
+
+def _cif_value(value) -> str:
+    """Format a value for an mmCIF row, quoting it if needed."""
+    value = str(value)
+    if value == "":
+        return "?"
+    if any(c in value for c in " \t'\"") or value[0] in "_#$;[]":
+        return f'"{value}"' if '"' not in value else f"'{value}'"
+    return value
+
+
+def _parse_bcif(content: bytes) -> ParsedStructure:
+    try:
+        import msgpack
+    except ImportError as e:
+        raise ValueError("Reading BinaryCIF files requires the msgpack package.") from e
+
+    if content[:2] == GZIP_MAGIC:
+        content = gzip.decompress(content)
+    document = msgpack.unpackb(content, raw=False)
+
+    # Categories of the first data block with atom_site records
+    categories = next(({category["name"]: category for category in block["categories"]}
+                       for block in document["dataBlocks"]
+                       if any(category["name"] == "_atom_site" for category in block["categories"])), None)
+    if categories is None:
+        raise ValueError("No atom_site records found in the BinaryCIF file.")
+
+    names, values, quoted = _bcif_columns(categories["_atom_site"])
+    columns = _AtomSiteColumns(names)
+    residues = _ResidueCollector()
+    for row in zip(*values):
+        columns.add(residues, row)
+
+    kept = ["data_structure"]
+    loops = [(name, _bcif_columns(categories[name])) for name in CIF_VIEWER_CATEGORIES if name in categories]
+    for name, (category_names, _, category_quoted) in loops + [("_atom_site", (names, values, quoted))]:
+        kept.append("loop_")
+        kept.extend(f"{name}.{column}" for column in category_names)
+        kept.extend(" ".join(row) for row in zip(*category_quoted))
+
+    return residues.result("\n".join(kept) + "\n", "cif")
+
+
+def _bcif_columns(category: dict) -> Tuple[List[str], List[List[str]], List[List[str]]]:
+    """Decode the columns of a BinaryCIF category into their names, string values and mmCIF-quoted values."""
+    names, values, quoted = [], [], []
+    for column in category["columns"]:
+        decoded = np.asarray(_bcif_decode(column["data"]["data"], column["data"]["encoding"])).tolist()
+        decoded = [str(v) for v in decoded]
+        if column.get("mask"):
+            mask = np.asarray(_bcif_decode(column["mask"]["data"], column["mask"]["encoding"])).tolist()
+            decoded = [v if m == 0 else "" for v, m in zip(decoded, mask)]
+        names.append(column["name"])
+        values.append(decoded)
+        # Columns repeat a handful of distinct values, so format each one once
+        formatted = {v: _cif_value(v) for v in set(decoded)}
+        quoted.append([formatted[v] for v in decoded])
+    return names, values, quoted
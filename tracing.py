@@ -0,0 +1,264 @@
+"""
+Lightweight tracing of app reruns.
+
+A ``Tracer`` records one trace per rerun: a root ``rerun`` span with a span for every traced call below it, each
+with its wall time, the bytes it transferred (downloads, uploads, rendered HTML sent to the page) and, when memory
+tracking is on, its peak Python allocations via ``tracemalloc``. Spans are aggregated per name for the debug panel
+and export as JSON or as an OTLP/JSON trace for dashboards.
+
+``tracemalloc`` is process-wide: it runs while any session tracks memory, and span peaks include the allocations of
+every thread, while the peak resets of one session's spans cut into the spans of the others. With several sessions
+tracking memory at once, peaks are approximations.
+
+Instrumented code calls ``trace``, ``traced`` and ``record_bytes``, which do nothing unless a tracer is active in
+the current context, so the library functions keep no overhead outside the app.
+"""
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+_active_tracer: contextvars.ContextVar = contextvars.ContextVar("pdbcov_tracer", default=None)
+
+SCOPE_NAME = "pdbcov"
+
+# Tracers tracking memory, so tracemalloc is started by the first and stopped by the last
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_users = 0
+_tracemalloc_owned = False
+
+
+def _acquire_tracemalloc() -> None:
+    global _tracemalloc_users, _tracemalloc_owned
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracemalloc_owned = True
+        _tracemalloc_users += 1
+
+
+def _release_tracemalloc() -> None:
+    global _tracemalloc_users, _tracemalloc_owned
+    with _tracemalloc_lock:
+        _tracemalloc_users -= 1
+        if _tracemalloc_users == 0 and _tracemalloc_owned:
+            tracemalloc.stop()
+            _tracemalloc_owned = False
+
+
+@dataclass
+class Span:
+    """A timed call, with the bytes it transferred and its peak allocations."""
+    name: str
+    span_id: str
+    parent_id: Optional[str]
+    start_ns: int
+    duration_ns: int = 0
+    bytes: int = 0
+    peak_bytes: Optional[int] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    # Timer and tracemalloc bookkeeping while the span is open
+    _start_perf_ns: int = 0
+    _base_bytes: int = 0
+    _peak_seen: int = 0
+
+    @property
+    def duration_ms(self) -> float:
+        return self.duration_ns / 1e6
+
+    def to_dict(self) -> dict:
+        return {"name": self.name, "span_id": self.span_id, "parent_id": self.parent_id,
+                "start_ns": self.start_ns, "duration_ms": round(self.duration_ms, 3), "bytes": self.bytes,
+                "peak_bytes": self.peak_bytes, "attributes": self.attributes}
+
+
+def _span_id() -> str:
+    return os.urandom(8).hex()
+
+
+class Tracer:
+    """Records the spans of one rerun at a time."""
+
+    def __init__(self):
+        self.trace_id = ""
+        self.spans: List[Span] = []
+        self.memory = False
+        self._stack: List[Span] = []
+        self._tracks_memory = False
+
+    def start_run(self, memory: bool = False, **attributes) -> None:
+        """
+        Start the trace of a new rerun and make this tracer active in the current context.
+
+        Args:
+            memory: Track peak allocations per span with ``tracemalloc``, which slows the rerun down. Peaks are
+                process-wide, see the module docstring
+            attributes: Attributes of the root ``rerun`` span
+        """
+        self.end_run()
+        self.trace_id = os.urandom(16).hex()
+        self.spans = []
+        self._stack = []
+        self.memory = memory
+        if memory:
+            _acquire_tracemalloc()
+            self._tracks_memory = True
+        # Set rather than reset by token: a rerun interrupted by Streamlit may end in another context
+        _active_tracer.set(self)
+        self._open("rerun", attributes)
+
+    def end_run(self) -> None:
+        """Close the rerun and any span left open by an exception, and deactivate the tracer."""
+        while self._stack:
+            self._close(self._stack[-1])
+        if _active_tracer.get() is self:
+            _active_tracer.set(None)
+        if self._tracks_memory:
+            _release_tracemalloc()
+            self._tracks_memory = False
+
+    def _open(self, name: str, attributes: Dict[str, Any]) -> Span:
+        parent = self._stack[-1] if self._stack else None
+        span = Span(name, _span_id(), parent.span_id if parent else None, time.time_ns(), attributes=attributes)
+        if self.memory and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            if parent is not None:
+                parent._peak_seen = max(parent._peak_seen, peak)
+            tracemalloc.reset_peak()
+            span._base_bytes = span._peak_seen = current
+        span._start_perf_ns = time.perf_counter_ns()
+        self.spans.append(span)
+        self._stack.append(span)
+        return span
+
+    def _close(self, span: Span) -> None:
+        span.duration_ns = time.perf_counter_ns() - span._start_perf_ns
+        if self.memory and tracemalloc.is_tracing():
+            span._peak_seen = max(span._peak_seen, tracemalloc.get_traced_memory()[1])
+            span.peak_bytes = span._peak_seen - span._base_bytes
+        self._stack.remove(span)
+        if self._stack:
+            self._stack[-1]._peak_seen = max(self._stack[-1]._peak_seen, span._peak_seen)
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Span]:
+        """Record the enclosed block as a span under the current one."""
+        span = self._open(name, attributes)
+        try:
+            yield span
+        finally:
+            self._close(span)
+
+    @property
+    def current(self) -> Optional[Span]:
+        return self._stack[-1] if self._stack else None
+
+    def summary(self) -> List[dict]:
+        """Aggregate the spans of the rerun per name, in order of first call."""
+        rows: Dict[str, dict] = {}
+        for span in self.spans:
+            row = rows.setdefault(span.name, {"Span": span.name, "Calls": 0, "Wall (ms)": 0.0, "Bytes": 0,
+                                              "Peak alloc (KiB)": None})
+            row["Calls"] += 1
+            row["Wall (ms)"] += span.duration_ms
+            row["Bytes"] += span.bytes
+            if span.peak_bytes is not None:
+                row["Peak alloc (KiB)"] = max(row["Peak alloc (KiB)"] or 0, span.peak_bytes / 1024)
+        for row in rows.values():
+            row["Wall (ms)"] = round(row["Wall (ms)"], 2)
+            if row["Peak alloc (KiB)"] is not None:
+                row["Peak alloc (KiB)"] = round(row["Peak alloc (KiB)"], 1)
+        return list(rows.values())
+
+    def to_json(self) -> str:
+        """Export the rerun as a JSON document of its spans."""
+        return json.dumps({"trace_id": self.trace_id, "spans": [span.to_dict() for span in self.spans]})
+
+    def to_otlp(self) -> dict:
+        """Export the rerun in the OTLP/JSON trace format, as accepted by OpenTelemetry collectors."""
+        spans = []
+        for span in self.spans:
+            attributes = dict(span.attributes, **{"pdbcov.bytes": span.bytes})
+            if span.peak_bytes is not None:
+                attributes["pdbcov.peak_alloc_bytes"] = span.peak_bytes
+            spans.append({
+                "traceId": self.trace_id,
+                "spanId": span.span_id,
+                "parentSpanId": span.parent_id or "",
+                "name": span.name,
+                "kind": 1,
+                "startTimeUnixNano": str(span.start_ns),
+                "endTimeUnixNano": str(span.start_ns + span.duration_ns),
+                "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items()],
+            })
+        return {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SCOPE_NAME}}]},
+            "scopeSpans": [{"scope": {"name": SCOPE_NAME}, "spans": spans}],
+        }]}
+
+    def export(self, path: str) -> None:
+        """Append the rerun to ``path`` as one line of OTLP/JSON."""
+        with open(path, "a") as f:
+            f.write(json.dumps(self.to_otlp()) + "\n")
+
+
+def _otlp_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def active_tracer() -> Optional[Tracer]:
+    """Return the tracer of the current rerun, or None outside a traced rerun."""
+    return _active_tracer.get()
+
+
+@contextmanager
+def trace(name: str, **attributes) -> Iterator[Optional[Span]]:
+    """Record the enclosed block as a span if a tracer is active, yielding the span or None."""
+    tracer = _active_tracer.get()
+    if tracer is None:
+        yield None
+        return
+    with tracer.span(name, **attributes) as span:
+        yield span
+
+
+def traced(name: str, output_bytes: bool = False):
+    """
+    Decorate a function to record each call as a span.
+
+    Args:
+        name: The span name
+        output_bytes: Count the length of the returned string or bytes as transferred
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            tracer = _active_tracer.get()
+            if tracer is None:
+                return fn(*args, **kwargs)
+            with tracer.span(name) as span:
+                result = fn(*args, **kwargs)
+                if output_bytes and result is not None:
+                    span.bytes += len(result)
+                return result
+        return wrapper
+    return decorator
+
+
+def record_bytes(count: int) -> None:
+    """Add transferred bytes to the current span, if tracing."""
+    tracer = _active_tracer.get()
+    if tracer is not None and tracer.current is not None:
+        tracer.current.bytes += count
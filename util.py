@@ -1,17 +1,21 @@
 import base64
-import json
 from collections import Counter
-from typing import Iterator
-from urllib.parse import quote_plus
-from urllib.request import urlopen
+from typing import Dict, Iterable, Mapping, Union
+from urllib.parse import parse_qsl, quote_plus, urlencode, urlsplit, urlunsplit
 import zlib
 
-import py3Dmol
-import requests
-import stmol
-from matplotlib import pyplot as plt
+import numpy as np
+from matplotlib.colors import Normalize
+from matplotlib.ticker import MaxNLocator
 import streamlit as st
 
+import alphafold
+from color_utils import color_indices, colormap_lut, colormap_name, hex_colors, rgba_colors
+from constants import PEPTIDE_STORE_LINKS
+from peptide_codec import decode_peptides, encode_peptides, is_encoded
+from peptide_store import STORE_PREFIX, get_peptide_store, is_reference
+from tracing import traced
+
 from itertools import groupby
 from typing import List
 
@@ -50,93 +54,204 @@ def decompress_text(compressed_text: str) -> str:
     decompressed = zlib.decompress(decoded).decode("utf-8")
     return decompressed
 
+def split_peptide_count(line: str) -> tuple:
+    """Split a ``peptide;count`` line into its peptide and count. Lines without a count have a count of 1."""
+    peptide, sep, count = line.rpartition(';')
+    if sep and count.strip().isdigit():
+        return peptide.strip(), int(count)
+    return line.strip(), 1
+
+
+@traced("parse.peptides")
+def parse_peptide_lines(peptide_str: str) -> Dict[str, int]:
+    """
+    Parse newline separated peptides, each optionally suffixed with ``;count``, into a weighted mapping.
+
+    Repeated peptides are merged. The mapping is ordered by the last line each peptide appears on.
+
+    Args:
+        peptide_str: The peptide text
+
+    Returns:
+        A mapping of peptide to count
+    """
+    weighted = {}
+    for line in peptide_str.splitlines():
+        peptide, count = split_peptide_count(line)
+        if not peptide:
+            continue
+        weighted[peptide] = weighted.pop(peptide, 0) + count
+    return weighted
+
+
+def _compress_pairs(pairs: List[tuple]) -> str:
+    """
+    Encode ``(peptide, count)`` pairs with the binary codec, or the zlib text format for peptides the codec
+    cannot represent. The zlib format is otherwise only decoded, for links made before the codec.
+    """
+    try:
+        return encode_peptides(pairs)
+    except ValueError:
+        return COMPRESSIONPREFIX + compress_text(','.join(f"{peptide};{count}" for peptide, count in pairs))
+
+
 def compressor(peptide_str: str, compress: bool = True) -> str:
-    """Compress consecutive duplicate peptides into a compact representation."""
+    """
+    Compress consecutive duplicate peptides into a compact representation.
+
+    With ``compress`` the peptides are encoded with the binary codec (see ``peptide_codec``), or the zlib
+    text format when the codec cannot represent them.
+    """
     if not peptide_str.strip():
         return ""
 
     compressed = []
 
-    for peptide, group in groupby(peptide_str.splitlines()):
-        count = sum(1 for _ in group)
-        compressed.append(f"{peptide};{count}")
+    lines = (split_peptide_count(line) for line in peptide_str.splitlines())
+    for peptide, group in groupby(lines, key=lambda x: x[0]):
+        count = sum(c for _, c in group)
+        compressed.append((peptide, count))
 
-    s = ','.join(compressed)
-
-    # compress with gzip if requested
+    # compress with the binary codec or gzip if requested
     if compress:
-        return COMPRESSIONPREFIX + compress_text(s)
+        return _compress_pairs(compressed)
     else:
-        return s
+        return ','.join(f"{peptide};{count}" for peptide, count in compressed)
+
 
+def compress_peptides(peptides: Mapping[str, int]) -> str:
+    """Encode weighted peptides for the ``peptides`` URL parameter, as the viewer's compressor would."""
+    if not peptides:
+        return ""
+    return _compress_pairs(list(peptides.items()))
+
+
+def peptide_link_values(peptide_sets: Iterable[Mapping[str, int]], store: bool = PEPTIDE_STORE_LINKS) -> List[str]:
+    """
+    Encode peptide sets for the ``peptides`` URL parameter of generated links.
+
+    With ``store`` the encoded sets are put in the peptide store and the links carry short references instead
+    (see ``peptide_store``), which only resolve in a viewer that reads the same store.
+    """
+    values = [compress_peptides(peptides) for peptides in peptide_sets]
+    if not store:
+        return values
 
+    stored = [i for i, value in enumerate(values) if value]
+    for i, digest in zip(stored, get_peptide_store().put_many(values[i] for i in stored)):
+        values[i] = STORE_PREFIX + digest
+    return values
+
+
+@traced("parse.peptide_param")
 def decompressor(peptide_str: str) -> str:
-    """Decompress the compact peptide representation back into its original form."""
+    """
+    Decompress the compact peptide representation into one line per distinct peptide.
+
+    Accepts peptide store references, the binary codec, the zlib text format (``COMPRESSED`` prefix) and the
+    plain ``peptide;count`` list. Repeated peptides keep their ``;count`` suffix rather than being expanded into copies.
+    """
     if not peptide_str.strip():
         return ""
 
+    if is_reference(peptide_str):
+        payload = get_peptide_store().get(peptide_str[len(STORE_PREFIX):])
+        if payload is None:
+            raise ValueError(f"Peptide set {peptide_str} is not in the peptide store, it may have been evicted.")
+        return decompressor(payload)
+
+    if is_encoded(peptide_str):
+        return '\n'.join(peptide if count == 1 else f"{peptide};{count}"
+                         for peptide, count in decode_peptides(peptide_str))
+
     if peptide_str.startswith(COMPRESSIONPREFIX):
 
         peptide_str = decompress_text(peptide_str[len(COMPRESSIONPREFIX):])
         
 
     try:
-        peptides = []
+        lines = []
 
         for pair in peptide_str.split(','):
             peptide, count = pair.split(';')
-            peptides.extend([peptide] * int(count))
+            count = int(count)
+            lines.append(peptide if count == 1 else f"{peptide};{count}")
 
-        return '\n'.join(peptides)
+        return '\n'.join(lines)
 
     except (ValueError, IndexError) as e:
         raise ValueError(f"Invalid compressed format: {peptide_str}") from e
 
 
-def serialize_peptides(peptides: List[str]) -> str:
-    """Serialize a list of peptides into a single string."""
+def serialize_peptides(peptides: Union[List[str], Mapping[str, int]]) -> str:
+    """Serialize a list of peptides, or a mapping of peptide to count, into a single string."""
     # counter
-    peptide_counts = Counter(peptides)
+    peptide_counts = peptides if isinstance(peptides, Mapping) else Counter(peptides)
     serialized = ','.join([f"{peptide};{count}" for peptide, count in peptide_counts.items()])
     return serialized
 
 
-def _get_predictions(qualifier: str) -> Iterator[dict]:
+def get_predictions(qualifier: str) -> list:
     """Get all AlphaFold predictions for a UniProt accession.
 
+    Predictions are served from the persistent prediction cache and only fetched when missing or stale.
+
     :param qualifier: A UniProt accession, e.g. P00520
     :type qualifier: str
     :return: The AlphaFold predictions
-    :rtype: Iterator[dict]
+    :rtype: list
     """
-    url = f"https://alphafold.com/api/prediction/{qualifier}"
-    # Retrieve the AlphaFold predictions with urllib
-    with urlopen(url) as response:
-        yield from json.loads(response.read().decode())
+    return alphafold.get_predictions(qualifier)
 
 
-@st.cache_data()
-def get_predictions(qualifier: str) -> list:
-    """Get all AlphaFold predictions for a UniProt accession.
-
-    :param qualifier: A UniProt accession, e.g. P00520
-    :type qualifier: str
-    :return: The AlphaFold predictions
-    :rtype: list
+def prefetch_button(accessions: Iterable[str]) -> None:
+    """
+    Show a button that prefetches the AlphaFold predictions and PDB files of ``accessions`` into the caches,
+    with a progress bar and a warning listing the accessions that failed.
     """
-    return list(_get_predictions(qualifier))
+    if not st.button("Prefetch AlphaFold Structures", use_container_width=True,
+                     help="Download predictions and PDB files for every protein into the structure cache."):
+        return
+    progress = st.progress(0.0, text="Prefetching AlphaFold structures...")
+    failed = alphafold.prefetch(
+        accessions,
+        on_progress=lambda done, total: progress.progress(done / total, text=f"Prefetched {done}/{total} proteins"),
+    )
+    if failed:
+        st.warning(f"Failed to prefetch {len(failed)} proteins: {', '.join(failed)}")
+    else:
+        st.success("All structures prefetched.")
+
+
+def color_runs(colors) -> List[tuple]:
+    """Split per-residue colors into runs of equal color as (start, end, color) with ``end`` inclusive."""
+    colors = np.asarray(colors)
+    if len(colors) == 0:
+        return []
+    starts = np.concatenate(([0], np.flatnonzero(colors[1:] != colors[:-1]) + 1))
+    ends = np.concatenate((starts[1:] - 1, [len(colors) - 1]))
+    return [(int(start), int(end), str(colors[start])) for start, end in zip(starts, ends)]
 
 
-def render_mol(pdb, cov_arr, pdb_style, bcolor, highlight_residues, auto_spin, spin_speed=0.5):
+def build_view(pdb, cov_arr, pdb_style, bcolor, highlight_residues, auto_spin, spin_speed=0.5, fmt='pdb'):
+    """Build the py3Dmol view, issuing one style command per distinct color rather than per residue."""
+    import py3Dmol
+    import stmol
+
     view = py3Dmol.view()
-    view.addModel(pdb, 'pdb')
+    view.addModel(pdb, fmt)
     view.setStyle({}, {pdb_style: {}})
 
     view.setBackgroundColor(bcolor)
 
-    for i, c in enumerate(cov_arr):
-        view.addStyle({"resi": i},
-                      {pdb_style: {"color": c, "radius": 0.2}})
+    # Residues are selected as ranges, e.g. ["3-10", 14], grouped by color
+    color_ranges = {}
+    for start, end, color in color_runs(cov_arr):
+        color_ranges.setdefault(color, []).append(start if start == end else f"{start}-{end}")
+
+    for color, ranges in color_ranges.items():
+        view.addStyle({"resi": ranges},
+                      {pdb_style: {"color": color, "radius": 0.2}})
 
     view.addResLabels({'resn': highlight_residues, })
     stmol.add_hover(view)
@@ -146,21 +261,97 @@ def render_mol(pdb, cov_arr, pdb_style, bcolor, highlight_residues, auto_spin, s
     
     view.zoomTo()
 
-    stmol.showmol(view, height=500, width=700)
+    return view
+
+
+@traced("render.structure_html", output_bytes=True)
+def mol_html(pdb, cov_arr, pdb_style, bcolor, highlight_residues, auto_spin, spin_speed=0.5, fmt='pdb') -> str:
+    """Return the standalone HTML of the py3Dmol view, as embedded by ``stmol.showmol``."""
+    return build_view(pdb, cov_arr, pdb_style, bcolor, highlight_residues, auto_spin, spin_speed, fmt)._make_html()
+
 
+def show_mol_html(html: str, height=500, width=700):
+    """Embed viewer HTML from ``mol_html`` in the page."""
+    import streamlit.components.v1 as components
 
+    components.html(html, height=height, width=width)
+
+
+def render_mol(pdb, cov_arr, pdb_style, bcolor, highlight_residues, auto_spin, spin_speed=0.5, fmt='pdb'):
+    show_mol_html(mol_html(pdb, cov_arr, pdb_style, bcolor, highlight_residues, auto_spin, spin_speed, fmt))
+
+
+@traced("render.coverage_plot")
 def plot_coverage_array(coverage_array, color_map, vmin=None, vmax=None):
+    from matplotlib.cm import ScalarMappable
+    from matplotlib.figure import Figure
+
+    coverage_array = np.asarray(coverage_array, dtype=np.int64)
+    vmin = vmin if vmin is not None else coverage_array.min()
+    vmax = vmax if vmax is not None else coverage_array.max()
+
     # add a color bar to understand the
-    fig, ax = plt.subplots(figsize=(10, 1))
-    cbar = ax.imshow([list(map(int, coverage_array))], aspect='auto', cmap=color_map, vmin=vmin, 
-                     vmax=vmax)
-    fig.colorbar(cbar, orientation='horizontal')
+    # Figure is not registered with pyplot, so it is freed once the caller drops it
+    fig = Figure(figsize=(10, 1))
+    ax = fig.subplots()
+    # A zero-width range maps everything to the bottom of the colormap, as matplotlib's Normalize does
+    ax.imshow(rgba_colors(coverage_array, color_map, vmin, vmax if vmax != vmin else vmin + 1)[np.newaxis],
+              aspect='auto')
+    cbar = ScalarMappable(norm=Normalize(vmin=vmin, vmax=vmax), cmap=color_map)
+    fig.colorbar(cbar, ax=ax, orientation='horizontal')
     # set title
     ax.set_title('Protein Coverage')
     ax.set_axis_off()
     return fig
 
 
+@traced("render.coverage_track", output_bytes=True)
+def coverage_track_svg(coverage_array, color_map, vmin=None, vmax=None, width=1000, colorbar_stops=32):
+    """
+    Render the coverage track and its colorbar as a small standalone SVG.
+
+    The track is one path per color with a rectangle per run of that color, scaled horizontally to ``width``, so the document size
+    depends on the number of color runs rather than the protein length. Colors come from the cached
+    colormap lookup table; no matplotlib figure is created.
+    """
+    coverage_array = np.asarray(coverage_array, dtype=np.int64)
+    vmin = vmin if vmin is not None else coverage_array.min()
+    vmax = vmax if vmax is not None else coverage_array.max()
+    if vmax == vmin:
+        vmax = vmin + 1
+
+    length = max(len(coverage_array), 1)
+    color_paths = {}
+    for start, end, color in color_runs(hex_colors(coverage_array, color_map, vmin, vmax)):
+        color_paths.setdefault(color, []).append(f"M{start} 0h{end - start + 1}v1H{start}z")
+    track = "".join(f'<path fill="{color}" d="{"".join(path)}"/>' for color, path in color_paths.items())
+
+    stop_values = np.linspace(vmin, vmax, colorbar_stops)
+    stops = "".join(
+        f'<stop offset="{k / (colorbar_stops - 1):.3f}" stop-color="{color}"/>'
+        for k, color in enumerate(hex_colors(stop_values, color_map, vmin, vmax))
+    )
+
+    ticks = [tick for tick in MaxNLocator(nbins=8, steps=[1, 2, 2.5, 5, 10]).tick_values(vmin, vmax)
+             if vmin <= tick <= vmax]
+    labels = "".join(
+        f'<line x1="{x:.1f}" x2="{x:.1f}" y1="92" y2="96" stroke="#000"/>'
+        f'<text x="{x:.1f}" y="110" text-anchor="middle">{tick:g}</text>'
+        for tick in ticks
+        for x in [(tick - vmin) / (vmax - vmin) * width]
+    )
+
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="-10 0 {width + 20} 116" '
+        f'font-family="sans-serif" font-size="11">'
+        f'<defs><linearGradient id="cbar">{stops}</linearGradient></defs>'
+        f'<text x="{width / 2}" y="14" text-anchor="middle" font-size="14">Protein Coverage</text>'
+        f'<g transform="translate(0,22) scale({width / length},50)" shape-rendering="crispEdges">{track}</g>'
+        f'<rect y="80" width="{width}" height="12" fill="url(#cbar)" stroke="#000" stroke-width="0.5"/>'
+        f'{labels}</svg>'
+    )
+
+
 def get_query_params_url(params_dict):
     """
     Create url params from alist of parameters and a dictionary with values.
@@ -194,54 +385,76 @@ def listify(o=None):
     return res
 
 
-def shorten_url(url: str) -> str:
-    """Shorten a URL using TinyURL."""
-    api_url = f"http://tinyurl.com/api-create.php?url={url}"
+def shorten_url(url: str, store: bool = PEPTIDE_STORE_LINKS) -> str:
+    """
+    Shorten a permalink.
 
-    try:
-        response = requests.get(api_url)
-        response.raise_for_status()
-        return response.text
-    except requests.RequestException as e:
-        return f"Error: {e}"
-    
+    With ``store`` the ``peptides`` parameter is moved into the peptide store and the returned URL references the
+    stored set by its hash. Such links only resolve on viewers that read the same store, until the set is evicted,
+    so without a shared store (the default, see ``PDBCOV_PEPTIDE_STORE_LINKS``) the URL is shortened with TinyURL.
+    """
+    if not store:
+        import requests
+
+        try:
+            response = requests.get("http://tinyurl.com/api-create.php", params={"url": url})
+            response.raise_for_status()
+            return response.text
+        except requests.RequestException as e:
+            return f"Error: {e}"
+
+    parts = urlsplit(url)
+    params = parse_qsl(parts.query, keep_blank_values=True)
 
+    shortened = []
+    for key, value in params:
+        if key == "peptides" and value and not is_reference(value):
+            value = STORE_PREFIX + get_peptide_store().put(value)
+        shortened.append((key, value))
+
+    return urlunsplit(parts._replace(query=urlencode(shortened)))
+
+
+COVERAGE_STRING_CSS = (
+    "<style>"
+    ".pdbcov-seq{font-family:Courier New,monospace;font-size:16px}"
+    ".pdbcov-seq span{font-weight:900;padding:3px;margin:1px;border-radius:3px}"
+    ".pdbcov-seq .c{background-color:#e0e0ff;border:1px solid #a0a0ff}"
+    ".pdbcov-seq .u{background-color:#f0f0f0;border:1px solid #cccccc}"
+    "{colors}"
+    "</style>"
+)
+
+
+@traced("render.sequence_html", output_bytes=True)
 def coverage_string(protein_cov_arr, stripped_protein_sequence, cmap, color_coverage, vmin=None, vmax=None):
-    import matplotlib.colors as mcolors
+    """
+    Build the sequence coverage HTML, coloring each residue by its coverage with the index on hover.
 
-    # Color all covered amino acids based on coverage and show index on hover, using a monospace font
-    protein_cov = (
-        '<span style="font-family: Courier New, monospace; font-size: 16px;">'
-    )
+    Colors are gathered from the cached colormap lookup table and deduplicated into CSS classes, so each
+    residue is a short ``<span class="c k0" title="...">`` and the markup is joined once.
+    """
+    color_coverage = np.asarray(color_coverage)
+    protein_cov_arr = np.asarray(protein_cov_arr)
 
     colorbar_min = vmin if vmin is not None else color_coverage.min()
     colorbar_max = vmax if vmax is not None else color_coverage.max()
 
-    normalized_values = (color_coverage - colorbar_min) / (colorbar_max - colorbar_min)
-
-    for i, aa in enumerate(stripped_protein_sequence):
-        coverage = protein_cov_arr[i]
-
-        # Get color from colormap
-        color = cmap(normalized_values[i])
-        hex_color = mcolors.to_hex(color)
-
-        if coverage > 0:
-            protein_cov += (
-                f'<span title="Index: {i + 1}; Coverage: {coverage}" style="background-color'
-                f":#e0e0ff; color:{hex_color}; font-weight:900; padding:3px; margin:1px; "
-                f'border:1px solid #a0a0ff; border-radius:3px;">{aa}</span>'
-            )
-        else:
-            # Style the non-covered amino acid for a polished look with a tooltip
-            protein_cov += (
-                f'<span title="Index: {i + 1}" style="background-color:#f0f0f0; color:{hex_color}; '
-                f"font-weight:900; padding:3px; margin:1px; border:1px solid #cccccc; "
-                f'border-radius:3px;">{aa}</span>'
-            )
-    protein_cov += "</span>"
-
-    return protein_cov
+    lut_indices, color_index = np.unique(color_indices(color_coverage, cmap, colorbar_min, colorbar_max),
+                                         return_inverse=True)
+    lut_hex = colormap_lut(colormap_name(cmap))[1]
+
+    color_css = "".join(f".pdbcov-seq .k{k}{{color:{lut_hex[index]}}}" for k, index in enumerate(lut_indices))
+
+    spans = [
+        f'<span class="c k{k}" title="Index: {i}; Coverage: {coverage}">{aa}</span>' if coverage > 0 else
+        f'<span class="u k{k}" title="Index: {i}">{aa}</span>'
+        for i, (aa, coverage, k) in enumerate(
+            zip(stripped_protein_sequence, protein_cov_arr.tolist(), color_index.tolist()), start=1)
+    ]
+
+    return (COVERAGE_STRING_CSS.replace("{colors}", color_css)
+            + '<span class="pdbcov-seq">' + "".join(spans) + "</span>")
 
 
 def show_footer():